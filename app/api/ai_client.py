@@ -6,7 +6,7 @@ import asyncio
 import re
 from typing import Dict, List, Any, Optional, Callable
 import logging
-from app.config import load_config, save_config, get_config_value
+from app.config import load_config, get_config_value, set_config_value
 from app.api.model_support import prepare_messages, prepare_api_parameters, get_model_config
 
 # Configurazione logging
@@ -864,65 +864,10 @@ class OpenAIClient(AIClient):
         # Log all models we're going to try
         logger.info(f"Modelli di alta qualità disponibili: {', '.join(self.fallback_models)}")
         
-        # Verifica i modelli disponibili all'avvio
+        # I modelli disponibili vengono verificati alla prima chiamata (check_available_models):
+        # la creazione del client non esegue richieste di rete
         self.available_models = []
-        self._check_models_sync()
     
-    def _check_models_sync(self):
-        """Verifica i modelli disponibili in modo sincrono (solo all'avvio)."""
-        import requests  # Usiamo requests per la chiamata sincrona
-        
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.get(
-                f"{self.base_url}/v1/models",
-                headers=headers,
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                models_data = response.json()
-                available_models = [model["id"] for model in models_data.get("data", [])]
-                self.available_models = available_models
-                
-                logger.info(f"Modelli OpenAI disponibili: {', '.join(available_models[:10])}...")
-                logger.info(f"Totale modelli disponibili: {len(available_models)}")
-                
-                # Verifica quali modelli di alta qualità sono disponibili
-                premium_models = [m for m in self.fallback_models if m in available_models]
-                
-                if premium_models:
-                    # Filtra solo i modelli di alta qualità
-                    logger.info(f"Modelli di alta qualità disponibili nell'API: {', '.join(premium_models)}")
-                    self.fallback_models = premium_models
-                    
-                    # IMPORTANTE: Forza l'uso di o1-preview se disponibile
-                    if "o1-preview" in premium_models:
-                        self.model = "o1-preview"
-                        logger.info("Forzato utilizzo di o1-preview come modello principale (massima qualità)")
-                        # Aggiorna la configurazione salvata
-                        config = load_config()
-                        config["openai_model"] = "o1-preview"
-                        save_config(config)
-                    elif "o1" in premium_models:
-                        self.model = "o1"
-                        logger.info("Forzato utilizzo di o1 come modello principale (massima qualità)")
-                        # Aggiorna la configurazione salvata
-                        config = load_config()
-                        config["openai_model"] = "o1"
-                        save_config(config)
-                else:
-                    # Avvisa che nessun modello di alta qualità è disponibile
-                    logger.warning("ATTENZIONE: Nessun modello di alta qualità è disponibile nel tuo account!")
-                    logger.warning("Si consiglia di aggiornare la sottoscrizione OpenAI per accedere ai modelli premium.")
-        except Exception as e:
-            logger.error(f"Errore durante la verifica dei modelli disponibili: {str(e)}")
-            # Continua con i modelli predefiniti
-        
     async def check_available_models(self) -> List[str]:
         """Verifica quali modelli sono disponibili per questo progetto OpenAI."""
         if self.available_models:
@@ -989,19 +934,15 @@ class OpenAIClient(AIClient):
             
             # Forza anche il modello corrente a o1-preview
             self.model = "o1-preview"
-            # Aggiorna la configurazione
-            config = load_config()
-            config["openai_model"] = "o1-preview"
-            save_config(config)
+            # Aggiorna la configurazione (nessuna scrittura se è già o1-preview)
+            set_config_value("openai_model", "o1-preview")
         elif "o1" in self.fallback_models:
             # Fallback a o1 se o1-preview non è disponibile
             self.fallback_models = ["o1"] + [m for m in self.fallback_models if m != "o1"]
             logger.info(f"Lista modelli riorganizzata per dare priorità a o1: {', '.join(self.fallback_models)}")
             self.model = "o1"
-            # Aggiorna la configurazione
-            config = load_config()
-            config["openai_model"] = "o1"
-            save_config(config)
+            # Aggiorna la configurazione (nessuna scrittura se è già o1)
+            set_config_value("openai_model", "o1")
             
         # Determina l'indice del modello corrente nella lista di fallback
         try:
@@ -1105,9 +1046,7 @@ class OpenAIClient(AIClient):
                             logger.info(f"Modello di alta qualità '{current_model}' funzionante. Aggiornando la configurazione...")
                             self.model = current_model
                             # Aggiorna la configurazione per le prossime chiamate
-                            config = load_config()
-                            config["openai_model"] = self.model
-                            save_config(config)
+                            set_config_value("openai_model", self.model)
                         
                         # Estrai il contenuto dal messaggio di risposta
                         content = response_data['choices'][0]['message']['content']
@@ -1995,5 +1934,14 @@ def create_ai_client():
         logger.warning(f"Provider AI '{provider}' non riconosciuto. Utilizzo del client di mock.")
         return MockAIClient()
 
-# Inizializza il client al momento dell'importazione
-deepseek_client = create_ai_client() 
\ No newline at end of file
+def get_ai_client() -> AIClient:
+    """
+    Crea il client AI per una richiesta, secondo la configurazione corrente.
+    
+    Ogni richiesta ha il proprio client: modello corrente e lista di fallback cambiano
+    durante le chiamate, e un client condiviso farebbe cambiare modello anche alle
+    richieste concorrenti. La creazione non esegue richieste di rete (i modelli
+    disponibili vengono verificati alla prima chiamata) e nessun client viene creato
+    all'importazione del modulo.
+    """
+    return create_ai_client()
@@ -0,0 +1,138 @@
+"""
+Impronta dei file statici (cache busting).
+
+costruisci_asset() copia gli asset in ASSET_DIR con l'hash del contenuto nel nome
+(es. css/style.3f2a9c1b7d4e.css) e scrive il manifest con la corrispondenza; i
+template usano url_asset() per ottenere l'URL con l'impronta. Un file con l'impronta
+non cambia mai, quindi viene servito con Cache-Control immutable: una nuova versione
+ha un nuovo nome e i browser la scaricano senza attendere la scadenza della cache.
+
+La costruzione avviene alla prima pagina servita e di nuovo quando cambiano data di
+modifica o dimensione di un sorgente, in ogni processo che serve le pagine: vale anche
+con "uvicorn app.main:app" e con il reload di sviluppo. Per generarla a mano:
+    python -m app.api.asset_statici
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path("app/static")
+
+# Directory delle copie con l'impronta, generata da costruisci_asset() (non versionata)
+ASSET_DIR = STATIC_DIR / "asset"
+MANIFEST = ASSET_DIR / "manifest.json"
+
+# Asset da servire con l'impronta, relativi a STATIC_DIR
+ASSET_IMPRONTATI = ("css/style.css", "js/main.js")
+
+CACHE_CONTROL_IMMUTABILE = "public, max-age=31536000, immutable"
+
+def nome_con_impronta(percorso: str, dati: bytes) -> str:
+    """Percorso dell'asset con le prime 12 cifre dello SHA-256 del contenuto prima dell'estensione."""
+    radice, estensione = os.path.splitext(percorso)
+    return f"{radice}.{hashlib.sha256(dati).hexdigest()[:12]}{estensione}"
+
+def costruisci_asset(sorgenti: Tuple[str, ...] = ASSET_IMPRONTATI) -> Dict[str, str]:
+    """
+    Scrive le copie con l'impronta degli asset e il manifest, e restituisce il manifest.
+
+    Le copie delle versioni precedenti restano nella directory: le pagine già in cache
+    nei browser possono continuare a richiederle.
+    """
+    ASSET_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for percorso in sorgenti:
+        dati = (STATIC_DIR / percorso).read_bytes()
+        improntato = nome_con_impronta(percorso, dati)
+        destinazione = ASSET_DIR / improntato
+        if not destinazione.exists():
+            _scrivi_atomico(destinazione, dati)
+        manifest[percorso] = improntato
+
+    _scrivi_atomico(MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+def _scrivi_atomico(percorso: Path, dati: bytes):
+    # File temporaneo per processo e thread: più worker possono costruire gli asset
+    # insieme, e nessuno serve un file o un manifest incompleto
+    percorso.parent.mkdir(parents=True, exist_ok=True)
+    temporaneo = percorso.with_name(f".{percorso.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temporaneo.write_bytes(dati)
+    os.replace(temporaneo, percorso)
+
+_manifest_lock = threading.Lock()
+_manifest_firma: Optional[Tuple] = None
+_manifest: Dict[str, str] = {}
+
+def _firma_sorgenti(sorgenti: Tuple[str, ...] = ASSET_IMPRONTATI) -> Tuple:
+    """Data di modifica e dimensione dei sorgenti (None se mancano), come per la configurazione."""
+    firma = []
+    for percorso in sorgenti:
+        try:
+            stat = (STATIC_DIR / percorso).stat()
+            firma.append((percorso, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            firma.append((percorso, None))
+    return tuple(firma)
+
+def _carica_manifest() -> Dict[str, str]:
+    """
+    Manifest in memoria, ricostruito quando cambia un sorgente o se la directory degli
+    asset è stata rimossa: una modifica a style.css o main.js produce subito un nuovo URL.
+    """
+    global _manifest_firma, _manifest
+    firma = (_firma_sorgenti(), MANIFEST.exists())
+
+    with _manifest_lock:
+        if firma != _manifest_firma:
+            try:
+                _manifest = costruisci_asset()
+            except OSError as e:
+                # Senza copie con l'impronta i template usano i percorsi originali, da rivalidare
+                logger.error(f"Impossibile costruire gli asset con l'impronta: {str(e)}")
+                _manifest = {}
+            _manifest_firma = (_firma_sorgenti(), MANIFEST.exists())
+        return _manifest
+
+def url_asset(percorso: str) -> str:
+    """
+    URL di un file statico per i template: con l'impronta se l'asset è nel manifest,
+    altrimenti (asset non improntato o costruzione non riuscita) il percorso originale in /static.
+    """
+    percorso = percorso.lstrip("/")
+    improntato = _carica_manifest().get(percorso)
+    if improntato:
+        return f"/static/{ASSET_DIR.relative_to(STATIC_DIR).as_posix()}/{improntato}"
+    return f"/static/{percorso}"
+
+def versione_asset() -> str:
+    """Impronta del manifest, da includere nell'ETag delle pagine che ne usano gli URL."""
+    manifest = _carica_manifest()
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+class StaticFilesAsset(StaticFiles):
+    """
+    StaticFiles con intestazioni di cache: gli asset con l'impronta (in ASSET_DIR) sono
+    immutabili per un anno, gli altri file vanno rivalidati (ETag e Last-Modified, 304).
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        risposta = await super().get_response(path, scope)
+        if risposta.status_code in (200, 206, 304):
+            improntato = Path(path).parts[:1] == (ASSET_DIR.name,)
+            risposta.headers["Cache-Control"] = CACHE_CONTROL_IMMUTABILE if improntato else "no-cache"
+        return risposta
+
+if __name__ == "__main__":
+    for originale, improntato in costruisci_asset().items():
+        print(f"{originale} -> {ASSET_DIR / improntato}")
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# Le risposte possono essere conservate, ma vanno rivalidate a ogni uso: la
+# rivalidazione costa una lettura dei metadati e, se nulla è cambiato, un 304 senza corpo
+CACHE_CONTROL_RIVALIDA = "no-cache"
+
+def etag_forte(*parti: Any) -> str:
+    """ETag forte (tra virgolette) dall'impronta delle parti che determinano la rappresentazione."""
+    impronta = hashlib.sha256(json.dumps(parti, ensure_ascii=False, default=str).encode("utf-8"))
+    return f'"{impronta.hexdigest()[:32]}"'
+
+def firma_template(*nomi: str, directory: str = "app/templates") -> str:
+    """
+    Firma dei template usati da una pagina (data di modifica e dimensione): inclusa
+    nell'ETag, fa cambiare le pagine HTML quando cambia il template, non solo il corso.
+    """
+    firme = []
+    for nome in nomi:
+        try:
+            stat = os.stat(os.path.join(directory, nome))
+            firme.append(f"{nome}:{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            firme.append(f"{nome}:-")
+    return ";".join(firme)
+
+def data_http(valore: Optional[str]) -> Optional[str]:
+    """Converte una data ISO del database (ora locale) nel formato HTTP di Last-Modified."""
+    if not valore:
+        return None
+    try:
+        data = datetime.fromisoformat(valore)
+    except ValueError:
+        return None
+    return format_datetime(data.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def intestazioni_cache(etag: str, ultima_modifica: Optional[str] = None,
+                       cache_control: str = CACHE_CONTROL_RIVALIDA) -> Dict[str, str]:
+    """Intestazioni di validazione di una risposta: ETag, Last-Modified (se nota) e Cache-Control."""
+    intestazioni = {"ETag": etag, "Cache-Control": cache_control}
+    if ultima_modifica:
+        intestazioni["Last-Modified"] = ultima_modifica
+    return intestazioni
+
+def _etag_corrisponde(if_none_match: str, etag: str) -> bool:
+    # If-None-Match usa il confronto debole: il prefisso W/ non conta
+    if if_none_match.strip() == "*":
+        return True
+    valore = etag[2:] if etag.startswith("W/") else etag
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == valore:
+            return True
+    return False
+
+def non_modificato(request: Request, etag: str, ultima_modifica: Optional[str] = None) -> bool:
+    """
+    Verifica se la copia del client è ancora valida (RFC 9110): If-None-Match confrontato
+    con l'ETag e, solo se assente, If-Modified-Since confrontato con Last-Modified.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_corrisponde(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modifica:
+        try:
+            return parsedate_to_datetime(ultima_modifica) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def risposta_non_modificata(intestazioni: Dict[str, str]) -> Response:
+    """Risposta 304 senza corpo, con le stesse intestazioni di validazione della risposta completa."""
+    return Response(status_code=304, headers=intestazioni)
@@ -0,0 +1,147 @@
+import zlib
+from importlib.util import find_spec
+from typing import Callable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_config_value
+
+# Tipi di contenuto che vale la pena comprimere: PDF, ZIP, DOCX ed EPUB sono già compressi
+TIPI_COMPRIMIBILI = (
+    "application/json", "application/javascript", "application/xml", "application/xhtml+xml", "image/svg+xml"
+)
+
+def codifiche_disponibili() -> Tuple[str, ...]:
+    """Codifiche supportate in ordine di preferenza: br solo con brotli installato."""
+    return ("br", "gzip") if find_spec("brotli") else ("gzip",)
+
+def scegli_codifica(accept_encoding: str, disponibili: Tuple[str, ...]) -> Optional[str]:
+    """Sceglie la codifica preferita tra quelle accettate dal client (q > 0), o None."""
+    accettate = {}
+    for voce in accept_encoding.lower().split(","):
+        nome, _, parametri = voce.strip().partition(";")
+        qualita = 1.0
+        parametro = parametri.strip()
+        if parametro.startswith("q="):
+            try:
+                qualita = float(parametro[2:])
+            except ValueError:
+                qualita = 0.0
+        if nome:
+            accettate[nome.strip()] = qualita
+
+    for codifica in disponibili:
+        if accettate.get(codifica, accettate.get("*", 0.0)) > 0:
+            return codifica
+    return None
+
+def tipo_comprimibile(content_type: str) -> bool:
+    tipo = content_type.split(";")[0].strip().lower()
+    return (tipo.startswith("text/") or tipo in TIPI_COMPRIMIBILI
+            or tipo.endswith("+json") or tipo.endswith("+xml"))
+
+def _compressore(codifica: str, livello_gzip: int, qualita_brotli: int) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """
+    Restituisce (comprimi, termina): comprimi restituisce subito i byte compressi di ogni
+    blocco (flush), così le risposte in streaming arrivano al client man mano.
+    """
+    if codifica == "br":
+        import brotli
+
+        compressore = brotli.Compressor(quality=qualita_brotli)
+        return (lambda dati: compressore.process(dati) + compressore.flush()), compressore.finish
+
+    # wbits 31: formato gzip (intestazione e CRC) invece di zlib
+    compressore = zlib.compressobj(livello_gzip, zlib.DEFLATED, 31)
+    return (lambda dati: compressore.compress(dati) + compressore.flush(zlib.Z_SYNC_FLUSH)), compressore.flush
+
+class MiddlewareCompressione:
+    """
+    Middleware ASGI che comprime le risposte con brotli (se installato) o gzip, secondo
+    l'Accept-Encoding del client.
+
+    Vengono compresse solo le risposte di tipo testuale (HTML, JSON, CSS, JS, Markdown)
+    oltre minimo_bytes; restano invariate le risposte già codificate, quelle senza corpo
+    (304) e le richieste Range, i cui byte si riferiscono al file non compresso. Le
+    risposte in streaming vengono compresse blocco per blocco. L'ETag di una risposta
+    compressa diventa debole: i byte cambiano, ma If-None-Match continua a corrispondere.
+    """
+
+    def __init__(self, app: ASGIApp, minimo_bytes: Optional[int] = None,
+                 livello_gzip: int = 6, qualita_brotli: int = 5):
+        self.app = app
+        if minimo_bytes is None:
+            minimo_bytes = int(get_config_value("compressione_risposte_min_bytes", 1024))
+        self.minimo_bytes = minimo_bytes
+        self.livello_gzip = livello_gzip
+        self.qualita_brotli = qualita_brotli
+        self.disponibili = codifiche_disponibili()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        intestazioni = Headers(scope=scope)
+        codifica = None
+        if "range" not in intestazioni:
+            codifica = scegli_codifica(intestazioni.get("accept-encoding", ""), self.disponibili)
+
+        inizio: Optional[Message] = None
+        comprimi: Optional[Callable[[bytes], bytes]] = None
+        termina: Optional[Callable[[], bytes]] = None
+
+        async def invia(messaggio: Message):
+            nonlocal inizio, comprimi, termina
+            if messaggio["type"] == "http.response.start":
+                # L'intestazione viene inviata con il primo blocco del corpo, quando si sa se comprimere
+                inizio = messaggio
+                return
+            if messaggio["type"] != "http.response.body":
+                await send(messaggio)
+                return
+
+            if inizio is not None:
+                risposta, inizio = inizio, None
+                uscita = MutableHeaders(raw=risposta["headers"])
+                corpo = messaggio.get("body", b"")
+                altri_blocchi = messaggio.get("more_body", False)
+
+                comprimibile = (
+                    tipo_comprimibile(uscita.get("content-type", ""))
+                    and "content-encoding" not in uscita
+                    and risposta["status"] not in (204, 206, 304)
+                )
+                if comprimibile:
+                    uscita.add_vary_header("Accept-Encoding")
+                if not comprimibile or codifica is None or (not altri_blocchi and len(corpo) < self.minimo_bytes):
+                    await send(risposta)
+                    await send(messaggio)
+                    return
+
+                comprimi, termina = _compressore(codifica, self.livello_gzip, self.qualita_brotli)
+                uscita["Content-Encoding"] = codifica
+                etag = uscita.get("etag")
+                if etag and not etag.startswith("W/"):
+                    uscita["ETag"] = f"W/{etag}"
+                if altri_blocchi:
+                    del uscita["Content-Length"]
+                    await send(risposta)
+                    await send({"type": "http.response.body", "body": comprimi(corpo), "more_body": True})
+                else:
+                    compresso = comprimi(corpo) + termina()
+                    uscita["Content-Length"] = str(len(compresso))
+                    await send(risposta)
+                    await send({"type": "http.response.body", "body": compresso})
+                return
+
+            if comprimi is None:
+                await send(messaggio)
+                return
+            if messaggio.get("more_body", False):
+                await send({"type": "http.response.body", "body": comprimi(messaggio.get("body", b"")), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": comprimi(messaggio.get("body", b"")) + termina()})
+
+        await self.app(scope, receive, invia)
@@ -1,19 +1,36 @@
+import hashlib
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
 from fastapi import HTTPException
 
-from app.api.ai_client import create_ai_client, standardizza_markdown
+from app.api.ai_client import get_ai_client, standardizza_markdown
+from app.api.cache_http import data_http
+from app.api.esportazione import (
+    FORMATI_ESPORTAZIONE, FORMATI_PACCHETTO, ErroreEsportazione, chiave_esportazione, chiave_pacchetto,
+    nome_file, nome_pacchetto, prepara_esportazione, prepara_pacchetto
+)
+from app.api.lavori_esportazione import lavori_esportazione
+from app.api.rendering_capitoli import html_capitoli
 from app.models.database import (
     salva_corso,
     salva_scaletta,
     salva_contenuto_capitolo,
     carica_corso,
-    carica_contenuti_corso
+    carica_contenuti_corso,
+    carica_hash_contenuti,
+    carica_contenuto,
+    carica_avanzamento_corso,
+    carica_metadati_capitolo,
+    carica_metadati_capitoli,
+    carica_versioni,
+    lista_corsi_pagina,
+    lista_revisioni,
+    carica_revisione,
+    ripristina_revisione
 )
 
-import sqlite3
-from pathlib import Path
 import asyncio
 import os
 
@@ -22,11 +39,6 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-DB_PATH = Path("app/data/corsi.db")
-
-# Inizializza il client AI
-ai_client = create_ai_client()
-
 # Dizionario per tenere traccia dello stato dell'espansione per ogni corso
 # Chiave: corso_id, Valore: dizionario con lo stato dell'espansione
 _espansione_stato = {}
@@ -54,8 +66,8 @@ async def genera_scaletta_corso(corso_id: str) -> Dict[str, Any]:
         print(f"Generazione scaletta per corso: {corso_id}")
         print(f"Parametri corso: {corso['parametri']}")
         
-        # Ricrea il client AI per assicurarsi di usare l'ultimo provider configurato
-        client = create_ai_client()
+        # Client AI della richiesta, con l'ultimo provider configurato
+        client = get_ai_client()
         
         # Genera la scaletta usando il client AI
         risultato = await client.genera_scaletta_corso(corso['parametri'])
@@ -163,8 +175,8 @@ async def genera_contenuto_capitolo(corso_id: str, capitolo_id: str) -> Dict[str
                         if 'ordine' not in sottocap:
                             sottocap['ordine'] = i+1
         
-        # Ricrea il client AI per assicurarsi di usare l'ultimo provider configurato
-        client = create_ai_client()
+        # Client AI della richiesta, con l'ultimo provider configurato
+        client = get_ai_client()
         
         # Carichiamo eventuali contenuti già generati
         contenuti_esistenti = carica_contenuti_corso(corso_id)
@@ -249,7 +261,7 @@ async def genera_contenuto_capitolo(corso_id: str, capitolo_id: str) -> Dict[str
         # Salva il contenuto nel database
         contenuto = risultato['contenuto']
         modello_utilizzato = risultato.get('modello_utilizzato', None)
-        salva_contenuto_capitolo(corso_id, capitolo_id, contenuto, modello_utilizzato)
+        salva_contenuto_capitolo(corso_id, capitolo_id, contenuto, modello_utilizzato, espanso=False)
         
         # Prepara la risposta con l'informazione sul modello utilizzato
         risposta = {
@@ -417,524 +429,414 @@ async def modifica_contenuto_capitolo(corso_id: str, capitolo_id: str, contenuto
             "message": f"Errore durante la modifica del contenuto del capitolo: {str(e)}"
         }
 
-async def esporta_corso(corso_id: str, formato: str) -> Dict[str, Any]:
+def revisioni_capitolo(corso_id: str, capitolo_id: str) -> Dict[str, Any]:
     """
-    Esporta il corso nel formato specificato.
+    Restituisce la cronologia delle revisioni di un capitolo.
     
     Args:
         corso_id: ID del corso
-        formato: Formato di esportazione ('pdf', 'markdown', 'html', 'docx')
+        capitolo_id: ID del capitolo
         
     Returns:
-        Un dizionario con i risultati dell'operazione e l'URL per il download
+        Un dizionario con la revisione corrente e l'elenco delle revisioni
     """
-    try:
-        # Verifichiamo che il corso esista
-        corso = carica_corso(corso_id)
-        if not corso:
-            return {"success": False, "message": "Corso non trovato"}
-            
-        # Verifichiamo che ci sia una scaletta
-        if "scaletta" not in corso or not corso["scaletta"]:
-            return {"success": False, "message": "Questo corso non ha ancora una scaletta"}
-            
-        # Carichiamo tutti i contenuti disponibili
-        contenuti_corso = carica_contenuti_corso(corso_id)
-        
-        # Verifichiamo che tutti i capitoli abbiano contenuto
-        capitoli_mancanti = []
-        for capitolo in corso["scaletta"]["capitoli"]:
-            if capitolo["id"] not in contenuti_corso:
-                capitoli_mancanti.append(capitolo["titolo"])
-                
-        if capitoli_mancanti:
-            return {
-                "success": False, 
-                "message": f"Mancano i contenuti per {len(capitoli_mancanti)} capitoli: {', '.join(capitoli_mancanti)}"
-            }
+    metadati = carica_metadati_capitolo(corso_id, capitolo_id)
+    if not metadati:
+        return {"success": False, "message": "Contenuto del capitolo non trovato"}
+    
+    return {
+        "success": True,
+        "revisione_corrente": metadati.get("versione"),
+        "revisioni": lista_revisioni(corso_id, capitolo_id)
+    }
+
+def carica_revisione_capitolo(corso_id: str, capitolo_id: str, revisione: int) -> Dict[str, Any]:
+    """Restituisce il testo di una revisione di un capitolo."""
+    contenuto = carica_revisione(corso_id, capitolo_id, revisione)
+    if contenuto is None:
+        return {"success": False, "message": f"Revisione {revisione} non trovata"}
+    
+    return {"success": True, "revisione": revisione, "contenuto": contenuto}
+
+async def ripristina_revisione_capitolo(corso_id: str, capitolo_id: str, revisione: int) -> Dict[str, Any]:
+    """
+    Riporta un capitolo a una revisione precedente, senza rigenerarlo.
+    
+    Args:
+        corso_id: ID del corso
+        capitolo_id: ID del capitolo
+        revisione: Numero della revisione da ripristinare
         
-        # Verifichiamo che il formato sia supportato
-        formati_supportati = ["pdf", "markdown", "html", "docx"]
-        if formato not in formati_supportati:
-            return {"success": False, "message": f"Formato non supportato. Formati disponibili: {', '.join(formati_supportati)}"}
+    Returns:
+        Un dizionario con i risultati dell'operazione
+    """
+    try:
+        risultato = ripristina_revisione(corso_id, capitolo_id, revisione)
+        if risultato is False:
+            return {"success": False, "message": f"Revisione {revisione} non trovata"}
+        if not risultato:
+            return {"success": False, "message": "Errore durante il ripristino della revisione"}
         
-        # Prepariamo il contenuto completo del corso
-        contenuto_completo = ""
+        metadati = carica_metadati_capitolo(corso_id, capitolo_id)
+        return {
+            "success": True,
+            "message": f"Revisione {revisione} ripristinata",
+            "revisione_corrente": metadati.get("versione") if metadati else None
+        }
+    except Exception as e:
+        logger.error(f"Errore durante il ripristino della revisione: {str(e)}")
+        return {"success": False, "message": f"Errore durante il ripristino della revisione: {str(e)}"}
+
+def _verifica_esportabile(corso_id: str, *formati: str) -> Dict[str, Any]:
+    """Carica il corso e gli hash dei contenuti da esportare, o restituisce il motivo per cui non è possibile."""
+    # Verifichiamo che il corso esista
+    corso = carica_corso(corso_id)
+    if not corso:
+        return {"success": False, "message": "Corso non trovato", "status_code": 404}
         
-        # Aggiungiamo il titolo e le informazioni del corso
-        contenuto_completo += f"# {corso['parametri']['titolo']}\n\n"
-        contenuto_completo += f"## Descrizione del Corso\n\n{corso['parametri']['descrizione']}\n\n"
-        contenuto_completo += f"**Pubblico target:** {corso['parametri']['pubblico_target']}\n\n"
-        contenuto_completo += f"**Livello di complessità:** {corso['parametri']['livello_complessita']}\n\n"
+    # Verifichiamo che ci sia una scaletta
+    if "scaletta" not in corso or not corso["scaletta"]:
+        return {"success": False, "message": "Questo corso non ha ancora una scaletta", "status_code": 409}
         
-        # Aggiungiamo i contenuti dei capitoli nell'ordine corretto
-        for capitolo in corso["scaletta"]["capitoli"]:
-            contenuto_completo += f"# {capitolo['titolo']}\n\n"
-            if capitolo["id"] in contenuti_corso:
-                contenuto_completo += contenuti_corso[capitolo["id"]] + "\n\n"
+    # Hash dei contenuti disponibili: bastano per la verifica e per la chiave di cache
+    hash_contenuti = carica_hash_contenuti(corso_id)
+    
+    # Verifichiamo che tutti i capitoli abbiano contenuto
+    capitoli_mancanti = []
+    for capitolo in corso["scaletta"]["capitoli"]:
+        if capitolo["id"] not in hash_contenuti:
+            capitoli_mancanti.append(capitolo["titolo"])
+            
+    if capitoli_mancanti:
+        return {
+            "success": False, 
+            "message": f"Mancano i contenuti per {len(capitoli_mancanti)} capitoli: {', '.join(capitoli_mancanti)}",
+            "status_code": 409
+        }
+    
+    # Verifichiamo che i formati siano supportati
+    if any(formato not in FORMATI_ESPORTAZIONE for formato in formati):
+        return {
+            "success": False,
+            "message": f"Formato non supportato. Formati disponibili: {', '.join(FORMATI_ESPORTAZIONE)}",
+            "status_code": 400
+        }
+    
+    return {"success": True, "corso": corso, "hash_contenuti": hash_contenuti}
+
+def _validazione_esportazione(corso_id: str, chiave: str) -> Dict[str, Any]:
+    """ETag (la chiave di cache, già indirizzata per contenuto) e Last-Modified HTTP di un file esportato."""
+    versioni = carica_versioni(corso_id)
+    return {
+        "etag": f'"{chiave}"',
+        "ultima_modifica": data_http(versioni["ultimo_aggiornamento"]) if versioni else None
+    }
+
+async def file_esportazione(corso_id: str, formato: str,
+                            avanzamento: Optional[Callable[[int, int], None]] = None,
+                            copia_valida: Optional[Callable[[str, Optional[str]], bool]] = None) -> Dict[str, Any]:
+    """
+    Prepara il file esportato del corso per il download.
+    
+    Args:
+        avanzamento: Funzione chiamata con (capitoli completati, capitoli totali) durante la conversione
+        copia_valida: Funzione (etag, ultima_modifica) che indica se la copia del client è
+            ancora valida: in tal caso il file non viene preparato né letto
+    
+    Returns:
+        In caso di successo percorso, nome del file, content type, etag e ultima_modifica
+        (solo non_modificato, etag e ultima_modifica se la copia del client è valida);
+        altrimenti messaggio di errore e status_code HTTP da restituire
+    """
+    try:
+        verifica = _verifica_esportabile(corso_id, formato)
+        if not verifica["success"]:
+            return verifica
         
-        # Implementiamo l'esportazione in base al formato
-        # Nota: per ora, implementiamo solo l'esportazione in Markdown
-        # Gli altri formati richiederebbero l'integrazione con librerie specifiche
+        corso = verifica["corso"]
+        validazione = _validazione_esportazione(
+            corso_id, chiave_esportazione(corso, verifica["hash_contenuti"], formato)
+        )
+        if copia_valida is not None and copia_valida(validazione["etag"], validazione["ultima_modifica"]):
+            return {"success": True, "non_modificato": True, **validazione}
         
-        # Per il formato Markdown, restituiamo direttamente il contenuto
-        if formato == "markdown":
-            return {
-                "success": True,
-                "message": "Corso esportato come Markdown",
-                "content": contenuto_completo,
-                "filename": f"{corso['parametri']['titolo'].lower().replace(' ', '_')}.md"
-            }
-        elif formato == "html":
-            # Convertiamo il Markdown in HTML
-            try:
-                import markdown
-                
-                # Convertiamo il contenuto Markdown in HTML
-                html_content = markdown.markdown(contenuto_completo, extensions=['tables', 'fenced_code'])
-                
-                # Aggiungiamo un template HTML base per renderizzarlo presentabile
-                html_output = f"""<!DOCTYPE html>
-<html lang="it">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{corso['parametri']['titolo']}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
-        h1, h2, h3 {{ color: #2c3e50; }}
-        code {{ background-color: #f8f9fa; padding: 2px 4px; border-radius: 4px; }}
-        pre {{ background-color: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto; }}
-        blockquote {{ border-left: 4px solid #ccc; padding-left: 10px; margin-left: 0; }}
-        table {{ border-collapse: collapse; width: 100%; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; }}
-        th {{ background-color: #f2f2f2; }}
-    </style>
-</head>
-<body>
-    {html_content}
-</body>
-</html>"""
-                
-                return {
-                    "success": True,
-                    "message": "Corso esportato come HTML",
-                    "content": html_output,
-                    "filename": f"{corso['parametri']['titolo'].lower().replace(' ', '_')}.html"
-                }
-            except ImportError as e:
-                logger.error(f"Errore di importazione durante la generazione HTML: {str(e)}")
-                return {
-                    "success": False,
-                    "message": f"Impossibile esportare in HTML: libreria mancante. Errore: {str(e)}"
-                }
-            except Exception as e:
-                logger.error(f"Errore durante la conversione in HTML: {str(e)}")
-                return {
-                    "success": False,
-                    "message": f"Errore durante la conversione in HTML: {str(e)}"
-                }
-        elif formato == "pdf":
-            # Generiamo un PDF dal contenuto Markdown usando ReportLab (soluzione nativa)
-            try:
-                import markdown
-                from reportlab.lib.pagesizes import A4
-                from reportlab.lib import colors
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-                from reportlab.platypus.flowables import HRFlowable
-                from reportlab.lib.units import cm
-                from io import BytesIO
-                import base64
-                import re
-                
-                logger.info("Iniziando la conversione in PDF con ReportLab (soluzione nativa)")
-                
-                # Convertiamo il contenuto Markdown in HTML per il parsing
-                html_content = markdown.markdown(contenuto_completo, extensions=['tables', 'fenced_code'])
-                
-                # Creiamo un buffer per il PDF
-                pdf_buffer = BytesIO()
-                
-                # Creiamo il documento PDF
-                doc = SimpleDocTemplate(
-                    pdf_buffer, 
-                    pagesize=A4,
-                    title=corso['parametri']['titolo'],
-                    author="Generato con AI Course Builder",
-                    leftMargin=2*cm, 
-                    rightMargin=2*cm, 
-                    topMargin=2*cm, 
-                    bottomMargin=2*cm
-                )
-                
-                # Stili per il documento
-                styles = getSampleStyleSheet()
-                
-                # Modifichiamo gli stili esistenti invece di aggiungerne di nuovi
-                styles['Heading1'].fontSize = 24
-                styles['Heading1'].spaceAfter = 12
-                
-                styles['Heading2'].fontSize = 18
-                styles['Heading2'].spaceAfter = 10
-                
-                styles['Heading3'].fontSize = 16
-                styles['Heading3'].spaceAfter = 8
-                
-                # Aggiungiamo solo lo stile Code personalizzato che non esiste di default
-                styles.add(ParagraphStyle(
-                    name='CodeBlock',
-                    parent=styles['Code'],
-                    fontSize=9,
-                    fontName='Courier',
-                    backColor=colors.lightgrey,
-                    spaceBefore=8,
-                    spaceAfter=8
-                ))
-                
-                # Aggiungiamo stili per intestazione e piè di pagina
-                styles.add(ParagraphStyle(
-                    name='Header',
-                    parent=styles['Normal'],
-                    fontSize=8,
-                    textColor=colors.grey
-                ))
-                
-                styles.add(ParagraphStyle(
-                    name='Footer',
-                    parent=styles['Normal'],
-                    fontSize=8,
-                    textColor=colors.grey,
-                    alignment=1  # Centrato
-                ))
-                
-                # Funzione per aggiungere intestazione e piè di pagina
-                def header_footer(canvas, doc):
-                    # Salva lo stato
-                    canvas.saveState()
-                    
-                    # Intestazione
-                    header = corso['parametri']['titolo']
-                    canvas.setFont('Helvetica', 8)
-                    canvas.setFillColor(colors.grey)
-                    canvas.drawString(doc.leftMargin, doc.height + doc.topMargin - 10, header)
-                    
-                    # Piè di pagina con numero di pagina
-                    footer = f"Pagina {doc.page} / Generato con AI Course Builder"
-                    canvas.drawCentredString(doc.width/2 + doc.leftMargin, doc.bottomMargin - 20, footer)
-                    
-                    # Ripristina lo stato
-                    canvas.restoreState()
-                
-                # Creiamo il documento PDF con intestazione e piè di pagina
-                pdf_buffer = BytesIO()
-                doc = SimpleDocTemplate(
-                    pdf_buffer, 
-                    pagesize=A4,
-                    title=corso['parametri']['titolo'],
-                    author="Generato con AI Course Builder",
-                    leftMargin=2*cm, 
-                    rightMargin=2*cm, 
-                    topMargin=2*cm, 
-                    bottomMargin=2*cm
-                )
-                
-                # Impostiamo il template con intestazione e piè di pagina
-                from reportlab.platypus.doctemplate import PageTemplate, BaseDocTemplate
-                from reportlab.platypus.frames import Frame
-                
-                # Creiamo un frame per il contenuto principale
-                frame = Frame(
-                    doc.leftMargin,
-                    doc.bottomMargin,
-                    doc.width,
-                    doc.height,
-                    id='normal'
-                )
-                
-                # Aggiungiamo il template al documento
-                template = PageTemplate(
-                    id='main_template',
-                    frames=[frame],
-                    onPage=header_footer
-                )
-                
-                doc.addPageTemplates([template])
-                
-                # Funzione per convertire semplicemente HTML in elementi Platypus
-                def html_to_platypus(html):
-                    elements = []
-                    
-                    # Separiamo l'HTML in blocchi
-                    # Nota: questa è una semplificazione, un parser HTML completo sarebbe più robusto
-                    # ma molto più complesso da implementare
-                    
-                    # Titoli
-                    for i, section in enumerate(re.split(r'<h1[^>]*>(.*?)</h1>', html)):
-                        if i % 2 == 1:  # È un titolo h1
-                            text = re.sub(r'<[^>]+>', '', section)
-                            elements.append(Paragraph(text, styles['Heading1']))
-                            elements.append(Spacer(1, 0.5*cm))
-                        else:  # Contenuto tra titoli
-                            # h2
-                            for j, subsection in enumerate(re.split(r'<h2[^>]*>(.*?)</h2>', section)):
-                                if j % 2 == 1:  # È un titolo h2
-                                    text = re.sub(r'<[^>]+>', '', subsection)
-                                    elements.append(Paragraph(text, styles['Heading2']))
-                                    elements.append(Spacer(1, 0.3*cm))
-                                else:  # Contenuto tra sottotitoli
-                                    # h3
-                                    for k, subsubsection in enumerate(re.split(r'<h3[^>]*>(.*?)</h3>', subsection)):
-                                        if k % 2 == 1:  # È un titolo h3
-                                            text = re.sub(r'<[^>]+>', '', subsubsection)
-                                            elements.append(Paragraph(text, styles['Heading3']))
-                                            elements.append(Spacer(1, 0.2*cm))
-                                        else:  # Paragrafo normale
-                                            # Gestiamo i tag <p>
-                                            for p in re.split(r'<p[^>]*>(.*?)</p>', subsubsection):
-                                                if p.strip():
-                                                    # Gestiamo blocchi di codice
-                                                    if '<pre><code>' in p:
-                                                        code_parts = re.split(r'<pre><code>(.*?)</code></pre>', p, flags=re.DOTALL)
-                                                        for l, part in enumerate(code_parts):
-                                                            if l % 2 == 1:  # È un blocco di codice
-                                                                elements.append(Paragraph(part, styles['CodeBlock']))
-                                                            elif part.strip():  # Testo normale
-                                                                elements.append(Paragraph(part, styles['Normal']))
-                                                    else:
-                                                        # Testo normale (sostituzione di alcuni tag HTML comuni)
-                                                        p = re.sub(r'<strong>(.*?)</strong>', r'<b>\1</b>', p)
-                                                        p = re.sub(r'<em>(.*?)</em>', r'<i>\1</i>', p)
-                                                        p = re.sub(r'<code>(.*?)</code>', r'<font face="Courier">\1</font>', p)
-                                                        
-                                                        if p.strip():
-                                                            elements.append(Paragraph(p, styles['Normal']))
-                                                            elements.append(Spacer(1, 0.2*cm))
-                    
-                    return elements
-                
-                # Convertiamo HTML in elementi Platypus
-                story = []
-                
-                # Aggiungiamo il titolo del corso
-                story.append(Paragraph(corso['parametri']['titolo'], styles['Title']))
-                story.append(Spacer(1, 0.5*cm))
-                
-                # Aggiungiamo la descrizione
-                story.append(Paragraph("Descrizione del Corso", styles['Heading2']))
-                story.append(Paragraph(corso['parametri']['descrizione'], styles['Normal']))
-                story.append(Spacer(1, 0.3*cm))
-                
-                # Aggiungiamo i metadati
-                metadata = [
-                    ["Pubblico target:", corso['parametri']['pubblico_target']],
-                    ["Livello di complessità:", corso['parametri']['livello_complessita']],
-                    ["Tono:", corso['parametri']['tono']]
-                ]
-                
-                if corso['parametri'].get('requisiti_specifici'):
-                    metadata.append(["Requisiti specifici:", corso['parametri']['requisiti_specifici']])
-                
-                if corso['parametri'].get('stile_scrittura'):
-                    metadata.append(["Stile di scrittura:", corso['parametri']['stile_scrittura']])
-                
-                # Creiamo una tabella per i metadati
-                metadata_table = Table(metadata, colWidths=[4*cm, 12*cm])
-                metadata_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                    ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
-                    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                    ('TOPPADDING', (0, 0), (-1, -1), 6),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-                ]))
-                
-                story.append(metadata_table)
-                story.append(Spacer(1, 1*cm))
-                story.append(HRFlowable(width="100%", thickness=1, color=colors.grey))
-                story.append(Spacer(1, 0.5*cm))
-                
-                # Aggiungiamo un indice dei contenuti
-                story.append(Paragraph("Indice dei contenuti", styles['Heading2']))
-                story.append(Spacer(1, 0.3*cm))
-                
-                for i, capitolo in enumerate(corso["scaletta"]["capitoli"]):
-                    story.append(Paragraph(f"{i+1}. {capitolo['titolo']}", styles['Normal']))
-                
-                story.append(Spacer(1, 1*cm))
-                story.append(PageBreak())
-                
-                # Aggiungiamo i contenuti dei capitoli
-                for capitolo in corso["scaletta"]["capitoli"]:
-                    if capitolo["id"] in contenuti_corso:
-                        # Aggiungiamo il titolo del capitolo
-                        story.append(Paragraph(capitolo['titolo'], styles['Heading1']))
-                        story.append(Spacer(1, 0.3*cm))
-                        
-                        # Elaboriamo il contenuto del capitolo
-                        capitolo_html = markdown.markdown(contenuti_corso[capitolo["id"]], extensions=['tables', 'fenced_code'])
-                        story.extend(html_to_platypus(capitolo_html))
-                        
-                        # Aggiungiamo un'interruzione di pagina dopo ogni capitolo
-                        story.append(PageBreak())
-                
-                # Costruiamo il documento PDF
-                doc.build(story)
-                
-                # Otteniamo il contenuto del PDF
-                pdf_content = pdf_buffer.getvalue()
-                logger.info("PDF generato con successo tramite ReportLab")
-                
-                # Codifichiamo il contenuto del PDF in base64
-                pdf_base64 = base64.b64encode(pdf_content).decode('utf-8')
-                
-                return {
-                    "success": True,
-                    "message": "Corso esportato come PDF",
-                    "content": pdf_base64,
-                    "is_binary": True,
-                    "filename": f"{corso['parametri']['titolo'].lower().replace(' ', '_')}.pdf"
-                }
-            except Exception as e:
-                logger.error(f"Errore durante la conversione in PDF con ReportLab: {str(e)}")
-                
-                # Fallback: ritorniamo un messaggio informativo e suggeriamo di usare HTML
-                return {
-                    "success": False,
-                    "message": f"Non è stato possibile generare il PDF a causa di un errore: {str(e)}. " +
-                              "Ti consigliamo di esportare il corso in formato HTML e poi convertirlo in PDF " +
-                              "utilizzando il tuo browser o un convertitore online."
-                }
-        elif formato == "docx":
-            # Convertiamo il Markdown in DOCX
-            try:
-                import pypandoc
-                import tempfile
-                import os
-                import base64
-                
-                # Verifica se Pandoc è disponibile e tenta di scaricarlo se mancante
-                try:
-                    # Verifica se Pandoc è già installato
-                    pypandoc.get_pandoc_version()
-                except OSError:
-                    logger.warning("Pandoc non trovato. Tentativo di download automatico...")
-                    try:
-                        # Tenta di scaricare Pandoc automaticamente
-                        pypandoc.download_pandoc()
-                        logger.info("Pandoc scaricato con successo!")
-                    except Exception as e:
-                        logger.error(f"Impossibile scaricare Pandoc automaticamente: {str(e)}")
-                        return {
-                            "success": False,
-                            "message": "Per esportare in formato DOCX è necessario Pandoc. " +
-                                     "Puoi installarlo manualmente da http://pandoc.org/installing.html " +
-                                     "oppure esportare il corso in altro formato (HTML o PDF)."
-                        }
-                
-                # Creiamo un file Markdown temporaneo
-                with tempfile.NamedTemporaryFile(suffix='.md', delete=False, mode='w', encoding='utf-8') as md_file:
-                    md_file.write(contenuto_completo)
-                    md_path = md_file.name
-                
-                # Creiamo un percorso per il file DOCX temporaneo
-                docx_path = md_path.replace('.md', '.docx')
-                
-                # Convertiamo il Markdown in DOCX usando Pandoc
-                pypandoc.convert_file(md_path, 'docx', outputfile=docx_path)
-                
-                # Leggiamo il contenuto binario del file DOCX
-                with open(docx_path, 'rb') as docx_file:
-                    docx_content = docx_file.read()
-                
-                # Codifichiamo il contenuto in base64
-                docx_base64 = base64.b64encode(docx_content).decode('utf-8')
-                
-                # Puliamo i file temporanei
-                os.remove(md_path)
-                os.remove(docx_path)
-                
-                return {
-                    "success": True,
-                    "message": "Corso esportato come DOCX",
-                    "content": docx_base64,
-                    "is_binary": True,
-                    "filename": f"{corso['parametri']['titolo'].lower().replace(' ', '_')}.docx"
-                }
-            except ImportError as e:
-                logger.error(f"Errore di importazione durante la generazione DOCX: {str(e)}")
-                return {
-                    "success": False,
-                    "message": "Impossibile esportare in DOCX: la libreria pypandoc non è installata. " + 
-                              "Usa il comando 'pip install pypandoc' per installarla, oppure esporta il corso in un altro formato."
-                }
-            except Exception as e:
-                logger.error(f"Errore durante la conversione in DOCX: {str(e)}")
-                return {
-                    "success": False,
-                    "message": f"Errore durante la conversione in DOCX: {str(e)}. " +
-                              "Prova ad esportare il corso in un altro formato (HTML o PDF)."
-                }
-        else:
-            # Per altri formati, restituiamo un messaggio di implementazione futura
-            return {
-                "success": False,
-                "message": f"L'esportazione in formato {formato} non è ancora implementata"
-            }
-            
+        percorso = await prepara_esportazione(
+            corso, verifica["hash_contenuti"], lambda: carica_contenuti_corso(corso_id), formato, avanzamento
+        )
+        return {
+            "success": True,
+            "percorso": percorso,
+            "filename": nome_file(corso, formato),
+            "media_type": FORMATI_ESPORTAZIONE[formato]["media_type"],
+            **validazione
+        }
+    except ErroreEsportazione as e:
+        return {"success": False, "message": str(e), "status_code": e.status_code}
     except Exception as e:
         logger.error(f"Errore durante l'esportazione del corso: {str(e)}")
-        return {"success": False, "message": f"Errore durante l'esportazione del corso: {str(e)}"}
+        return {"success": False, "message": f"Errore durante l'esportazione del corso: {str(e)}", "status_code": 500}
+
+async def esporta_corso(corso_id: str, formato: str) -> Dict[str, Any]:
+    """
+    Esporta il corso nel formato specificato.
+    
+    Il file viene preparato sul server e scaricato dall'URL restituito, che lo invia
+    in streaming con il content type corretto e supporta le richieste Range.
+    
+    Args:
+        corso_id: ID del corso
+        formato: Formato di esportazione ('pdf', 'markdown', 'html', 'docx')
+        
+    Returns:
+        Un dizionario con i risultati dell'operazione e l'URL per il download
+    """
+    risultato = await file_esportazione(corso_id, formato)
+    if not risultato["success"]:
+        return {"success": False, "message": risultato["message"]}
+    
+    return {
+        "success": True,
+        "message": f"Corso esportato come {FORMATI_ESPORTAZIONE[formato]['etichetta']}",
+        "filename": risultato["filename"],
+        "url": f"/api/corso/{corso_id}/esporta/download?formato={formato}"
+    }
+
+def _descrizione_lavoro(lavoro: Dict[str, Any]) -> Dict[str, Any]:
+    """Stato pubblico di un'esportazione in background, con l'URL di download quando è completata."""
+    completato = lavoro["stato"] == "completato"
+    return {
+        "success": lavoro["stato"] != "errore",
+        "message": lavoro["message"],
+        "job_id": lavoro["id"],
+        "stato": lavoro["stato"],
+        "formato": lavoro["formato"],
+        "capitoli_completati": lavoro["capitoli_completati"],
+        "capitoli_totali": lavoro["capitoli_totali"],
+        "filename": lavoro.get("filename"),
+        "url": f"/api/esportazioni/{lavoro['id']}/download" if completato else None,
+        "scadenza": datetime.fromtimestamp(lavoro["scadenza"]).isoformat() if lavoro["scadenza"] else None
+    }
+
+async def avvia_esportazione(corso_id: str, formato: str) -> Dict[str, Any]:
+    """
+    Avvia l'esportazione del corso in background e restituisce subito l'ID del lavoro.
+    
+    L'avanzamento (capitoli convertiti) si legge con stato_esportazione(); a lavoro
+    completato lo stato contiene l'URL di download, valido per esportazioni_scadenza_minuti.
+    
+    Returns:
+        Lo stato del lavoro, oppure messaggio di errore e status_code HTTP da restituire
+    """
+    verifica = _verifica_esportabile(corso_id, formato)
+    if not verifica["success"]:
+        return verifica
+    
+    async def esegui(avanzamento: Callable[[int, int], None]) -> Dict[str, Any]:
+        return await file_esportazione(corso_id, formato, avanzamento)
+    
+    lavoro = lavori_esportazione.avvia(
+        corso_id, formato, len(verifica["corso"]["scaletta"]["capitoli"]), esegui
+    )
+    return _descrizione_lavoro(lavoro)
+
+def stato_esportazione(job_id: str) -> Dict[str, Any]:
+    """Restituisce stato e avanzamento di un'esportazione in background."""
+    lavoro = lavori_esportazione.stato(job_id)
+    if lavoro is None:
+        return {"success": False, "message": "Esportazione non trovata o scaduta", "status_code": 404}
+    return _descrizione_lavoro(lavoro)
+
+def file_lavoro_esportazione(job_id: str) -> Dict[str, Any]:
+    """
+    Restituisce il file di un'esportazione in background completata.
+    
+    Returns:
+        In caso di successo percorso, nome del file e content type; altrimenti
+        messaggio di errore e status_code HTTP da restituire
+    """
+    lavoro = lavori_esportazione.stato(job_id)
+    if lavoro is None:
+        return {"success": False, "message": "Esportazione non trovata o scaduta", "status_code": 404}
+    if lavoro["stato"] == "errore":
+        return {"success": False, "message": lavoro["message"], "status_code": lavoro.get("status_code", 500)}
+    if lavoro["stato"] != "completato":
+        return {"success": False, "message": "L'esportazione non è ancora completata", "status_code": 409}
+    return {
+        "success": True,
+        "percorso": lavoro["percorso"],
+        "filename": lavoro["filename"],
+        "media_type": lavoro["media_type"],
+        # Il file di un lavoro non cambia più: l'ID del lavoro basta come ETag
+        "etag": f'"{lavoro["id"]}"',
+        "ultima_modifica": data_http(datetime.fromtimestamp(lavoro["completato"]).isoformat())
+    }
+
+def _formati_pacchetto(formati: Optional[str]) -> List[str]:
+    """Formati di un pacchetto da un elenco separato da virgole, senza ripetizioni."""
+    if not formati:
+        return list(FORMATI_PACCHETTO)
+    return list(dict.fromkeys(f.strip().lower() for f in formati.split(",") if f.strip()))
+
+async def file_pacchetto(corso_id: str, formati: Optional[str] = None,
+                         copia_valida: Optional[Callable[[str, Optional[str]], bool]] = None) -> Dict[str, Any]:
+    """
+    Prepara il pacchetto ZIP del corso esportato in più formati per il download.
+
+    Args:
+        formati: Formati separati da virgole (es. 'pdf,epub'); tutti se non indicati
+        copia_valida: Come in file_esportazione()
+
+    Returns:
+        In caso di successo percorso, nome del file, content type, etag e ultima_modifica
+        (solo non_modificato, etag e ultima_modifica se la copia del client è valida);
+        altrimenti messaggio di errore e status_code HTTP da restituire
+    """
+    try:
+        elenco = _formati_pacchetto(formati)
+        verifica = _verifica_esportabile(corso_id, *elenco)
+        if not verifica["success"]:
+            return verifica
+
+        corso = verifica["corso"]
+        validazione = _validazione_esportazione(
+            corso_id, chiave_pacchetto(corso, verifica["hash_contenuti"], elenco)
+        )
+        if copia_valida is not None and copia_valida(validazione["etag"], validazione["ultima_modifica"]):
+            return {"success": True, "non_modificato": True, **validazione}
+
+        percorso = await prepara_pacchetto(
+            corso, verifica["hash_contenuti"], lambda: carica_contenuti_corso(corso_id), elenco
+        )
+        return {
+            "success": True,
+            "percorso": percorso,
+            "filename": nome_pacchetto(corso),
+            "media_type": "application/zip",
+            **validazione
+        }
+    except ErroreEsportazione as e:
+        return {"success": False, "message": str(e), "status_code": e.status_code}
+    except Exception as e:
+        logger.error(f"Errore durante l'esportazione del pacchetto: {str(e)}")
+        return {"success": False, "message": f"Errore durante l'esportazione del corso: {str(e)}", "status_code": 500}
+
+async def esporta_pacchetto(corso_id: str, formati: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Esporta il corso in più formati, raccolti in un pacchetto ZIP.
+
+    Il corso viene caricato e analizzato una volta sola per tutti i formati, che vengono
+    convertiti in parallelo: il tempo totale è vicino a quello del formato più lento.
+
+    Args:
+        corso_id: ID del corso
+        formati: Formati separati da virgole (es. 'pdf,epub'); tutti se non indicati
+
+    Returns:
+        Un dizionario con i risultati dell'operazione e l'URL per il download
+    """
+    risultato = await file_pacchetto(corso_id, formati)
+    if not risultato["success"]:
+        return {"success": False, "message": risultato["message"]}
+
+    elenco = ",".join(_formati_pacchetto(formati))
+    return {
+        "success": True,
+        "message": "Corso esportato come pacchetto ZIP",
+        "filename": risultato["filename"],
+        "url": f"/api/corso/{corso_id}/esporta/pacchetto/download?formati={elenco}"
+    }
 
 def percento_completamento(corso_id: str) -> int:
     """Calcola la percentuale di completamento del corso."""
-    corso = carica_corso(corso_id)
-    if not corso or not corso.get('scaletta'):
+    avanzamento = carica_avanzamento_corso(corso_id)
+    if not avanzamento:
         return 0
     
-    num_capitoli = len(corso['scaletta']['capitoli'])
-    if num_capitoli == 0:
+    return calcola_percentuale(avanzamento['capitoli_generati'], avanzamento['num_capitoli'])
+
+def calcola_percentuale(capitoli_generati: int, num_capitoli: int) -> int:
+    """Calcola la percentuale di completamento a partire dai contatori del corso."""
+    if not num_capitoli:
         return 0
     
-    contenuti = carica_contenuti_corso(corso_id)
-    capitoli_generati = 0
-    
-    for cap in corso['scaletta']['capitoli']:
-        if cap['id'] in contenuti:
-            capitoli_generati += 1
-    
     return round((capitoli_generati / num_capitoli) * 100)
 
+def stato_completamento(capitoli_generati: int, num_capitoli: int) -> str:
+    """Restituisce lo stato usato dai filtri della lista: completo, in-progress o non-iniziato."""
+    if num_capitoli and capitoli_generati >= num_capitoli:
+        return "completo"
+    if capitoli_generati:
+        return "in-progress"
+    return "non-iniziato"
+
+def elenco_corsi(limite: int = 20, cursore: Optional[str] = None, ordine: str = "recenti",
+                 stato: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Restituisce una pagina della lista dei corsi pronta per le card.
+    
+    Ogni corso è arricchito con percentuale di completamento e stato; la pagina
+    successiva si richiede passando il cursore restituito.
+    """
+    pagina = lista_corsi_pagina(limite, cursore, ordine, stato)
+    for corso in pagina["corsi"]:
+        corso["percentuale"] = calcola_percentuale(corso["capitoli_generati"], corso["num_capitoli"])
+        corso["stato"] = stato_completamento(corso["capitoli_generati"], corso["num_capitoli"])
+    return pagina
+
 def carica_contenuto_capitolo(corso_id: str, capitolo_id: str) -> Optional[str]:
     """Carica il contenuto di un capitolo dal database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute(
-            "SELECT contenuto FROM contenuti_capitoli WHERE corso_id = ? AND capitolo_id = ? AND generato = 1",
-            (corso_id, capitolo_id)
-        )
-        
-        risultato = cursor.fetchone()
-        if risultato:
-            contenuto = risultato[0]
+        contenuto = carica_contenuto(corso_id, capitolo_id)
+        if contenuto is not None:
             # Standardizza il contenuto esistente
             contenuto = standardizza_markdown(contenuto, "generic")
-            return contenuto
-        return None
+        return contenuto
     except Exception as e:
         print(f"Errore nel caricamento del contenuto del capitolo: {e}")
         return None
-    finally:
-        conn.close()
+
+async def sezioni_html_capitolo(corso_id: str, capitolo_id: str, hash_contenuto: str) -> Dict[str, Any]:
+    """
+    Restituisce l'HTML di un capitolo, diviso in sezioni, per la versione del contenuto indicata.
+    
+    Le sezioni sono in cache per hash del contenuto: con un hit il contenuto non viene
+    letto. Una versione non più in cache può essere resa solo se è ancora quella
+    corrente (le pagine aperte prima di una modifica devono essere ricaricate).
+    
+    Returns:
+        In caso di successo le sezioni; altrimenti messaggio di errore e status_code HTTP
+    """
+    sezioni = html_capitoli.cerca(hash_contenuto)
+    if sezioni is not None:
+        return {"success": True, "sezioni": sezioni}
+    
+    metadati = carica_metadati_capitolo(corso_id, capitolo_id)
+    if metadati is None:
+        return {"success": False, "message": "Contenuto non trovato", "status_code": 404}
+    if metadati["hash_contenuto"] != hash_contenuto:
+        return {"success": False, "message": "Il contenuto del capitolo è cambiato: ricarica la pagina",
+                "status_code": 409}
+    
+    def carica() -> Optional[str]:
+        contenuto = carica_contenuto(corso_id, capitolo_id)
+        # Una modifica arrivata nel frattempo non deve finire in cache con l'hash precedente
+        if contenuto is None or hashlib.sha256(contenuto.encode("utf-8")).hexdigest() != hash_contenuto:
+            return None
+        return standardizza_markdown(contenuto, "generic")
+    
+    try:
+        sezioni = await html_capitoli.sezioni(hash_contenuto, carica)
+    except Exception as e:
+        logger.error(f"Errore nel rendering del capitolo {capitolo_id}: {str(e)}")
+        return {"success": False, "message": f"Errore nel rendering del capitolo: {str(e)}", "status_code": 500}
+    if sezioni is None:
+        return {"success": False, "message": "Il contenuto del capitolo è cambiato: ricarica la pagina",
+                "status_code": 409}
+    return {"success": True, "sezioni": sezioni}
 
 def capitolo_generato(corso_id: str, capitolo_id: str) -> bool:
     """Verifica se un capitolo è stato generato."""
-    return carica_contenuto_capitolo(corso_id, capitolo_id) is not None
+    return carica_metadati_capitolo(corso_id, capitolo_id) is not None
 
 async def espandi_contenuti_corso(corso_id: str, parametri_espansione: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -985,8 +887,8 @@ async def espandi_contenuti_corso(corso_id: str, parametri_espansione: Dict[str,
             "message": "Nessun contenuto trovato per questo corso"
         }
     
-    # Inizializza il client AI
-    ai_client = create_ai_client()
+    # Client AI della richiesta
+    ai_client = get_ai_client()
     
     # Estrai i parametri di espansione
     fattore_espansione = parametri_espansione.get("fattore_espansione", 3)
@@ -1032,6 +934,9 @@ async def espandi_contenuti_corso(corso_id: str, parametri_espansione: Dict[str,
     capitolo_ripresa = parametri_espansione.get("capitolo_ripresa", None)
     sezione_ripresa = parametri_espansione.get("sezione_ripresa", None)
     
+    # I metadati indicano quali capitoli sono già stati espansi, senza rileggerne il contenuto
+    metadati_capitoli = carica_metadati_capitoli(corso_id) if capitolo_ripresa else {}
+    
     # Espandi ogni capitolo
     for i, capitolo in enumerate(corso["scaletta"]["capitoli"]):
         capitolo_id = capitolo["id"]
@@ -1043,13 +948,15 @@ async def espandi_contenuti_corso(corso_id: str, parametri_espansione: Dict[str,
         # Se è specificato un capitolo di ripresa, salta fino a quel capitolo
         if capitolo_ripresa and capitolo_id != capitolo_ripresa:
             # Verifica se questo capitolo è già stato espanso in precedenza
-            contenuto_espanso = carica_contenuto_capitolo(corso_id, capitolo_id)
-            if contenuto_espanso and len(contenuto_espanso) > len(contenuti.get(capitolo_id, "")):
+            metadati = metadati_capitoli.get(capitolo_id)
+            if metadati and metadati["stato"] == "espanso":
                 # Il capitolo è già stato espanso, aggiorna lo stato
+                lunghezza_originale = metadati["lunghezza_originale"] or 0
+                lunghezza_espansa = metadati["lunghezza_caratteri"]
                 risultato["dettagli_capitoli"][i]["espanso"] = True
-                risultato["dettagli_capitoli"][i]["lunghezza_originale"] = len(contenuti.get(capitolo_id, ""))
-                risultato["dettagli_capitoli"][i]["lunghezza_espansa"] = len(contenuto_espanso)
-                risultato["dettagli_capitoli"][i]["fattore_reale"] = round(len(contenuto_espanso) / len(contenuti.get(capitolo_id, "")), 1)
+                risultato["dettagli_capitoli"][i]["lunghezza_originale"] = lunghezza_originale
+                risultato["dettagli_capitoli"][i]["lunghezza_espansa"] = lunghezza_espansa
+                risultato["dettagli_capitoli"][i]["fattore_reale"] = round(lunghezza_espansa / lunghezza_originale, 1) if lunghezza_originale > 0 else 0
                 risultato["capitoli_espansi"] += 1
                 _espansione_stato[corso_id] = risultato
             continue
@@ -1291,7 +1198,8 @@ Fornisci il contenuto espanso in formato Markdown, mantenendo i titoli e la stru
                 corso_id=corso_id,
                 capitolo_id=capitolo_id,
                 contenuto=contenuto_espanso,
-                modello_utilizzato=risposta_ai.get("modello_utilizzato", "AI")
+                modello_utilizzato=risposta_ai.get("modello_utilizzato", "AI"),
+                espanso=True
             )
             
             if success:
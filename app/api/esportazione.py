@@ -0,0 +1,618 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from importlib.util import find_spec
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.api.pool_rendering import PoolSaturo, TimeoutRendering, pool_rendering
+from app.models.cache_esportazioni import cache_esportazioni
+
+logger = logging.getLogger(__name__)
+
+# Formati supportati: estensione, content type ed etichetta per i messaggi
+FORMATI_ESPORTAZIONE: Dict[str, Dict[str, str]] = {
+    "markdown": {"estensione": "md", "media_type": "text/markdown; charset=utf-8", "etichetta": "Markdown"},
+    "html": {"estensione": "html", "media_type": "text/html; charset=utf-8", "etichetta": "HTML"},
+    "pdf": {"estensione": "pdf", "media_type": "application/pdf", "etichetta": "PDF"},
+    "docx": {
+        "estensione": "docx",
+        "media_type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "etichetta": "DOCX",
+    },
+    "epub": {"estensione": "epub", "media_type": "application/epub+zip", "etichetta": "EPUB"},
+    "sito": {"estensione": "zip", "media_type": "application/zip", "etichetta": "sito statico"},
+}
+
+# Versione di ogni renderer: va incrementata quando cambia l'output di un formato,
+# così i file già in cache con la versione precedente non vengono più usati
+VERSIONI_RENDERER: Dict[str, int] = {
+    "markdown": 1,
+    "html": 1,
+    "pdf": 3,
+    "docx": 2,
+    "epub": 1,
+    "sito": 1,
+}
+
+# Pseudo-corso della cache sotto cui sono salvati i PDF dei singoli capitoli: sono
+# indirizzati per contenuto, quindi sopravvivono all'invalidazione del corso e una
+# modifica a un capitolo richiede di impaginare di nuovo solo quel capitolo
+CAPITOLI_PDF = "_capitoli_pdf"
+
+# Come CAPITOLI_PDF, per le pagine dei capitoli del sito statico e le loro varianti precompresse
+PAGINE_SITO = "_pagine_sito"
+
+# Formati la cui conversione impegna la CPU per secondi su un corso intero:
+# vengono eseguiti nel pool di processi, fuori dall'event loop
+FORMATI_IN_PROCESSO = {"html", "pdf", "docx", "epub", "sito"}
+
+# Formati scritti dall'albero Markdown del corso: in un pacchetto vengono scritti
+# insieme nello stesso processo, così il testo viene analizzato una volta sola
+FORMATI_DA_ALBERO = ["html", "docx", "epub"]
+
+# Formati del pacchetto ZIP quando non ne vengono richiesti di specifici
+FORMATI_PACCHETTO = ["markdown", "html", "pdf", "docx", "epub"]
+
+# Formati già compressi, archiviati nel pacchetto senza comprimerli di nuovo
+FORMATI_COMPRESSI = {"pdf", "docx", "epub", "sito"}
+
+class ErroreEsportazione(Exception):
+    """Errore di esportazione con un messaggio da mostrare all'utente e lo status HTTP da restituire."""
+
+    def __init__(self, messaggio: str, status_code: int = 500):
+        super().__init__(messaggio)
+        self.status_code = status_code
+
+def nome_file(corso: Dict[str, Any], formato: str) -> str:
+    """Nome del file scaricato, derivato dal titolo del corso."""
+    titolo = corso["parametri"]["titolo"].lower().replace(" ", "_")
+    return f"{titolo}.{FORMATI_ESPORTAZIONE[formato]['estensione']}"
+
+def nome_pacchetto(corso: Dict[str, Any]) -> str:
+    """Nome del pacchetto ZIP scaricato, derivato dal titolo del corso."""
+    return f"{corso['parametri']['titolo'].lower().replace(' ', '_')}.zip"
+
+def componi_markdown(corso: Dict[str, Any], contenuti: Dict[str, str]) -> str:
+    """Compone il Markdown completo del corso: intestazione e capitoli nell'ordine della scaletta."""
+    parametri = corso["parametri"]
+    parti = [
+        f"# {parametri['titolo']}\n\n",
+        f"## Descrizione del Corso\n\n{parametri['descrizione']}\n\n",
+        f"**Pubblico target:** {parametri['pubblico_target']}\n\n",
+        f"**Livello di complessità:** {parametri['livello_complessita']}\n\n",
+    ]
+    for capitolo in corso["scaletta"]["capitoli"]:
+        parti.append(f"# {capitolo['titolo']}\n\n")
+        if capitolo["id"] in contenuti:
+            parti.append(contenuti[capitolo["id"]])
+            parti.append("\n\n")
+    return "".join(parti)
+
+class DocumentoCorso:
+    """
+    Il corso da esportare, composto una sola volta e condiviso da tutti i formati.
+
+    testo è il Markdown completo del corso; markdown è il suo albero, analizzato alla
+    prima richiesta e poi riusato dai formati scritti nello stesso processo.
+    """
+
+    def __init__(self, corso: Dict[str, Any], contenuti: Dict[str, str]):
+        self.corso = corso
+        self.contenuti = contenuti
+        self.testo = componi_markdown(corso, contenuti)
+        self._markdown = None
+
+    @property
+    def markdown(self):
+        """DocumentoMarkdown del testo del corso."""
+        if self._markdown is None:
+            from app.api.markdown_albero import AlberoMarkdown
+
+            self._markdown = AlberoMarkdown().analizza(self.testo)
+        return self._markdown
+
+def _scrivi_markdown(percorso: Path, documento: DocumentoCorso):
+    percorso.write_text(documento.testo, encoding="utf-8")
+
+def _scrivi_html(percorso: Path, documento: DocumentoCorso):
+    corso = documento.corso
+    try:
+        # Convertiamo il contenuto Markdown in HTML
+        html_content = documento.markdown.html()
+    except ImportError as e:
+        logger.error(f"Errore di importazione durante la generazione HTML: {str(e)}")
+        raise ErroreEsportazione(f"Impossibile esportare in HTML: libreria mancante. Errore: {str(e)}")
+
+    # Aggiungiamo un template HTML base per renderizzarlo presentabile
+    html_output = f"""<!DOCTYPE html>
+<html lang="it">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{corso['parametri']['titolo']}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
+        h1, h2, h3 {{ color: #2c3e50; }}
+        code {{ background-color: #f8f9fa; padding: 2px 4px; border-radius: 4px; }}
+        pre {{ background-color: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto; }}
+        blockquote {{ border-left: 4px solid #ccc; padding-left: 10px; margin-left: 0; }}
+        table {{ border-collapse: collapse; width: 100%; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; }}
+        th {{ background-color: #f2f2f2; }}
+    </style>
+</head>
+<body>
+    {html_content}
+</body>
+</html>"""
+    percorso.write_text(html_output, encoding="utf-8")
+
+_MESSAGGIO_ERRORE_PDF = (
+    "Ti consigliamo di esportare il corso in formato HTML e poi convertirlo in PDF "
+    "utilizzando il tuo browser o un convertitore online."
+)
+
+def _errore_pdf(e: Exception) -> ErroreEsportazione:
+    logger.error(f"Errore durante la conversione in PDF con ReportLab: {str(e)}")
+    return ErroreEsportazione(
+        f"Non è stato possibile generare il PDF a causa di un errore: {str(e)}. " + _MESSAGGIO_ERRORE_PDF
+    )
+
+def _scrivi_pdf(percorso: Path, documento: DocumentoCorso):
+    # Generiamo un PDF dal contenuto Markdown usando ReportLab (soluzione nativa), come documento unico
+    try:
+        from app.api.esportazione_pdf import scrivi_pdf
+
+        logger.info("Iniziando la conversione in PDF con ReportLab (soluzione nativa)")
+        scrivi_pdf(percorso, documento.corso, documento.contenuti)
+        logger.info("PDF generato con successo tramite ReportLab")
+    except Exception as e:
+        raise _errore_pdf(e)
+
+def scrivi_capitolo_pdf(percorso: Path, titolo: str, testo: str):
+    """Scrive il PDF di un capitolo; eseguita nel pool di rendering."""
+    try:
+        from app.api.esportazione_pdf import scrivi_capitolo_pdf as scrivi
+
+        scrivi(percorso, titolo, testo)
+    except Exception as e:
+        raise _errore_pdf(e)
+
+def unisci_pdf(percorso: Path, corso: Dict[str, Any], parti: List[Tuple[str, str]]):
+    """Unisce i PDF dei capitoli nel documento finale; eseguita nel pool di rendering."""
+    try:
+        from app.api.esportazione_pdf import unisci_pdf as unisci
+
+        unisci(percorso, corso, parti)
+        logger.info(f"PDF unito da {len(parti)} capitoli")
+    except Exception as e:
+        raise _errore_pdf(e)
+
+def _scrivi_docx(percorso: Path, documento: DocumentoCorso):
+    # Il documento Word viene scritto direttamente dall'albero Markdown, senza pandoc
+    try:
+        from app.api.esportazione_docx import scrivi_docx
+
+        scrivi_docx(str(percorso), documento.corso, documento.markdown)
+    except Exception as e:
+        logger.error(f"Errore durante la conversione in DOCX: {str(e)}")
+        raise ErroreEsportazione(
+            f"Errore durante la conversione in DOCX: {str(e)}. " +
+            "Prova ad esportare il corso in un altro formato (HTML o PDF)."
+        )
+
+def _scrivi_epub(percorso: Path, documento: DocumentoCorso):
+    # L'e-book viene scritto dallo stesso albero Markdown del documento Word
+    try:
+        from app.api.esportazione_epub import scrivi_epub
+
+        scrivi_epub(str(percorso), documento.corso, documento.markdown)
+    except Exception as e:
+        logger.error(f"Errore durante la conversione in EPUB: {str(e)}")
+        raise ErroreEsportazione(
+            f"Errore durante la conversione in EPUB: {str(e)}. " +
+            "Prova ad esportare il corso in un altro formato (HTML o PDF)."
+        )
+
+def _scrivi_sito(percorso: Path, documento: DocumentoCorso):
+    # Tutte le pagine da capo; prepara_esportazione usa invece _scrivi_sito_per_capitoli
+    from app.api.esportazione_sito import nome_pagina, scrivi_pagine, scrivi_sito, varianti_compresse
+
+    corso = documento.corso
+    capitoli = [c for c in corso["scaletta"]["capitoli"] if c["id"] in documento.contenuti]
+    vicini = [(nome_pagina(c), c["titolo"]) for c in capitoli]
+    with tempfile.TemporaryDirectory() as temporanea:
+        pagine = [
+            (corso["parametri"]["titolo"], capitolo["titolo"], documento.contenuti[capitolo["id"]],
+             vicini[i - 1] if i else None, vicini[i + 1] if i + 1 < len(vicini) else None,
+             str(Path(temporanea) / nome_pagina(capitolo)))
+            for i, capitolo in enumerate(capitoli)
+        ]
+        scrivi_pagine(pagine)
+        file_sito = [
+            (f"{nome}{variante}", str(Path(temporanea) / f"{nome}{variante}"))
+            for nome, _ in vicini for variante in [""] + varianti_compresse()
+        ]
+        scrivi_sito(percorso, corso, file_sito)
+
+_RENDERER: Dict[str, Callable[[Path, DocumentoCorso], None]] = {
+    "markdown": _scrivi_markdown,
+    "html": _scrivi_html,
+    "pdf": _scrivi_pdf,
+    "docx": _scrivi_docx,
+    "epub": _scrivi_epub,
+    "sito": _scrivi_sito,
+}
+
+def chiave_esportazione(corso: Dict[str, Any], hash_contenuti: Dict[str, str], formato: str) -> str:
+    """
+    Calcola la chiave di cache di un'esportazione: impronta di parametri del corso,
+    titoli e ordine dei capitoli e hash dei loro contenuti, formato e versione del renderer.
+    """
+    dati = {
+        "parametri": corso["parametri"],
+        "capitoli": [
+            [capitolo["id"], capitolo["titolo"], hash_contenuti.get(capitolo["id"])]
+            for capitolo in corso["scaletta"]["capitoli"]
+        ],
+        "formato": formato,
+        "renderer": VERSIONI_RENDERER[formato],
+    }
+    impronta = hashlib.sha256(json.dumps(dati, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return f"{formato}-{impronta.hexdigest()[:32]}"
+
+def chiave_pagina_sito(titolo_corso: str, capitolo: Dict[str, Any], hash_contenuto: str,
+                       precedente: Optional[Tuple[str, str]], successivo: Optional[Tuple[str, str]]) -> str:
+    """
+    Chiave di cache della pagina di un capitolo del sito: tutto ciò che compare nella
+    pagina (titoli, contenuto, collegamenti ai capitoli vicini) e la versione del renderer.
+    """
+    dati = [titolo_corso, capitolo["id"], capitolo["titolo"], hash_contenuto, precedente, successivo,
+            VERSIONI_RENDERER["sito"]]
+    impronta = hashlib.sha256(json.dumps(dati, ensure_ascii=False).encode("utf-8"))
+    return f"pagina-{impronta.hexdigest()[:32]}"
+
+def chiave_capitolo_pdf(capitolo: Dict[str, Any], hash_contenuto: str) -> str:
+    """Chiave di cache del PDF di un capitolo: titolo, hash del contenuto e versione del renderer."""
+    dati = [capitolo["titolo"], hash_contenuto, VERSIONI_RENDERER["pdf"]]
+    impronta = hashlib.sha256(json.dumps(dati, ensure_ascii=False).encode("utf-8"))
+    return f"capitolo-{impronta.hexdigest()[:32]}"
+
+def converti(formato: str, percorso: Path, documento: DocumentoCorso):
+    """Scrive il documento del corso in percorso nel formato indicato."""
+    _RENDERER[formato](percorso, documento)
+
+def converti_formati(destinazioni: List[Tuple[str, Path]], documento: DocumentoCorso):
+    """
+    Scrive il documento del corso in più formati; eseguita nel pool di rendering.
+
+    I formati condividono l'albero Markdown del documento, analizzato al primo che lo usa.
+    """
+    for formato, percorso in destinazioni:
+        _RENDERER[formato](percorso, documento)
+
+def scrivi_pacchetto(percorso: Path, voci: List[Tuple[str, str, bool]]):
+    """
+    Scrive il pacchetto ZIP dei file esportati; eseguita nel pool di rendering.
+
+    Args:
+        voci: (nome nell'archivio, percorso del file, True se il file è già compresso)
+    """
+    with zipfile.ZipFile(percorso, "w") as archivio:
+        for nome, file, compresso in voci:
+            archivio.write(file, nome, compress_type=zipfile.ZIP_STORED if compresso else zipfile.ZIP_DEFLATED)
+
+@contextmanager
+def _errori_rendering(descrizione: str, corso_id: str):
+    """Traduce i limiti del pool di rendering in ErroreEsportazione con lo status HTTP corrispondente."""
+    try:
+        yield
+    except PoolSaturo as e:
+        raise ErroreEsportazione(str(e), 503)
+    except TimeoutRendering as e:
+        logger.error(f"Esportazione {descrizione} del corso {corso_id} scaduta: {str(e)}")
+        raise ErroreEsportazione(f"{str(e)}. Prova ad esportare il corso in un altro formato.", 504)
+
+async def _scrivi_formato(formato: str, destinazione: Path, documento: DocumentoCorso,
+                          hash_contenuti: Dict[str, str], avanzamento: Optional[Callable[[int, int], None]] = None):
+    """
+    Scrive un formato in destinazione, nel pool di rendering se è in FORMATI_IN_PROCESSO.
+
+    avanzamento(completati, totali) viene chiamata man mano che i capitoli sono pronti,
+    per i formati convertiti un capitolo alla volta (PDF e sito).
+    """
+    if formato not in FORMATI_IN_PROCESSO:
+        converti(formato, destinazione, documento)
+        return
+    with _errori_rendering(formato, documento.corso["id"]):
+        if formato == "pdf" and find_spec("reportlab") and find_spec("pypdf"):
+            await _scrivi_pdf_per_capitoli(
+                destinazione, documento.corso, documento.contenuti, hash_contenuti, avanzamento
+            )
+        elif formato == "sito":
+            await _scrivi_sito_per_capitoli(destinazione, documento, hash_contenuti, avanzamento)
+        else:
+            await pool_rendering.esegui(converti, formato, destinazione, documento)
+
+async def prepara_esportazione(corso: Dict[str, Any], hash_contenuti: Dict[str, str],
+                               carica_contenuti: Callable[[], Dict[str, str]], formato: str,
+                               avanzamento: Optional[Callable[[int, int], None]] = None) -> Path:
+    """
+    Restituisce il file esportato del corso nel formato richiesto, dalla cache se presente.
+
+    Se il corso non è cambiato dall'ultima esportazione nello stesso formato il file in
+    cache viene restituito senza caricare i contenuti né ricomporre il documento; lo
+    stesso file resta disponibile per riprendere un download con una richiesta Range.
+    Le conversioni in FORMATI_IN_PROCESSO vengono eseguite nel pool di rendering.
+
+    Args:
+        hash_contenuti: capitolo_id -> hash del contenuto, per calcolare la chiave di cache
+        carica_contenuti: Funzione che carica i testi dei capitoli, chiamata solo in caso di miss
+        avanzamento: Funzione chiamata con (capitoli completati, capitoli totali) durante la conversione
+
+    Raises:
+        ErroreEsportazione: se il formato non è supportato, la conversione non riesce
+            o il pool di rendering è saturo o scade
+    """
+    if formato not in FORMATI_ESPORTAZIONE:
+        raise ErroreEsportazione(
+            f"Formato non supportato. Formati disponibili: {', '.join(FORMATI_ESPORTAZIONE)}", 400
+        )
+    estensione = FORMATI_ESPORTAZIONE[formato]["estensione"]
+
+    chiave = chiave_esportazione(corso, hash_contenuti, formato)
+    percorso = cache_esportazioni.cerca(corso["id"], chiave, estensione)
+    if percorso is not None:
+        return percorso
+
+    documento = DocumentoCorso(corso, carica_contenuti())
+
+    async def scrivi(destinazione: Path):
+        await _scrivi_formato(formato, destinazione, documento, hash_contenuti, avanzamento)
+
+    return await cache_esportazioni.salva(corso["id"], chiave, estensione, scrivi)
+
+def chiave_pacchetto(corso: Dict[str, Any], hash_contenuti: Dict[str, str], formati: List[str]) -> str:
+    """Chiave di cache di un pacchetto: impronta delle chiavi dei formati che contiene, nell'ordine."""
+    chiavi = [chiave_esportazione(corso, hash_contenuti, formato) for formato in formati]
+    impronta = hashlib.sha256("\n".join(chiavi).encode("utf-8"))
+    return f"pacchetto-{impronta.hexdigest()[:32]}"
+
+async def prepara_pacchetto(corso: Dict[str, Any], hash_contenuti: Dict[str, str],
+                            carica_contenuti: Callable[[], Dict[str, str]],
+                            formati: Optional[List[str]] = None) -> Path:
+    """
+    Restituisce il pacchetto ZIP con il corso esportato in più formati, dalla cache se presente.
+
+    I contenuti vengono caricati e composti una volta sola per tutti i formati. Quelli
+    già in cache (anche da esportazioni singole) non vengono riconvertiti; degli altri,
+    i formati in FORMATI_DA_ALBERO sono scritti insieme in un solo task del pool, che
+    analizza il Markdown una volta sola, mentre il PDF viene impaginato in parallelo
+    capitolo per capitolo. Ogni formato prodotto resta in cache anche da solo.
+
+    Args:
+        formati: Formati da includere, nell'ordine; predefiniti FORMATI_PACCHETTO
+
+    Raises:
+        ErroreEsportazione: se un formato non è supportato, una conversione non riesce
+            o il pool di rendering è saturo o scade
+    """
+    formati = list(dict.fromkeys(formati or FORMATI_PACCHETTO))
+    non_supportati = [f for f in formati if f not in FORMATI_ESPORTAZIONE]
+    if non_supportati:
+        raise ErroreEsportazione(
+            f"Formato non supportato: {', '.join(non_supportati)}. "
+            f"Formati disponibili: {', '.join(FORMATI_ESPORTAZIONE)}", 400
+        )
+
+    chiave = chiave_pacchetto(corso, hash_contenuti, formati)
+    percorso = cache_esportazioni.cerca(corso["id"], chiave, "zip")
+    if percorso is not None:
+        return percorso
+
+    # I file dei formati restano collegati fuori dalla cache finché il pacchetto non è scritto
+    directory = cache_esportazioni.directory / corso["id"]
+    directory.mkdir(parents=True, exist_ok=True)
+    collegati = Path(tempfile.mkdtemp(prefix=".formati-", dir=directory))
+    try:
+        file: Dict[str, Optional[Path]] = {}
+        for formato in formati:
+            chiave_formato = chiave_esportazione(corso, hash_contenuti, formato)
+            estensione = FORMATI_ESPORTAZIONE[formato]["estensione"]
+            file[formato] = cache_esportazioni.cerca(
+                corso["id"], chiave_formato, estensione, collegati / f"{chiave_formato}.{estensione}"
+            )
+        mancanti = [formato for formato in formati if file[formato] is None]
+        if mancanti:
+            documento = DocumentoCorso(corso, carica_contenuti())
+            await _scrivi_pacchetto_formati(mancanti, documento, hash_contenuti, file, collegati)
+
+        async def scrivi(destinazione: Path):
+            voci = [(nome_file(corso, f), str(file[f]), f in FORMATI_COMPRESSI) for f in formati]
+            with _errori_rendering("pacchetto", corso["id"]):
+                await pool_rendering.esegui(scrivi_pacchetto, destinazione, voci)
+
+        return await cache_esportazioni.salva(corso["id"], chiave, "zip", scrivi)
+    finally:
+        shutil.rmtree(collegati, ignore_errors=True)
+
+async def _scrivi_pacchetto_formati(formati: List[str], documento: DocumentoCorso,
+                                    hash_contenuti: Dict[str, str], file: Dict[str, Optional[Path]],
+                                    collegati: Path):
+    """
+    Scrive i formati mancanti di un pacchetto e li salva in cache, aggiornando file con
+    i loro collegamenti in collegati.
+    """
+    corso = documento.corso
+
+    async def singolo(formato: str):
+        async def scrivi(destinazione: Path):
+            await _scrivi_formato(formato, destinazione, documento, hash_contenuti)
+
+        chiave = chiave_esportazione(corso, hash_contenuti, formato)
+        estensione = FORMATI_ESPORTAZIONE[formato]["estensione"]
+        file[formato] = await cache_esportazioni.salva(
+            corso["id"], chiave, estensione, scrivi, collegati / f"{chiave}.{estensione}"
+        )
+
+    async def da_albero(gruppo: List[str]):
+        voci = [
+            (chiave_esportazione(corso, hash_contenuti, formato), FORMATI_ESPORTAZIONE[formato]["estensione"])
+            for formato in gruppo
+        ]
+
+        async def scrivi(temporanea: Path):
+            destinazioni = [(formato, temporanea / f"{chiave}.{estensione}")
+                            for formato, (chiave, estensione) in zip(gruppo, voci)]
+            with _errori_rendering("pacchetto", corso["id"]):
+                await pool_rendering.esegui(converti_formati, destinazioni, documento)
+
+        for formato, percorso in zip(gruppo, await _salva_scritti(corso["id"], scrivi, voci, collegati)):
+            file[formato] = percorso
+
+    gruppo = [formato for formato in formati if formato in FORMATI_DA_ALBERO]
+    lavori = [singolo(formato) for formato in formati if formato not in FORMATI_DA_ALBERO]
+    if len(gruppo) > 1:
+        lavori.append(da_albero(gruppo))
+    else:
+        lavori.extend(singolo(formato) for formato in gruppo)
+    await asyncio.gather(*lavori)
+
+async def _scrivi_pdf_per_capitoli(destinazione: Path, corso: Dict[str, Any], contenuti: Dict[str, str],
+                                   hash_contenuti: Dict[str, str],
+                                   avanzamento: Optional[Callable[[int, int], None]] = None):
+    """
+    Scrive il PDF del corso impaginando i capitoli in parallelo nel pool di rendering.
+
+    Ogni capitolo inizia su una pagina nuova, quindi può essere impaginato da solo; i PDF
+    dei capitoli restano in cache (CAPITOLI_PDF) e vengono poi uniti da unisci_pdf, che
+    aggiunge indice, numerazione e segnalibri. Un'esportazione occupa al massimo
+    rendering_processi posti del pool, così un corso lungo non satura la coda.
+    Senza pypdf il PDF viene scritto come documento unico.
+
+    Le parti vengono collegate in una directory temporanea dell'esportazione fino
+    all'unione: l'LRU della cache può rimuoverle senza far fallire l'esportazione.
+    """
+    limite = asyncio.Semaphore(pool_rendering.processi)
+    capitoli = [c for c in corso["scaletta"]["capitoli"] if c["id"] in contenuti]
+    completati = 0
+    collegate = Path(tempfile.mkdtemp(prefix=".parti-", dir=destinazione.parent))
+
+    async def parte(capitolo: Dict[str, Any]) -> Tuple[str, str]:
+        chiave = chiave_capitolo_pdf(capitolo, hash_contenuti.get(capitolo["id"], ""))
+        collegata = collegate / f"{chiave}.pdf"
+        percorso = cache_esportazioni.cerca(CAPITOLI_PDF, chiave, "pdf", collegata)
+        if percorso is None:
+            async def scrivi(destinazione_capitolo: Path):
+                async with limite:
+                    await pool_rendering.esegui(
+                        scrivi_capitolo_pdf, destinazione_capitolo, capitolo["titolo"], contenuti[capitolo["id"]]
+                    )
+            percorso = await cache_esportazioni.salva(CAPITOLI_PDF, chiave, "pdf", scrivi, collegata)
+        nonlocal completati
+        completati += 1
+        if avanzamento:
+            avanzamento(completati, len(capitoli))
+        return capitolo["titolo"], str(percorso)
+
+    try:
+        parti = await asyncio.gather(*(parte(capitolo) for capitolo in capitoli))
+        await pool_rendering.esegui(unisci_pdf, destinazione, corso, list(parti))
+    finally:
+        shutil.rmtree(collegate, ignore_errors=True)
+
+async def _salva_scritti(corso_id: str, scrivi: Callable[[Path], Awaitable[None]],
+                         voci: List[Tuple[str, str]], collega_in: Optional[Path] = None) -> List[Path]:
+    """
+    Salva in cache più file prodotti da un solo task del pool.
+
+    scrivi riceve una directory temporanea accanto alla cache e deve scriverci un file
+    "{chiave}.{estensione}" per ogni voce (chiave, estensione); i file vengono poi spostati
+    nella posizione definitiva come fa cache_esportazioni.salva. Con collega_in ogni file
+    viene anche collegato in quella directory, con lo stesso nome, e vengono restituiti
+    i collegamenti.
+    """
+    directory = cache_esportazioni.directory / corso_id
+    directory.mkdir(parents=True, exist_ok=True)
+    temporanea = Path(tempfile.mkdtemp(prefix=".scrittura-", dir=directory))
+    try:
+        await scrivi(temporanea)
+        percorsi = []
+        for chiave, estensione in voci:
+            async def sposta(destinazione: Path, scritto: Path = temporanea / f"{chiave}.{estensione}"):
+                os.replace(scritto, destinazione)
+
+            collegato = collega_in / f"{chiave}.{estensione}" if collega_in is not None else None
+            percorsi.append(await cache_esportazioni.salva(corso_id, chiave, estensione, sposta, collegato))
+        return percorsi
+    finally:
+        shutil.rmtree(temporanea, ignore_errors=True)
+
+async def _scrivi_sito_per_capitoli(destinazione: Path, documento: DocumentoCorso, hash_contenuti: Dict[str, str],
+                                    avanzamento: Optional[Callable[[int, int], None]] = None):
+    """
+    Scrive il sito statico del corso rigenerando solo le pagine cambiate.
+
+    Le pagine dei capitoli, con le varianti .gz e .br, restano in cache (PAGINE_SITO)
+    indirizzate per contenuto: dopo la modifica di un capitolo viene riscritta e
+    ricompressa solo la sua pagina, mentre le altre vengono riprese dalla cache. Le
+    pagine mancanti sono scritte in un solo task del pool; indice e foglio di stile
+    vengono generati insieme all'archivio. Come le parti del PDF, le pagine vengono
+    collegate in una directory temporanea fino alla scrittura dell'archivio.
+    """
+    from app.api.esportazione_sito import nome_pagina, scrivi_pagine, scrivi_sito, varianti_compresse
+
+    corso = documento.corso
+    titolo_corso = corso["parametri"]["titolo"]
+    estensioni = ["html"] + [f"html{variante}" for variante in varianti_compresse()]
+    capitoli = [c for c in corso["scaletta"]["capitoli"] if c["id"] in documento.contenuti]
+    vicini = [(nome_pagina(c), c["titolo"]) for c in capitoli]
+
+    collegate = Path(tempfile.mkdtemp(prefix=".pagine-", dir=destinazione.parent))
+    try:
+        pagine = []
+        da_scrivere = []
+        percorsi: Dict[Tuple[str, str], Path] = {}
+        for i, capitolo in enumerate(capitoli):
+            precedente = vicini[i - 1] if i else None
+            successivo = vicini[i + 1] if i + 1 < len(vicini) else None
+            chiave = chiave_pagina_sito(titolo_corso, capitolo, hash_contenuti.get(capitolo["id"], ""),
+                                        precedente, successivo)
+            trovati = [cache_esportazioni.cerca(PAGINE_SITO, chiave, estensione, collegate / f"{chiave}.{estensione}")
+                       for estensione in estensioni]
+            if None in trovati:
+                da_scrivere.append((capitolo, chiave, precedente, successivo))
+            else:
+                percorsi.update(((chiave, estensione), t) for estensione, t in zip(estensioni, trovati))
+            pagine.append((capitolo, chiave))
+
+        if avanzamento:
+            avanzamento(len(pagine) - len(da_scrivere), len(pagine))
+        if da_scrivere:
+            async def scrivi(temporanea: Path):
+                await pool_rendering.esegui(scrivi_pagine, [
+                    (titolo_corso, capitolo["titolo"], documento.contenuti[capitolo["id"]], precedente, successivo,
+                     str(temporanea / f"{chiave}.html"))
+                    for capitolo, chiave, precedente, successivo in da_scrivere
+                ])
+
+            voci = [(chiave, estensione) for _, chiave, _, _ in da_scrivere for estensione in estensioni]
+            percorsi.update(zip(voci, await _salva_scritti(PAGINE_SITO, scrivi, voci, collegate)))
+            logger.info(f"Sito del corso {corso['id']}: {len(da_scrivere)} pagine su {len(pagine)} riscritte")
+            if avanzamento:
+                avanzamento(len(pagine), len(pagine))
+
+        file_sito = [
+            (nome_pagina(capitolo) + estensione[len("html"):], str(percorsi[(chiave, estensione)]))
+            for capitolo, chiave in pagine for estensione in estensioni
+        ]
+        await pool_rendering.esegui(scrivi_sito, destinazione, corso, file_sito)
+    finally:
+        shutil.rmtree(collegate, ignore_errors=True)
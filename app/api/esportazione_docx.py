@@ -0,0 +1,338 @@
+import re
+import zipfile
+from datetime import datetime, timezone
+from typing import IO, Any, Dict, FrozenSet, List, Optional, Tuple, Union
+from xml.etree.ElementTree import Element
+from xml.sax.saxutils import escape, quoteattr
+
+from app.api.markdown_albero import AlberoMarkdown, DocumentoMarkdown, dividi_voce
+
+AUTORE = "Generato con AI Course Builder"
+
+# Caratteri non ammessi in XML 1.0
+_RE_NON_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_NS_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_REL_BASE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+# Formattazione dei run per i tag inline, nell'ordine richiesto dallo schema di <w:rPr>
+_PROPRIETA_RUN = {
+    "link": '<w:rStyle w:val="Hyperlink"/>',
+    "codice": '<w:rFonts w:ascii="Courier New" w:hAnsi="Courier New" w:cs="Courier New"/>',
+    "grassetto": "<w:b/>",
+    "corsivo": "<w:i/>",
+    "barrato": "<w:strike/>",
+    "pedice": '<w:vertAlign w:val="subscript"/>',
+    "apice": '<w:vertAlign w:val="superscript"/>',
+}
+_FORMATO_INLINE = {
+    "strong": "grassetto",
+    "b": "grassetto",
+    "em": "corsivo",
+    "i": "corsivo",
+    "del": "barrato",
+    "s": "barrato",
+    "code": "codice",
+    "sub": "pedice",
+    "sup": "apice",
+}
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+<Override PartName="/word/numbering.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"/>
+<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>
+</Types>"""
+
+_RELS = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="{_REL_BASE}/officeDocument" Target="word/document.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>
+</Relationships>"""
+
+def _stile_titolo(livello: int, dimensione: int) -> str:
+    return (
+        f'<w:style w:type="paragraph" w:styleId="Heading{livello}"><w:name w:val="heading {livello}"/>'
+        f'<w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:qFormat/>'
+        f'<w:pPr><w:keepNext/><w:spacing w:before="240" w:after="120"/><w:outlineLvl w:val="{livello - 1}"/></w:pPr>'
+        f'<w:rPr><w:b/><w:color w:val="2C3E50"/><w:sz w:val="{dimensione}"/></w:rPr></w:style>'
+    )
+
+_STILI = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:styles xmlns:w="{_NS_W}">'
+    '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>'
+    '<w:sz w:val="22"/><w:lang w:val="it-IT"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="264" w:lineRule="auto"/></w:pPr></w:pPrDefault></w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:next w:val="Normal"/><w:qFormat/><w:pPr><w:spacing w:after="240"/><w:jc w:val="center"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="48"/></w:rPr></w:style>'
+    + "".join(_stile_titolo(livello, dimensione)
+              for livello, dimensione in ((1, 36), (2, 30), (3, 26), (4, 24), (5, 22), (6, 22)))
+    + '<w:style w:type="paragraph" w:styleId="SourceCode"><w:name w:val="Source Code"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:shd w:val="clear" w:color="auto" w:fill="F2F2F2"/><w:spacing w:after="0" w:line="240" w:lineRule="auto"/></w:pPr>'
+    '<w:rPr><w:rFonts w:ascii="Courier New" w:hAnsi="Courier New" w:cs="Courier New"/><w:sz w:val="18"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Quote"><w:name w:val="Quote"/><w:basedOn w:val="Normal"/><w:qFormat/>'
+    '<w:pPr><w:pBdr><w:left w:val="single" w:sz="18" w:space="8" w:color="CCCCCC"/></w:pBdr><w:ind w:left="360"/></w:pPr>'
+    '<w:rPr><w:i/><w:color w:val="555555"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="ListParagraph"><w:name w:val="List Paragraph"/><w:basedOn w:val="Normal"/>'
+    '<w:qFormat/><w:pPr><w:spacing w:after="60"/><w:ind w:left="720"/></w:pPr></w:style>'
+    '<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/>'
+    '<w:rPr><w:color w:val="0563C1"/><w:u w:val="single"/></w:rPr></w:style>'
+    '<w:style w:type="table" w:styleId="TableGrid"><w:name w:val="Table Grid"/>'
+    '<w:tblPr><w:tblBorders><w:top w:val="single" w:sz="4" w:space="0" w:color="BFBFBF"/>'
+    '<w:left w:val="single" w:sz="4" w:space="0" w:color="BFBFBF"/><w:bottom w:val="single" w:sz="4" w:space="0" w:color="BFBFBF"/>'
+    '<w:right w:val="single" w:sz="4" w:space="0" w:color="BFBFBF"/><w:insideH w:val="single" w:sz="4" w:space="0" w:color="BFBFBF"/>'
+    '<w:insideV w:val="single" w:sz="4" w:space="0" w:color="BFBFBF"/></w:tblBorders>'
+    '<w:tblCellMar><w:left w:w="108" w:type="dxa"/><w:right w:w="108" w:type="dxa"/></w:tblCellMar></w:tblPr></w:style>'
+    '</w:styles>'
+)
+
+def _livelli_numerazione(formato: str) -> str:
+    """I nove livelli di una definizione di elenco puntato ("bullet") o numerato ("decimal")."""
+    simboli = ["•", "◦", "▪"]
+    livelli = []
+    for livello in range(9):
+        testo = simboli[livello % 3] if formato == "bullet" else f"%{livello + 1}."
+        livelli.append(
+            f'<w:lvl w:ilvl="{livello}"><w:start w:val="1"/><w:numFmt w:val="{formato}"/>'
+            f'<w:lvlText w:val="{testo}"/><w:lvlJc w:val="left"/>'
+            f'<w:pPr><w:ind w:left="{720 * (livello + 1)}" w:hanging="360"/></w:pPr></w:lvl>'
+        )
+    return "".join(livelli)
+
+def _xml(testo: str) -> str:
+    return escape(_RE_NON_XML.sub("", testo))
+
+class ScrittoreDocx:
+    """
+    Scrive un documento Word (.docx) dall'albero Markdown, senza pandoc né file temporanei.
+
+    Visita una sola volta l'albero prodotto da AlberoMarkdown, come il convertitore PDF,
+    e genera direttamente il WordprocessingML: titoli, paragrafi con grassetto, corsivo,
+    codice e link, elenchi puntati e numerati anche annidati, tabelle con riga di
+    intestazione ripetuta, citazioni, blocchi di codice e linee orizzontali. Il file
+    .docx (un archivio ZIP) viene scritto direttamente nella destinazione indicata,
+    che può essere un percorso o un buffer in memoria.
+    """
+
+    def __init__(self):
+        self._albero = AlberoMarkdown()
+        self._documento: Optional[DocumentoMarkdown] = None
+        self._parti: List[str] = []
+        self._link: List[str] = []
+        # numId 1 è l'elenco puntato condiviso; ogni elenco numerato ha il proprio numId per ripartire da capo
+        self._elenchi_numerati: List[Tuple[int, int]] = []
+
+    def scrivi(self, destinazione: Union[str, IO[bytes]], titolo: str, testo: str):
+        """Converte il testo Markdown e scrive il documento in destinazione."""
+        self.scrivi_documento(destinazione, titolo, self._albero.analizza(testo))
+
+    def scrivi_documento(self, destinazione: Union[str, IO[bytes]], titolo: str, documento: DocumentoMarkdown):
+        """Scrive in destinazione il documento di un testo già analizzato."""
+        self._documento = documento
+        self._parti = []
+        self._link = []
+        self._elenchi_numerati = []
+        self._blocchi(documento.radice, None, 0)
+
+        corpo = "".join(self._parti)
+        documento = (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<w:document xmlns:w="{_NS_W}" xmlns:r="{_NS_R}"><w:body>{corpo}'
+            '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+            '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134" w:header="709" w:footer="709" w:gutter="0"/>'
+            '</w:sectPr></w:body></w:document>'
+        )
+
+        with zipfile.ZipFile(destinazione, "w", zipfile.ZIP_DEFLATED) as archivio:
+            archivio.writestr("[Content_Types].xml", _CONTENT_TYPES)
+            archivio.writestr("_rels/.rels", _RELS)
+            archivio.writestr("docProps/core.xml", self._proprieta(titolo))
+            archivio.writestr("word/_rels/document.xml.rels", self._relazioni())
+            archivio.writestr("word/styles.xml", _STILI)
+            archivio.writestr("word/numbering.xml", self._numerazione())
+            archivio.writestr("word/document.xml", documento)
+
+    def _proprieta(self, titolo: str) -> str:
+        adesso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+            f'<dc:title>{_xml(titolo)}</dc:title><dc:creator>{_xml(AUTORE)}</dc:creator>'
+            f'<dcterms:created xsi:type="dcterms:W3CDTF">{adesso}</dcterms:created>'
+            '</cp:coreProperties>'
+        )
+
+    def _relazioni(self) -> str:
+        relazioni = [
+            f'<Relationship Id="rIdStili" Type="{_REL_BASE}/styles" Target="styles.xml"/>',
+            f'<Relationship Id="rIdNumerazione" Type="{_REL_BASE}/numbering" Target="numbering.xml"/>',
+        ]
+        for i, href in enumerate(self._link, 1):
+            relazioni.append(
+                f'<Relationship Id="rIdLink{i}" Type="{_REL_BASE}/hyperlink" '
+                f'Target={quoteattr(_RE_NON_XML.sub("", href))} TargetMode="External"/>'
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(relazioni) + '</Relationships>'
+        )
+
+    def _numerazione(self) -> str:
+        parti = [
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:numbering xmlns:w="{_NS_W}">',
+            f'<w:abstractNum w:abstractNumId="0">{_livelli_numerazione("bullet")}</w:abstractNum>',
+            f'<w:abstractNum w:abstractNumId="1">{_livelli_numerazione("decimal")}</w:abstractNum>',
+            '<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>',
+        ]
+        for num_id, (livello, inizio) in enumerate(self._elenchi_numerati, 2):
+            parti.append(
+                f'<w:num w:numId="{num_id}"><w:abstractNumId w:val="1"/>'
+                f'<w:lvlOverride w:ilvl="{livello}"><w:startOverride w:val="{inizio}"/></w:lvlOverride></w:num>'
+            )
+        parti.append('</w:numbering>')
+        return "".join(parti)
+
+    # --- Contenuto inline ---------------------------------------------------
+
+    def _run(self, testo: str, formato: FrozenSet[str]) -> str:
+        if not testo:
+            return ""
+        proprieta = "".join(v for k, v in _PROPRIETA_RUN.items() if k in formato)
+        proprieta = f"<w:rPr>{proprieta}</w:rPr>" if proprieta else ""
+        return f'<w:r>{proprieta}<w:t xml:space="preserve">{_xml(testo)}</w:t></w:r>'
+
+    def _inline(self, elemento: Element, formato: FrozenSet[str] = frozenset()) -> str:
+        """Run del contenuto inline di un elemento (testo e figli, senza la coda dell'elemento)."""
+        parti = [self._run(self._documento.testo(elemento.text), formato)]
+        for figlio in elemento:
+            tag = figlio.tag
+            if tag in _FORMATO_INLINE:
+                parti.append(self._inline(figlio, formato | {_FORMATO_INLINE[tag]}))
+            elif tag == "a":
+                self._link.append(figlio.get("href", ""))
+                contenuto = self._inline(figlio, formato | {"link"})
+                parti.append(f'<w:hyperlink r:id="rIdLink{len(self._link)}">{contenuto}</w:hyperlink>')
+            elif tag == "br":
+                parti.append("<w:r><w:br/></w:r>")
+            elif tag == "img":
+                parti.append(self._run(self._documento.testo(figlio.get("alt", "")), formato))
+            else:
+                parti.append(self._inline(figlio, formato))
+            parti.append(self._run(self._documento.testo(figlio.tail), formato))
+        return "".join(parti)
+
+    # --- Blocchi ------------------------------------------------------------
+
+    def _paragrafo(self, contenuto: str, stile: Optional[str] = None, numerazione: str = "", extra: str = ""):
+        # Ordine dello schema di <w:pPr>: stile, numerazione, bordi
+        proprieta = (f'<w:pStyle w:val="{stile}"/>' if stile else "") + numerazione + extra
+        self._parti.append(f'<w:p>{f"<w:pPr>{proprieta}</w:pPr>" if proprieta else ""}{contenuto}</w:p>')
+
+    def _blocchi(self, contenitore: Element, stile: Optional[str], livello: int):
+        """Scrive i figli di blocco di un elemento; stile è lo stile dei paragrafi (None per Normal)."""
+        for elemento in contenitore:
+            tag = elemento.tag
+            if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+                self._paragrafo(self._inline(elemento), f"Heading{tag[1]}")
+            elif tag in ("p", "pre"):
+                codice = self._documento.codice(elemento)
+                if codice is not None:
+                    self._codice(codice)
+                else:
+                    self._paragrafo(self._inline(elemento), stile)
+            elif tag in ("ul", "ol"):
+                self._elenco(elemento, stile, livello)
+            elif tag == "blockquote":
+                self._blocchi(elemento, "Quote", livello)
+            elif tag == "table":
+                self._tabella(elemento)
+            elif tag == "hr":
+                self._paragrafo(
+                    "", stile, extra='<w:pBdr><w:bottom w:val="single" w:sz="6" w:space="1" w:color="999999"/></w:pBdr>'
+                )
+            else:
+                # Contenitori generici: testo proprio come paragrafo, poi i blocchi figli
+                testo = self._documento.testo(elemento.text)
+                if testo.strip():
+                    self._paragrafo(self._run(testo, frozenset()), stile)
+                self._blocchi(elemento, stile, livello)
+
+    def _codice(self, testo: str):
+        # Un paragrafo per riga, così Word mantiene rientri e righe vuote
+        for riga in testo.split("\n"):
+            self._paragrafo(self._run(riga, frozenset()), "SourceCode")
+
+    def _elenco(self, elemento: Element, stile: Optional[str], livello: int):
+        livello = min(livello, 8)
+        if elemento.tag == "ol":
+            self._elenchi_numerati.append((livello, int(elemento.get("start", "1"))))
+            num_id = len(self._elenchi_numerati) + 1
+        else:
+            num_id = 1
+        numerazione = f'<w:numPr><w:ilvl w:val="{livello}"/><w:numId w:val="{num_id}"/></w:numPr>'
+
+        for voce in elemento.findall("li"):
+            inline, figli = dividi_voce(voce)
+            numerata = False
+            if len(inline) or (inline.text or "").strip():
+                self._paragrafo(self._inline(inline), "ListParagraph", numerazione)
+                numerata = True
+            for figlio in figli:
+                if figlio.tag == "p" and self._documento.codice(figlio) is None:
+                    # Il primo paragrafo porta il numero della voce, i successivi sono solo rientrati
+                    self._paragrafo(self._inline(figlio), "ListParagraph", "" if numerata else numerazione)
+                    numerata = True
+                elif figlio.tag in ("ul", "ol"):
+                    self._elenco(figlio, stile, livello + 1)
+                else:
+                    contenitore = Element("li")
+                    contenitore.append(figlio)
+                    self._blocchi(contenitore, stile, livello + 1)
+            if not numerata and not figli:
+                self._paragrafo("", "ListParagraph", numerazione)
+
+    def _tabella(self, elemento: Element):
+        righe = [list(riga) for riga in elemento.iter("tr")]
+        if not righe:
+            return
+        colonne = max(len(r) for r in righe)
+        larghezza = 5000 // colonne  # in cinquantesimi di punto percentuale
+
+        parti = [
+            '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="5000" w:type="pct"/>'
+            '<w:tblLook w:firstRow="1"/></w:tblPr><w:tblGrid>',
+            "".join('<w:gridCol/>' for _ in range(colonne)),
+            '</w:tblGrid>',
+        ]
+        intestazione = True
+        for celle in righe:
+            # Le righe di sole intestazioni all'inizio della tabella si ripetono su ogni pagina
+            intestazione = intestazione and bool(celle) and all(c.tag == "th" for c in celle)
+            parti.append('<w:tr>' + ('<w:trPr><w:tblHeader/></w:trPr>' if intestazione else ''))
+            for cella in celle + [None] * (colonne - len(celle)):
+                contenuto = ""
+                if cella is not None:
+                    contenuto = self._inline(cella, frozenset({"grassetto"}) if cella.tag == "th" else frozenset())
+                sfondo = '<w:shd w:val="clear" w:color="auto" w:fill="F2F2F2"/>' if intestazione else ""
+                parti.append(
+                    f'<w:tc><w:tcPr><w:tcW w:w="{larghezza}" w:type="pct"/>{sfondo}</w:tcPr>'
+                    f'<w:p><w:pPr><w:spacing w:after="0"/></w:pPr>{contenuto}</w:p></w:tc>'
+                )
+            parti.append('</w:tr>')
+        parti.append('</w:tbl>')
+        self._parti.append("".join(parti))
+        # Un paragrafo vuoto separa la tabella dal blocco successivo
+        self._paragrafo("")
+
+def scrivi_docx(destinazione: Union[str, IO[bytes]], corso: Dict[str, Any], documento: DocumentoMarkdown):
+    """Scrive il documento Word del corso (Markdown già composto e analizzato) in destinazione, percorso o buffer."""
+    ScrittoreDocx().scrivi_documento(destinazione, corso["parametri"]["titolo"], documento)
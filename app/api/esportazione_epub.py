@@ -0,0 +1,165 @@
+import re
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+from xml.etree.ElementTree import Element, SubElement, tostring
+from xml.sax.saxutils import escape, quoteattr
+
+from app.api.markdown_albero import DocumentoMarkdown
+
+AUTORE = "Generato con AI Course Builder"
+
+# Attributi dell'HTML di Python-Markdown che restano validi in XHTML
+_ATTRIBUTI = {"href", "title", "start", "style", "id"}
+
+# Caratteri non ammessi in XML 1.0
+_RE_NON_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_CONTAINER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+    '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>'
+    '</container>'
+)
+
+_STILE = """body { font-family: serif; line-height: 1.5; }
+h1, h2, h3 { color: #2c3e50; }
+code { font-family: monospace; background-color: #f8f9fa; }
+pre { background-color: #f8f9fa; padding: 0.5em; white-space: pre-wrap; }
+blockquote { border-left: 4px solid #ccc; padding-left: 0.6em; margin-left: 0; color: #555; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #ddd; padding: 0.3em; }
+th { background-color: #f2f2f2; }
+"""
+
+def _xml(testo: str) -> str:
+    return escape(_RE_NON_XML.sub("", testo))
+
+def _pagina(titolo: str, corpo: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html>\n'
+        f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="it" xml:lang="it">'
+        f'<head><meta charset="UTF-8"/><title>{_xml(titolo)}</title>'
+        '<link rel="stylesheet" type="text/css" href="stile.css"/></head>'
+        f'<body>{corpo}</body></html>'
+    )
+
+class ScrittoreEpub:
+    """
+    Scrive un e-book EPUB 3 dall'albero Markdown del corso.
+
+    Il documento viene diviso in una sezione XHTML per ogni titolo di primo livello
+    (il frontespizio e i capitoli del corso); i nodi dell'albero sono copiati in XHTML
+    ben formato, con l'HTML grezzo ridotto al suo testo come negli altri formati.
+    Indice di navigazione (nav.xhtml e toc.ncx per i lettori EPUB 2) e manifest sono
+    generati dalle sezioni.
+    """
+
+    def __init__(self, documento: DocumentoMarkdown):
+        self._documento = documento
+
+    def scrivi(self, destinazione: Union[str, IO[bytes]], titolo: str, identificativo: str):
+        """Scrive l'e-book in destinazione, percorso o buffer."""
+        sezioni = self._sezioni(titolo)
+        with zipfile.ZipFile(destinazione, "w", zipfile.ZIP_DEFLATED) as archivio:
+            # Il mimetype deve essere il primo file dell'archivio, non compresso
+            archivio.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            archivio.writestr("META-INF/container.xml", _CONTAINER)
+            archivio.writestr("OEBPS/content.opf", self._pacchetto(titolo, identificativo, sezioni))
+            archivio.writestr("OEBPS/nav.xhtml", self._indice(titolo, sezioni))
+            archivio.writestr("OEBPS/toc.ncx", self._ncx(titolo, identificativo, sezioni))
+            archivio.writestr("OEBPS/stile.css", _STILE)
+            for nome, titolo_sezione, corpo in sezioni:
+                archivio.writestr(f"OEBPS/{nome}", _pagina(titolo_sezione, corpo))
+
+    def _sezioni(self, titolo: str) -> List[Tuple[str, str, str]]:
+        """(nome del file, titolo, corpo XHTML) di ogni sezione, divise ai titoli di primo livello."""
+        gruppi: List[List[Element]] = []
+        for elemento in self._documento.radice:
+            if elemento.tag == "h1" or not gruppi:
+                gruppi.append([])
+            gruppi[-1].append(self._xhtml(elemento))
+        if not gruppi:
+            gruppi.append([])
+
+        sezioni = []
+        for i, elementi in enumerate(gruppi, 1):
+            titolo_sezione = titolo
+            if elementi and elementi[0].tag == "h1":
+                titolo_sezione = "".join(elementi[0].itertext()).strip() or titolo
+            corpo = "".join(tostring(e, encoding="unicode") for e in elementi)
+            sezioni.append((f"sezione-{i:03d}.xhtml", titolo_sezione, corpo))
+        return sezioni
+
+    def _xhtml(self, elemento: Element) -> Element:
+        """Copia di un nodo dell'albero come XHTML, con testi e segnaposto risolti."""
+        codice = self._documento.codice(elemento)
+        if codice is not None:
+            pre = Element("pre")
+            SubElement(pre, "code").text = _RE_NON_XML.sub("", codice)
+            pre.tail = _RE_NON_XML.sub("", self._documento.testo(elemento.tail))
+            return pre
+
+        if elemento.tag == "img":
+            # Le immagini esterne non fanno parte dell'e-book: resta il testo alternativo
+            copia = Element("span")
+            copia.text = _RE_NON_XML.sub("", self._documento.testo(elemento.get("alt", "")))
+        else:
+            copia = Element(elemento.tag, {k: v for k, v in elemento.attrib.items() if k in _ATTRIBUTI})
+            copia.text = _RE_NON_XML.sub("", self._documento.testo(elemento.text))
+            for figlio in elemento:
+                copia.append(self._xhtml(figlio))
+        copia.tail = _RE_NON_XML.sub("", self._documento.testo(elemento.tail))
+        return copia
+
+    def _pacchetto(self, titolo: str, identificativo: str, sezioni: List[Tuple[str, str, str]]) -> str:
+        modificato = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        manifest = [
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+            '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>',
+            '<item id="stile" href="stile.css" media-type="text/css"/>',
+        ]
+        spine = []
+        for i, (nome, _, _) in enumerate(sezioni, 1):
+            manifest.append(f'<item id="s{i}" href="{nome}" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="s{i}"/>')
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id" xml:lang="it">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="id">{_xml(identificativo)}</dc:identifier>'
+            f'<dc:title>{_xml(titolo)}</dc:title><dc:language>it</dc:language>'
+            f'<dc:creator>{AUTORE}</dc:creator>'
+            f'<meta property="dcterms:modified">{modificato}</meta>'
+            f'</metadata><manifest>{"".join(manifest)}</manifest>'
+            f'<spine toc="ncx">{"".join(spine)}</spine></package>'
+        )
+
+    def _indice(self, titolo: str, sezioni: List[Tuple[str, str, str]]) -> str:
+        voci = "".join(
+            f'<li><a href="{nome}">{_xml(titolo_sezione)}</a></li>' for nome, titolo_sezione, _ in sezioni
+        )
+        corpo = f'<nav epub:type="toc" id="toc"><h1>Indice dei contenuti</h1><ol>{voci}</ol></nav>'
+        return _pagina(titolo, corpo)
+
+    def _ncx(self, titolo: str, identificativo: str, sezioni: List[Tuple[str, str, str]]) -> str:
+        punti = "".join(
+            f'<navPoint id="p{i}" playOrder="{i}"><navLabel><text>{_xml(titolo_sezione)}</text></navLabel>'
+            f'<content src={quoteattr(nome)}/></navPoint>'
+            for i, (nome, titolo_sezione, _) in enumerate(sezioni, 1)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+            f'<head><meta name="dtb:uid" content={quoteattr(identificativo)}/></head>'
+            f'<docTitle><text>{_xml(titolo)}</text></docTitle><navMap>{punti}</navMap></ncx>'
+        )
+
+def scrivi_epub(destinazione: Union[str, IO[bytes]], corso: Dict[str, Any], documento: DocumentoMarkdown,
+                identificativo: Optional[str] = None):
+    """Scrive l'e-book EPUB del corso (Markdown già composto e analizzato) in destinazione, percorso o buffer."""
+    if identificativo is None:
+        # Stabile per corso, così i lettori riconoscono le nuove esportazioni come lo stesso libro
+        identificativo = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, 'corso:' + str(corso.get('id', '')))}"
+    ScrittoreEpub(documento).scrivi(destinazione, corso["parametri"]["titolo"], identificativo)
@@ -0,0 +1,253 @@
+import io
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import StyleSheet1, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from reportlab.platypus.doctemplate import PageTemplate
+from reportlab.platypus.flowables import HRFlowable
+from reportlab.platypus.frames import Frame
+
+from app.api.markdown_platypus import ConvertitorePlatypus
+
+logger = logging.getLogger(__name__)
+
+MARGINE = 2 * cm
+AUTORE = "Generato con AI Course Builder"
+
+def stili_pdf() -> StyleSheet1:
+    """Foglio di stile dei PDF esportati."""
+    styles = getSampleStyleSheet()
+
+    # Modifichiamo gli stili esistenti invece di aggiungerne di nuovi
+    styles['Heading1'].fontSize = 24
+    styles['Heading1'].spaceAfter = 12
+
+    styles['Heading2'].fontSize = 18
+    styles['Heading2'].spaceAfter = 10
+
+    styles['Heading3'].fontSize = 16
+    styles['Heading3'].spaceAfter = 8
+    return styles
+
+def _disegna_intestazione(canvas: Canvas, titolo: str, pagina: int):
+    """Disegna intestazione (titolo del corso) e piè di pagina (numero di pagina) sulla pagina corrente."""
+    larghezza, altezza = A4
+    canvas.saveState()
+
+    # Intestazione
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawString(MARGINE, altezza - MARGINE - 10, titolo)
+
+    # Piè di pagina con numero di pagina
+    canvas.drawCentredString(larghezza / 2, MARGINE - 20, f"Pagina {pagina} / {AUTORE}")
+
+    canvas.restoreState()
+
+def _documento(destinazione, titolo: str, intestazione: bool) -> SimpleDocTemplate:
+    """Documento A4 con i margini dell'export; con intestazione=True ogni pagina ha intestazione e piè di pagina."""
+    doc = SimpleDocTemplate(
+        destinazione,
+        pagesize=A4,
+        title=titolo,
+        author=AUTORE,
+        leftMargin=MARGINE,
+        rightMargin=MARGINE,
+        topMargin=MARGINE,
+        bottomMargin=MARGINE
+    )
+    if intestazione:
+        def header_footer(canvas, doc):
+            _disegna_intestazione(canvas, titolo, doc.page)
+
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+        doc.addPageTemplates([PageTemplate(id='main_template', frames=[frame], onPage=header_footer)])
+    return doc
+
+def _storia_introduzione(corso: Dict[str, Any], styles: StyleSheet1,
+                         pagine_capitoli: Optional[Sequence[int]] = None) -> List[Any]:
+    """
+    Flowable della parte iniziale: titolo, descrizione, metadati e indice dei contenuti.
+
+    Con pagine_capitoli l'indice riporta la pagina iniziale di ogni capitolo.
+    """
+    story = []
+
+    # Aggiungiamo il titolo del corso
+    story.append(Paragraph(corso['parametri']['titolo'], styles['Title']))
+    story.append(Spacer(1, 0.5*cm))
+
+    # Aggiungiamo la descrizione
+    story.append(Paragraph("Descrizione del Corso", styles['Heading2']))
+    story.append(Paragraph(corso['parametri']['descrizione'], styles['Normal']))
+    story.append(Spacer(1, 0.3*cm))
+
+    # Aggiungiamo i metadati
+    metadata = [
+        ["Pubblico target:", corso['parametri']['pubblico_target']],
+        ["Livello di complessità:", corso['parametri']['livello_complessita']],
+        ["Tono:", corso['parametri']['tono']]
+    ]
+
+    if corso['parametri'].get('requisiti_specifici'):
+        metadata.append(["Requisiti specifici:", corso['parametri']['requisiti_specifici']])
+
+    if corso['parametri'].get('stile_scrittura'):
+        metadata.append(["Stile di scrittura:", corso['parametri']['stile_scrittura']])
+
+    # Creiamo una tabella per i metadati
+    metadata_table = Table(metadata, colWidths=[4*cm, 12*cm])
+    metadata_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
+        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+
+    story.append(metadata_table)
+    story.append(Spacer(1, 1*cm))
+    story.append(HRFlowable(width="100%", thickness=1, color=colors.grey))
+    story.append(Spacer(1, 0.5*cm))
+
+    # Aggiungiamo un indice dei contenuti
+    story.append(Paragraph("Indice dei contenuti", styles['Heading2']))
+    story.append(Spacer(1, 0.3*cm))
+
+    capitoli = corso["scaletta"]["capitoli"]
+    if pagine_capitoli is None:
+        for i, capitolo in enumerate(capitoli):
+            story.append(Paragraph(f"{i+1}. {capitolo['titolo']}", styles['Normal']))
+    else:
+        # Una riga per capitolo con il numero di pagina allineato a destra: la larghezza
+        # delle righe non dipende dai numeri, quindi l'indice occupa sempre le stesse pagine
+        indice = Table(
+            [[Paragraph(f"{i+1}. {capitolo['titolo']}", styles['Normal']), str(pagina)]
+             for i, (capitolo, pagina) in enumerate(zip(capitoli, pagine_capitoli))],
+            colWidths=["88%", "12%"]
+        )
+        indice.setStyle(TableStyle([
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ]))
+        story.append(indice)
+
+    story.append(Spacer(1, 1*cm))
+    return story
+
+def scrivi_pdf(percorso: Path, corso: Dict[str, Any], contenuti: Dict[str, str]):
+    """Scrive il PDF del corso come documento unico, impaginato in un solo doc.build."""
+    doc = _documento(str(percorso), corso['parametri']['titolo'], intestazione=True)
+    styles = stili_pdf()
+
+    # Il Markdown dei capitoli viene convertito direttamente in flowable
+    convertitore = ConvertitorePlatypus(styles)
+
+    story = _storia_introduzione(corso, styles)
+    story.append(PageBreak())
+
+    # Aggiungiamo i contenuti dei capitoli
+    for capitolo in corso["scaletta"]["capitoli"]:
+        if capitolo["id"] in contenuti:
+            # Aggiungiamo il titolo del capitolo
+            story.append(Paragraph(capitolo['titolo'], styles['Heading1']))
+            story.append(Spacer(1, 0.3*cm))
+
+            # Elaboriamo il contenuto del capitolo
+            story.extend(convertitore.converti(contenuti[capitolo["id"]]))
+
+            # Aggiungiamo un'interruzione di pagina dopo ogni capitolo
+            story.append(PageBreak())
+
+    # Costruiamo il documento PDF
+    doc.build(story)
+
+def scrivi_capitolo_pdf(percorso: Path, titolo: str, testo: str):
+    """
+    Scrive il PDF di un solo capitolo, senza intestazione e piè di pagina.
+
+    Il risultato dipende solo da titolo e testo del capitolo, non dalla sua posizione nel
+    corso: intestazioni e numeri di pagina vengono aggiunti da unisci_pdf.
+    """
+    styles = stili_pdf()
+    story = [Paragraph(titolo, styles['Heading1']), Spacer(1, 0.3*cm)]
+    story.extend(ConvertitorePlatypus(styles).converti(testo))
+    _documento(str(percorso), titolo, intestazione=False).build(story)
+
+def _pdf_introduzione(corso: Dict[str, Any], pagine_capitoli: Sequence[int]) -> bytes:
+    buffer = io.BytesIO()
+    _documento(buffer, corso['parametri']['titolo'], intestazione=False).build(
+        _storia_introduzione(corso, stili_pdf(), pagine_capitoli)
+    )
+    return buffer.getvalue()
+
+def _pdf_intestazioni(titolo: str, pagine: int) -> bytes:
+    """PDF trasparente con intestazione e piè di pagina per ogni pagina del documento finale."""
+    buffer = io.BytesIO()
+    canvas = Canvas(buffer, pagesize=A4)
+    for pagina in range(1, pagine + 1):
+        _disegna_intestazione(canvas, titolo, pagina)
+        canvas.showPage()
+    canvas.save()
+    return buffer.getvalue()
+
+def unisci_pdf(percorso: Path, corso: Dict[str, Any], parti: List[Tuple[str, str]]):
+    """
+    Unisce i PDF dei capitoli in un documento unico.
+
+    Aggiunge in testa la parte iniziale, con l'indice dei contenuti che riporta la pagina
+    iniziale di ogni capitolo, disegna intestazione e piè di pagina con la numerazione
+    del documento completo e crea un segnalibro per ogni capitolo.
+
+    Args:
+        parti: (titolo del capitolo, percorso del suo PDF) nell'ordine della scaletta
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    capitoli = [PdfReader(parte) for _, parte in parti]
+    pagine_capitoli = [len(lettore.pages) for lettore in capitoli]
+
+    # Le pagine iniziali dipendono dalla lunghezza dell'indice, non dai numeri che riporta:
+    # la seconda passata usa il numero di pagine della prima e di norma è quella definitiva
+    pagine_introduzione = 1
+    for _ in range(3):
+        inizi = []
+        pagina = pagine_introduzione + 1
+        for numero in pagine_capitoli:
+            inizi.append(pagina)
+            pagina += numero
+        introduzione = PdfReader(io.BytesIO(_pdf_introduzione(corso, inizi)))
+        if len(introduzione.pages) == pagine_introduzione:
+            break
+        pagine_introduzione = len(introduzione.pages)
+
+    writer = PdfWriter()
+    writer.append(introduzione, import_outline=False)
+    for (titolo, _), lettore, inizio in zip(parti, capitoli, inizi):
+        writer.append(lettore, import_outline=False)
+        writer.add_outline_item(titolo, inizio - 1)
+
+    titolo_corso = corso['parametri']['titolo']
+    intestazioni = PdfReader(io.BytesIO(_pdf_intestazioni(titolo_corso, len(writer.pages))))
+    for pagina, intestazione in zip(writer.pages, intestazioni.pages):
+        pagina.merge_page(intestazione)
+        # merge_page lascia il contenuto della pagina non compresso
+        pagina.compress_content_streams()
+    # Font e risorse ripetuti in ogni capitolo vengono salvati una volta sola
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+    writer.add_metadata({"/Title": titolo_corso, "/Author": AUTORE})
+    with open(percorso, "wb") as f:
+        writer.write(f)
@@ -0,0 +1,140 @@
+import gzip
+import re
+import zipfile
+from html import escape
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.api.markdown_albero import AlberoMarkdown
+
+STILE_SITO = """body { font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; color: #222; }
+header { border-bottom: 1px solid #ddd; margin-bottom: 20px; padding-bottom: 8px; }
+header a { color: #2c3e50; font-weight: bold; text-decoration: none; }
+h1, h2, h3 { color: #2c3e50; }
+code { background-color: #f8f9fa; padding: 2px 4px; border-radius: 4px; }
+pre { background-color: #f8f9fa; padding: 10px; border-radius: 4px; overflow-x: auto; }
+pre code { padding: 0; }
+blockquote { border-left: 4px solid #ccc; padding-left: 10px; margin-left: 0; color: #555; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #ddd; padding: 8px; }
+th { background-color: #f2f2f2; }
+nav.pagine { display: flex; justify-content: space-between; border-top: 1px solid #ddd; margin-top: 30px; padding-top: 10px; }
+.indice li { margin: 4px 0; }
+.indice ul { color: #555; font-size: 0.95em; }
+"""
+
+def varianti_compresse() -> List[str]:
+    """Estensioni delle varianti precompresse scritte accanto a ogni file: .gz sempre, .br con brotli installato."""
+    return [".gz", ".br"] if find_spec("brotli") else [".gz"]
+
+def nome_pagina(capitolo: Dict[str, Any]) -> str:
+    """Nome del file della pagina di un capitolo, derivato dal suo ID: stabile se cambia l'ordine dei capitoli."""
+    return f"capitolo-{re.sub(r'[^A-Za-z0-9_-]+', '-', str(capitolo['id'])).strip('-')}.html"
+
+def _documento_html(titolo: str, titolo_corso: str, corpo: str) -> str:
+    return f"""<!DOCTYPE html>
+<html lang="it">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(titolo)}</title>
+    <link rel="stylesheet" href="stile.css">
+</head>
+<body>
+<header><a href="index.html">{escape(titolo_corso)}</a></header>
+<main>
+{corpo}
+</main>
+</body>
+</html>"""
+
+def _collegamento(capitolo: Optional[Tuple[str, str]], formato: str) -> str:
+    if capitolo is None:
+        return "<span></span>"
+    nome, titolo = capitolo
+    return f'<a href="{escape(nome)}">{formato.format(escape(titolo))}</a>'
+
+def pagina_capitolo(titolo_corso: str, titolo: str, testo: str,
+                    precedente: Optional[Tuple[str, str]], successivo: Optional[Tuple[str, str]]) -> str:
+    """
+    HTML della pagina di un capitolo.
+
+    Args:
+        precedente, successivo: (nome del file, titolo) dei capitoli vicini, per la navigazione
+    """
+    corpo = AlberoMarkdown().analizza(testo).html() if testo.strip() else ""
+    navigazione = (
+        f'<nav class="pagine">{_collegamento(precedente, "&larr; {}")}'
+        f'<a href="index.html">Indice</a>{_collegamento(successivo, "{} &rarr;")}</nav>'
+    )
+    return _documento_html(
+        f"{titolo} - {titolo_corso}", titolo_corso, f"<h1>{escape(titolo)}</h1>\n{corpo}\n{navigazione}"
+    )
+
+def pagina_indice(corso: Dict[str, Any]) -> str:
+    """HTML della pagina iniziale: descrizione del corso e indice dei capitoli dalla scaletta."""
+    parametri = corso["parametri"]
+    voci = []
+    for capitolo in corso["scaletta"]["capitoli"]:
+        sotto = capitolo.get("sottocapitoli") or capitolo.get("sottoargomenti") or []
+        elenco = "".join(
+            f"<li>{escape(s['titolo'] if isinstance(s, dict) else str(s))}</li>" for s in sotto
+        )
+        voci.append(
+            f'<li><a href="{nome_pagina(capitolo)}">{escape(capitolo["titolo"])}</a>'
+            + (f"<ul>{elenco}</ul>" if elenco else "") + "</li>"
+        )
+    corpo = (
+        f"<h1>{escape(parametri['titolo'])}</h1>\n"
+        f"<p>{escape(parametri.get('descrizione', ''))}</p>\n"
+        f"<p><strong>Pubblico target:</strong> {escape(parametri.get('pubblico_target', ''))}<br>\n"
+        f"<strong>Livello di complessità:</strong> {escape(parametri.get('livello_complessita', ''))}</p>\n"
+        f"<h2>Indice dei contenuti</h2>\n<ol class=\"indice\">{''.join(voci)}</ol>"
+    )
+    return _documento_html(parametri["titolo"], parametri["titolo"], corpo)
+
+def comprimi(dati: bytes, variante: str) -> bytes:
+    """Variante precompressa (.gz o .br) di un file, con la compressione massima: viene calcolata una volta sola."""
+    if variante == ".br":
+        import brotli
+
+        return brotli.compress(dati, quality=11)
+    # mtime=0: la stessa pagina produce sempre gli stessi byte
+    return gzip.compress(dati, compresslevel=9, mtime=0)
+
+def scrivi_con_varianti(percorso: Path, testo: str):
+    """Scrive un file di testo e, accanto, le sue varianti precompresse."""
+    dati = testo.encode("utf-8")
+    percorso.write_bytes(dati)
+    for variante in varianti_compresse():
+        Path(f"{percorso}{variante}").write_bytes(comprimi(dati, variante))
+
+def scrivi_pagine(pagine: List[Tuple[str, str, str, Optional[Tuple[str, str]], Optional[Tuple[str, str]], str]]):
+    """
+    Scrive le pagine dei capitoli con le loro varianti precompresse.
+
+    Args:
+        pagine: (titolo del corso, titolo del capitolo, Markdown, precedente, successivo, percorso dell'HTML)
+    """
+    for titolo_corso, titolo, testo, precedente, successivo, percorso in pagine:
+        scrivi_con_varianti(Path(percorso), pagina_capitolo(titolo_corso, titolo, testo, precedente, successivo))
+
+def scrivi_sito(destinazione: Path, corso: Dict[str, Any], pagine: List[Tuple[str, str]]):
+    """
+    Scrive l'archivio ZIP del sito: indice e foglio di stile, generati qui, e le pagine già scritte.
+
+    Args:
+        pagine: (nome del file nel sito, percorso) di ogni file delle pagine, varianti comprese
+    """
+    varianti = varianti_compresse()
+    with zipfile.ZipFile(destinazione, "w") as archivio:
+        for nome, testo in (("index.html", pagina_indice(corso)), ("stile.css", STILE_SITO)):
+            dati = testo.encode("utf-8")
+            archivio.writestr(nome, dati, compress_type=zipfile.ZIP_DEFLATED)
+            for variante in varianti:
+                archivio.writestr(f"{nome}{variante}", comprimi(dati, variante), compress_type=zipfile.ZIP_STORED)
+        for nome, percorso in pagine:
+            # Le varianti sono già compresse: comprimerle di nuovo nell'archivio non serve
+            compresso = nome.endswith(tuple(varianti))
+            archivio.write(percorso, nome, compress_type=zipfile.ZIP_STORED if compresso else zipfile.ZIP_DEFLATED)
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import get_config_value
+
+logger = logging.getLogger(__name__)
+
+# Directory dello stato dei lavori (<id>.json) e dei file esportati (<id>.<estensione>),
+# condivisa tra i worker del server finché i lavori non scadono
+LAVORI_DIR = Path("app/data/esportazioni_lavori")
+
+# Stati di un lavoro che non è ancora terminato
+STATI_ATTIVI = ("in_coda", "in_corso")
+
+# Il processo che esegue un lavoro ne aggiorna il battito a questo intervallo; un lavoro
+# attivo senza battito da BATTITO_SCADENZA_SECONDI è di un worker terminato o riavviato
+BATTITO_SECONDI = 2
+BATTITO_SCADENZA_SECONDI = 10
+
+class LavoriEsportazione:
+    """
+    Esportazioni eseguite in background, con avanzamento e link di download a scadenza.
+
+    avvia() crea il lavoro e restituisce subito il suo stato; la conversione prosegue in
+    un task dell'event loop (le parti pesanti nel pool di rendering) e aggiorna i capitoli
+    completati. Al termine il file viene collegato in LAVORI_DIR (hard link, o copia se
+    non è possibile), così resta scaricabile anche se nel frattempo la cache delle
+    esportazioni lo rimuove. Dopo esportazioni_scadenza_minuti dal termine lavoro e file
+    vengono eliminati.
+
+    Lo stato di ogni lavoro è salvato in LAVORI_DIR/<id>.json a ogni cambiamento, accanto
+    al file esportato: con più worker stato e download vengono serviti da qualunque
+    worker, non solo da quello che esegue il lavoro, e la pulizia dei lavori scaduti
+    avviene dallo stesso archivio. In memoria restano solo i lavori in esecuzione nel
+    processo e i contatori delle statistiche. Un lavoro rimasto attivo senza battito,
+    perché il suo worker è terminato, viene segnato come interrotto.
+    """
+
+    def __init__(self, directory: Path = LAVORI_DIR, scadenza_secondi: Optional[int] = None):
+        self.directory = Path(directory)
+        self._scadenza_secondi = scadenza_secondi
+        self._lock = threading.Lock()
+        self._lavori: Dict[str, Dict[str, Any]] = {}
+        self._task: Dict[str, asyncio.Task] = {}
+        self._completati = 0
+        self._errori = 0
+        self._scaduti = 0
+
+    @property
+    def scadenza_secondi(self) -> int:
+        if self._scadenza_secondi is not None:
+            return self._scadenza_secondi
+        return int(get_config_value("esportazioni_scadenza_minuti", 60)) * 60
+
+    def avvia(self, corso_id: str, formato: str, capitoli_totali: int,
+              esegui: Callable[[Callable[[int, int], None]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Avvia un'esportazione in background e ne restituisce lo stato.
+
+        Se per lo stesso corso e formato c'è già un lavoro attivo viene restituito quello.
+
+        Args:
+            esegui: Coroutine che riceve la funzione di avanzamento (completati, totali) e
+                restituisce il risultato di file_esportazione
+        """
+        self.pulisci()
+        with self._lock:
+            adesso = time.time()
+            for lavoro in self._lavori_salvati().values():
+                if (lavoro["corso_id"] == corso_id and lavoro["formato"] == formato
+                        and lavoro["stato"] in STATI_ATTIVI and not self._abbandonato(lavoro, adesso)):
+                    return lavoro
+
+            lavoro = {
+                "id": uuid.uuid4().hex,
+                "corso_id": corso_id,
+                "formato": formato,
+                "stato": "in_coda",
+                "capitoli_completati": 0,
+                "capitoli_totali": capitoli_totali,
+                "message": "Esportazione in coda",
+                "creato": adesso,
+                "battito": adesso,
+                "completato": None,
+                "scadenza": None,
+            }
+            self._salva_stato(lavoro)
+            self._lavori[lavoro["id"]] = lavoro
+        self._task[lavoro["id"]] = asyncio.create_task(self._esegui(lavoro, esegui))
+        return lavoro
+
+    async def _esegui(self, lavoro: Dict[str, Any], esegui):
+        lavoro["stato"] = "in_corso"
+        lavoro["message"] = "Esportazione in corso"
+        self._salva_stato(lavoro)
+        battito = asyncio.create_task(self._battito(lavoro))
+
+        def avanzamento(completati: int, totali: int):
+            lavoro["capitoli_completati"] = completati
+            lavoro["capitoli_totali"] = totali
+            self._salva_stato(lavoro)
+
+        try:
+            risultato = await esegui(avanzamento)
+            if risultato["success"]:
+                risultato["percorso"] = str(self._conserva(lavoro["id"], Path(risultato["percorso"])))
+        except Exception as e:
+            logger.error(f"Errore nell'esportazione in background {lavoro['id']}: {str(e)}")
+            risultato = {"success": False, "message": f"Errore durante l'esportazione del corso: {str(e)}",
+                         "status_code": 500}
+        finally:
+            battito.cancel()
+            self._task.pop(lavoro["id"], None)
+
+        adesso = time.time()
+        lavoro["completato"] = adesso
+        lavoro["scadenza"] = adesso + self.scadenza_secondi
+        with self._lock:
+            if risultato["success"]:
+                lavoro.update(
+                    stato="completato",
+                    message="Esportazione completata",
+                    percorso=risultato["percorso"],
+                    filename=risultato["filename"],
+                    media_type=risultato["media_type"],
+                    capitoli_completati=lavoro["capitoli_totali"],
+                )
+                self._completati += 1
+            else:
+                lavoro.update(stato="errore", message=risultato["message"],
+                              status_code=risultato.get("status_code", 500))
+                self._errori += 1
+            self._salva_stato(lavoro)
+            self._lavori.pop(lavoro["id"], None)
+        logger.info(f"Esportazione in background {lavoro['id']} ({lavoro['formato']}): {lavoro['stato']}")
+
+    async def _battito(self, lavoro: Dict[str, Any]):
+        """Aggiorna periodicamente il battito del lavoro, finché è in esecuzione in questo processo."""
+        while True:
+            await asyncio.sleep(BATTITO_SECONDI)
+            lavoro["battito"] = time.time()
+            self._salva_stato(lavoro)
+
+    def _conserva(self, lavoro_id: str, percorso: Path) -> Path:
+        """Collega il file esportato nella directory dei lavori, indipendente dalla cache."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        destinazione = self.directory / f"{lavoro_id}{percorso.suffix}"
+        try:
+            os.link(percorso, destinazione)
+        except OSError:
+            shutil.copyfile(percorso, destinazione)
+        # La scadenza dei file rimasti da un avvio precedente si conta dalla data di modifica
+        os.utime(destinazione)
+        return destinazione
+
+    def _percorso_stato(self, lavoro_id: str) -> Path:
+        return self.directory / f"{lavoro_id}.json"
+
+    def _salva_stato(self, lavoro: Dict[str, Any]):
+        """Scrive lo stato del lavoro tramite file temporaneo e rename: nessun worker legge uno stato parziale."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        percorso = self._percorso_stato(lavoro["id"])
+        temporaneo = percorso.with_name(f".{percorso.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temporaneo.write_text(json.dumps(lavoro, ensure_ascii=False), encoding="utf-8")
+        os.replace(temporaneo, percorso)
+
+    def _carica_stato(self, lavoro_id: str) -> Optional[Dict[str, Any]]:
+        # L'ID arriva dall'URL: solo ID generati da avvia() (esadecimali) corrispondono a un file
+        if not lavoro_id.isalnum():
+            return None
+        try:
+            lavoro = json.loads(self._percorso_stato(lavoro_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return lavoro if isinstance(lavoro, dict) and lavoro.get("id") == lavoro_id else None
+
+    def _lavori_salvati(self) -> Dict[str, Dict[str, Any]]:
+        """Stato di tutti i lavori non ancora eliminati, di qualunque worker."""
+        lavori = {}
+        if self.directory.exists():
+            for percorso in self.directory.glob("*.json"):
+                lavoro = self._carica_stato(percorso.stem)
+                if lavoro is not None:
+                    lavori[lavoro["id"]] = lavoro
+        return lavori
+
+    def stato(self, lavoro_id: str) -> Optional[Dict[str, Any]]:
+        """Restituisce il lavoro con l'ID indicato, o None se non esiste o è scaduto."""
+        self.pulisci()
+        lavoro = self._lavori.get(lavoro_id)
+        return lavoro if lavoro is not None else self._carica_stato(lavoro_id)
+
+    def _abbandonato(self, lavoro: Dict[str, Any], adesso: float) -> bool:
+        """Lavoro attivo il cui processo non aggiorna più il battito (worker terminato o riavviato)."""
+        if lavoro["stato"] not in STATI_ATTIVI or lavoro["id"] in self._lavori:
+            return False
+        return lavoro.get("battito", lavoro["creato"]) + BATTITO_SCADENZA_SECONDI <= adesso
+
+    def pulisci(self):
+        """
+        Elimina i lavori scaduti e i loro file, di qualunque worker, compresi i file
+        rimasti da un avvio precedente senza stato, e segna come interrotti i lavori
+        attivi abbandonati.
+        """
+        adesso = time.time()
+        with self._lock:
+            lavori = self._lavori_salvati()
+            for lavoro in lavori.values():
+                if self._abbandonato(lavoro, adesso):
+                    # Il download non arriverà mai: il client riceve un errore invece di attendere
+                    lavoro.update(stato="errore", status_code=500, completato=adesso,
+                                  scadenza=adesso + self.scadenza_secondi,
+                                  message="Esportazione interrotta dal riavvio del server: riavviala")
+                    self._salva_stato(lavoro)
+                    self._errori += 1
+                    logger.warning(f"Esportazione in background {lavoro['id']} interrotta: nessun battito")
+            scaduti = [l for l in lavori.values() if l["scadenza"] is not None and l["scadenza"] <= adesso]
+            for lavoro in scaduti:
+                del lavori[lavoro["id"]]
+                try:
+                    self._percorso_stato(lavoro["id"]).unlink()
+                except FileNotFoundError:
+                    # Già eliminato da un altro worker
+                    continue
+                self._scaduti += 1
+                if lavoro.get("percorso"):
+                    Path(lavoro["percorso"]).unlink(missing_ok=True)
+
+        # File esportati e temporanei senza stato oltre la scadenza
+        if self.directory.exists():
+            for percorso in self.directory.iterdir():
+                if percorso.stem in lavori or percorso.stem in self._lavori:
+                    continue
+                try:
+                    if percorso.stat().st_mtime + self.scadenza_secondi <= adesso:
+                        percorso.unlink()
+                except FileNotFoundError:
+                    continue
+
+    def statistiche(self) -> Dict[str, Any]:
+        """
+        Restituisce le metriche dei lavori: attivi e conservati (di tutti i worker),
+        completati, errori e scaduti (di questo processo).
+        """
+        lavori = self._lavori_salvati()
+        with self._lock:
+            return {
+                "attivi": sum(1 for l in lavori.values() if l["stato"] in STATI_ATTIVI),
+                "lavori": len(lavori),
+                "in_esecuzione": len(self._lavori),
+                "completati": self._completati,
+                "errori": self._errori,
+                "scaduti": self._scaduti,
+                "scadenza_secondi": self.scadenza_secondi,
+            }
+
+lavori_esportazione = LavoriEsportazione()
@@ -0,0 +1,135 @@
+import html
+import re
+from typing import List, Optional, Tuple
+from xml.etree.ElementTree import Element
+
+import markdown
+from markdown.util import HTML_PLACEHOLDER_RE
+
+# Estensioni usate da tutti gli export, così HTML, PDF, DOCX ed EPUB interpretano il testo allo stesso modo
+ESTENSIONI_MARKDOWN = ["tables", "fenced_code"]
+
+# Tag che in una voce di elenco iniziano il contenuto di blocco
+TAG_BLOCCO = {"p", "ul", "ol", "pre", "blockquote", "table", "hr", "div", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+_RE_TAG_HTML = re.compile(r"<[^>]+>")
+_RE_CODICE_PRE = re.compile(r"<code[^>]*>(.*?)</code>", re.DOTALL)
+
+class DocumentoMarkdown:
+    """
+    Albero di un testo Markdown, con l'HTML grezzo messo da parte dal parser.
+
+    È l'albero da cui Python-Markdown produce l'HTML dell'export: i convertitori verso
+    HTML, PDF, DOCX ed EPUB lo visitano senza analizzare di nuovo il testo. Non dipende
+    dall'istanza di Markdown che l'ha prodotto, quindi può essere passato ai processi
+    del pool di rendering. I testi dei nodi vanno letti con testo(), che risolve entità
+    e segnaposto dell'HTML grezzo.
+    """
+
+    def __init__(self, radice: Element, html_salvato: List[str]):
+        self.radice = radice
+        self.html_salvato = html_salvato
+
+    def _html_salvato(self, indice: int) -> str:
+        return self.html_salvato[indice] if indice < len(self.html_salvato) else ""
+
+    def testo(self, testo: Optional[str]) -> str:
+        """Testo semplice di un nodo: entità risolte e HTML grezzo ridotto al suo testo."""
+        if not testo:
+            return ""
+        parti = []
+        inizio = 0
+        for m in HTML_PLACEHOLDER_RE.finditer(testo):
+            parti.append(html.unescape(testo[inizio:m.start()]))
+            parti.append(html.unescape(_RE_TAG_HTML.sub("", self._html_salvato(int(m.group(1))))))
+            inizio = m.end()
+        parti.append(html.unescape(testo[inizio:]))
+        return "".join(parti)
+
+    def codice(self, elemento: Element) -> Optional[str]:
+        """
+        Restituisce il codice di un blocco, o None se l'elemento non è un blocco di codice.
+
+        I blocchi indentati sono elementi <pre>; quelli delimitati da ``` vengono messi
+        da parte dal parser e restano nell'albero come paragrafi che contengono solo il
+        segnaposto.
+        """
+        if elemento.tag == "pre":
+            codice = elemento.find("code")
+            return html.unescape((codice if codice is not None else elemento).text or "").rstrip("\n")
+        if elemento.tag != "p" or len(elemento):
+            return None
+        m = HTML_PLACEHOLDER_RE.fullmatch((elemento.text or "").strip())
+        if not m:
+            return None
+        salvato = self._html_salvato(int(m.group(1)))
+        if not salvato.lstrip().startswith("<pre"):
+            return None
+        codice = _RE_CODICE_PRE.search(salvato)
+        return html.unescape(codice.group(1) if codice else _RE_TAG_HTML.sub("", salvato)).rstrip("\n")
+
+    def html(self) -> str:
+        """HTML del documento, identico a quello di markdown.markdown() sullo stesso testo."""
+        # Gli ultimi passi di Markdown.convert(): serializzazione e postprocessor
+        md = markdown.Markdown(extensions=ESTENSIONI_MARKDOWN)
+        md.htmlStash.rawHtmlBlocks = list(self.html_salvato)
+        md.htmlStash.html_counter = len(self.html_salvato)
+        output = md.serializer(self.radice)
+        if md.stripTopLevelTags:
+            try:
+                inizio = output.index("<%s>" % md.doc_tag) + len(md.doc_tag) + 2
+                fine = output.rindex("</%s>" % md.doc_tag)
+                output = output[inizio:fine].strip()
+            except ValueError:
+                # Documento vuoto: la radice è serializzata come <div />
+                output = ""
+        for postprocessore in md.postprocessors:
+            output = postprocessore.run(output)
+        return output.strip()
+
+class AlberoMarkdown:
+    """
+    Analizza Markdown con Python-Markdown fino all'albero degli elementi, senza serializzarlo in HTML.
+
+    Usa le stesse estensioni dell'export HTML, così tutti i formati interpretano il
+    testo allo stesso modo.
+    """
+
+    def __init__(self):
+        self._md = markdown.Markdown(extensions=ESTENSIONI_MARKDOWN)
+
+    def analizza(self, testo: str) -> DocumentoMarkdown:
+        """Restituisce l'albero del testo Markdown."""
+        # Gli stessi passi di Markdown.convert() fino ai treeprocessor
+        md = self._md
+        md.reset()
+        md.lines = testo.split("\n")
+        for preprocessore in md.preprocessors:
+            md.lines = preprocessore.run(md.lines)
+        radice = md.parser.parseDocument(md.lines).getroot()
+        for treeprocessor in md.treeprocessors:
+            nuova = treeprocessor.run(radice)
+            if nuova is not None:
+                radice = nuova
+        # I blocchi salvati possono essere anche elementi: vengono serializzati subito
+        salvati = [b if isinstance(b, str) else md.serializer(b) for b in md.htmlStash.rawHtmlBlocks]
+        return DocumentoMarkdown(radice, salvati)
+
+def dividi_voce(voce: Element) -> Tuple[Element, List[Element]]:
+    """
+    Divide una voce di elenco in contenuto inline e blocchi.
+
+    Negli elenchi compatti il testo è direttamente nella voce; negli elenchi con righe
+    vuote è in paragrafi, seguiti da eventuali blocchi ed elenchi annidati.
+
+    Returns:
+        Un elemento con il testo e i figli inline della voce, e i figli di blocco che seguono
+    """
+    inline = Element("li")
+    inline.text = voce.text
+    figli = list(voce)
+    for figlio in figli:
+        if figlio.tag in TAG_BLOCCO:
+            break
+        inline.append(figlio)
+    return inline, figli[len(inline):]
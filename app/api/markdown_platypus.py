@@ -0,0 +1,195 @@
+from typing import Any, List, Optional
+from xml.etree.ElementTree import Element
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1
+from reportlab.lib.units import cm
+from reportlab.platypus import (
+    Indenter, ListFlowable, ListItem, Paragraph, Preformatted, Spacer, Table, TableStyle
+)
+from reportlab.platypus.flowables import HRFlowable
+
+from app.api.markdown_albero import AlberoMarkdown, DocumentoMarkdown, dividi_voce
+
+# Spazio dopo i titoli, come nella conversione precedente
+_SPAZIO_TITOLI = {"h1": 0.5 * cm, "h2": 0.3 * cm, "h3": 0.2 * cm}
+
+# Tag inline HTML -> markup dei paragrafi di ReportLab
+_TAG_INLINE = {
+    "strong": ("<b>", "</b>"),
+    "b": ("<b>", "</b>"),
+    "em": ("<i>", "</i>"),
+    "i": ("<i>", "</i>"),
+    "code": ('<font face="Courier">', "</font>"),
+    "del": ("<strike>", "</strike>"),
+    "s": ("<strike>", "</strike>"),
+    "sub": ("<sub>", "</sub>"),
+    "sup": ("<super>", "</super>"),
+}
+
+def aggiungi_stili(stili: StyleSheet1):
+    """Aggiunge al foglio di stile gli stili usati dal convertitore, se mancano."""
+    if "CodeBlock" not in stili:
+        stili.add(ParagraphStyle(
+            name="CodeBlock", parent=stili["Code"], fontSize=9, fontName="Courier",
+            backColor=colors.lightgrey, spaceBefore=8, spaceAfter=8
+        ))
+    if "Citazione" not in stili:
+        stili.add(ParagraphStyle(
+            name="Citazione", parent=stili["Normal"], textColor=colors.HexColor("#555555"),
+            fontName="Helvetica-Oblique"
+        ))
+    if "CellaTabella" not in stili:
+        stili.add(ParagraphStyle(name="CellaTabella", parent=stili["Normal"], fontSize=9, leading=11))
+    if "IntestazioneTabella" not in stili:
+        stili.add(ParagraphStyle(
+            name="IntestazioneTabella", parent=stili["CellaTabella"], fontName="Helvetica-Bold"
+        ))
+
+class ConvertitorePlatypus:
+    """
+    Converte Markdown in flowable di ReportLab visitando una sola volta l'albero del documento.
+
+    Il testo viene analizzato da AlberoMarkdown, con le stesse estensioni dell'export
+    HTML; ogni nodo dell'albero viene poi trasformato direttamente nei flowable corrispondenti: titoli, paragrafi, elenchi
+    puntati e numerati anche annidati, tabelle, citazioni, blocchi di codice e linee
+    orizzontali. Il tempo è lineare nella lunghezza del testo.
+    """
+
+    def __init__(self, stili: StyleSheet1):
+        aggiungi_stili(stili)
+        self.stili = stili
+        self._albero = AlberoMarkdown()
+        self._documento: Optional[DocumentoMarkdown] = None
+
+    def converti(self, testo: str) -> List[Any]:
+        """Restituisce i flowable del testo Markdown."""
+        if not testo.strip():
+            return []
+        return self.converti_documento(self._albero.analizza(testo))
+
+    def converti_documento(self, documento: DocumentoMarkdown) -> List[Any]:
+        """Restituisce i flowable di un documento già analizzato."""
+        self._documento = documento
+        flowables: List[Any] = []
+        self._blocchi(documento.radice, flowables, self.stili["Normal"])
+        return flowables
+
+    def _testo(self, testo: Optional[str]) -> str:
+        """Testo di un nodo come markup ReportLab, con i caratteri speciali escapati."""
+        return escape(self._documento.testo(testo))
+
+    def _inline(self, elemento: Element) -> str:
+        """Markup ReportLab del contenuto inline di un elemento (testo e figli, senza la coda dell'elemento)."""
+        parti = [self._testo(elemento.text)]
+        for figlio in elemento:
+            tag = figlio.tag
+            if tag in _TAG_INLINE:
+                apertura, chiusura = _TAG_INLINE[tag]
+                parti.append(f"{apertura}{self._inline(figlio)}{chiusura}")
+            elif tag == "a":
+                href = escape(figlio.get("href", ""), {'"': "&quot;"})
+                parti.append(f'<a href="{href}" color="blue">{self._inline(figlio)}</a>')
+            elif tag == "br":
+                parti.append("<br/>")
+            elif tag == "img":
+                parti.append(self._testo(figlio.get("alt", "")))
+            else:
+                parti.append(self._inline(figlio))
+            parti.append(self._testo(figlio.tail))
+        return "".join(parti)
+
+    def _paragrafo(self, markup: str, stile: ParagraphStyle, flowables: List[Any]):
+        if markup.strip():
+            flowables.append(Paragraph(markup, stile))
+            flowables.append(Spacer(1, 0.2 * cm))
+
+    def _blocchi(self, contenitore: Element, flowables: List[Any], stile: ParagraphStyle):
+        """Converte i figli di blocco di un elemento, aggiungendo i flowable a flowables."""
+        for elemento in contenitore:
+            tag = elemento.tag
+            if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+                flowables.append(Paragraph(self._inline(elemento), self.stili[f"Heading{tag[1]}"]))
+                flowables.append(Spacer(1, _SPAZIO_TITOLI.get(tag, 0.2 * cm)))
+            elif tag in ("p", "pre"):
+                codice = self._documento.codice(elemento)
+                if codice is not None:
+                    flowables.append(Preformatted(codice, self.stili["CodeBlock"]))
+                else:
+                    self._paragrafo(self._inline(elemento), stile, flowables)
+            elif tag in ("ul", "ol"):
+                flowables.append(self._elenco(elemento, stile))
+                flowables.append(Spacer(1, 0.2 * cm))
+            elif tag == "blockquote":
+                flowables.append(Indenter(left=0.6 * cm))
+                self._blocchi(elemento, flowables, self.stili["Citazione"])
+                flowables.append(Indenter(left=-0.6 * cm))
+            elif tag == "table":
+                tabella = self._tabella(elemento)
+                if tabella is not None:
+                    flowables.append(tabella)
+                    flowables.append(Spacer(1, 0.3 * cm))
+            elif tag == "hr":
+                flowables.append(HRFlowable(width="100%", thickness=1, color=colors.grey))
+                flowables.append(Spacer(1, 0.2 * cm))
+            else:
+                # Contenitori generici: testo proprio come paragrafo, poi i blocchi figli
+                self._paragrafo(self._testo(elemento.text), stile, flowables)
+                self._blocchi(elemento, flowables, stile)
+
+    def _elenco(self, elemento: Element, stile: ParagraphStyle) -> ListFlowable:
+        voci = []
+        for voce in elemento.findall("li"):
+            contenuto: List[Any] = []
+            inline, figli = dividi_voce(voce)
+            if len(inline) or (inline.text or "").strip():
+                contenuto.append(Paragraph(self._inline(inline), stile))
+            blocchi = Element("li")
+            blocchi.extend(figli)
+            self._blocchi(blocchi, contenuto, stile)
+            # Lo spazio dopo l'ultimo blocco della voce è superfluo
+            while contenuto and isinstance(contenuto[-1], Spacer):
+                contenuto.pop()
+            voci.append(ListItem(contenuto or [Paragraph("", stile)]))
+
+        formato = {"leftIndent": 18, "bulletFontName": stile.fontName, "bulletFontSize": stile.fontSize}
+        if elemento.tag == "ol":
+            return ListFlowable(
+                voci, bulletType="1", bulletFormat="%s.", start=int(elemento.get("start", "1")), **formato
+            )
+        return ListFlowable(voci, bulletType="bullet", start="•", **formato)
+
+    def _tabella(self, elemento: Element) -> Optional[Table]:
+        righe = []
+        intestazione = 0
+        for riga in elemento.iter("tr"):
+            celle = list(riga)
+            if celle and all(c.tag == "th" for c in celle) and len(righe) == intestazione:
+                intestazione += 1
+            righe.append([
+                Paragraph(
+                    self._inline(cella),
+                    self.stili["IntestazioneTabella" if cella.tag == "th" else "CellaTabella"]
+                )
+                for cella in celle
+            ])
+
+        if not righe:
+            return None
+        colonne = max(len(r) for r in righe)
+        for riga in righe:
+            riga.extend(Paragraph("", self.stili["CellaTabella"]) for _ in range(colonne - len(riga)))
+
+        # Larghezze in percentuale: la tabella occupa lo spazio disponibile anche dentro elenchi e citazioni
+        tabella = Table(righe, colWidths=[f"{100 / colonne:.4f}%"] * colonne, repeatRows=intestazione)
+        comandi = [
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("TOPPADDING", (0, 0), (-1, -1), 4),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+        ]
+        if intestazione:
+            comandi.append(("BACKGROUND", (0, 0), (-1, intestazione - 1), colors.HexColor("#f2f2f2")))
+        tabella.setStyle(TableStyle(comandi))
+        return tabella
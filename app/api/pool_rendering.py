@@ -0,0 +1,201 @@
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.config import get_config_value
+
+logger = logging.getLogger(__name__)
+
+class PoolSaturo(Exception):
+    """Il pool ha già il numero massimo di conversioni in esecuzione e in coda."""
+
+class TimeoutRendering(Exception):
+    """La conversione non è terminata entro il tempo massimo."""
+
+class PoolRendering:
+    """
+    Pool di processi per le conversioni dei file esportati che impegnano la CPU.
+
+    ReportLab, la scrittura dei DOCX e la conversione Markdown -> HTML di un corso intero richiedono
+    secondi di calcolo: eseguite nel processo del server bloccherebbero l'event loop,
+    e con esso il polling dell'avanzamento e le generazioni in streaming. Qui vengono
+    eseguite in processi separati, avviati con "spawn" alla prima richiesta.
+
+    - rendering_processi: conversioni eseguite in parallelo
+    - rendering_coda_max: conversioni in attesa oltre quelle in esecuzione; le
+      richieste successive vengono rifiutate con PoolSaturo
+    - rendering_timeout: secondi concessi a una conversione, attesa in coda compresa;
+      allo scadere i processi del pool vengono terminati e ricreati, perché un
+      processo occupato non si può interrompere in altro modo
+    """
+
+    def __init__(self, processi: Optional[int] = None, coda_max: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self._processi = processi
+        self._coda_max = coda_max
+        self._timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_processi = 0
+        self._lock = threading.Lock()
+        self._attive = 0
+        self._completate = 0
+        self._fallite = 0
+        self._scadute = 0
+        self._rifiutate = 0
+        self._attesa_totale = 0.0
+        self._durata_totale = 0.0
+
+    @property
+    def processi(self) -> int:
+        if self._processi is not None:
+            return self._processi
+        return max(1, int(get_config_value("rendering_processi", 2)))
+
+    @property
+    def coda_max(self) -> int:
+        if self._coda_max is not None:
+            return self._coda_max
+        return max(0, int(get_config_value("rendering_coda_max", 8)))
+
+    @property
+    def timeout(self) -> float:
+        if self._timeout is not None:
+            return self._timeout
+        return float(get_config_value("rendering_timeout", 300))
+
+    def _executor_corrente(self) -> ProcessPoolExecutor:
+        # Chiamato con self._lock acquisito; il pool viene ricreato se cambia il numero di processi
+        processi = self.processi
+        if self._executor is not None and self._executor_processi != processi:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=processi, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._executor_processi = processi
+        return self._executor
+
+    async def esegui(self, funzione: Callable[..., Any], *args) -> Any:
+        """
+        Esegue funzione(*args) in un processo del pool e ne restituisce il risultato.
+
+        funzione e argomenti devono essere serializzabili con pickle; le eccezioni
+        sollevate nel processo vengono rilanciate qui. Se il pool si interrompe (un
+        processo terminato per il timeout di un'altra conversione o caduto) la
+        conversione viene ripetuta una volta su un pool nuovo.
+
+        Raises:
+            PoolSaturo: se la coda è piena
+            TimeoutRendering: se la conversione supera rendering_timeout
+        """
+        with self._lock:
+            if self._attive >= self.processi + self.coda_max:
+                self._rifiutate += 1
+                raise PoolSaturo(
+                    f"Troppe esportazioni in corso ({self._attive}). Riprova tra qualche istante."
+                )
+            self._attive += 1
+
+        try:
+            for tentativo in range(2):
+                try:
+                    return await self._esegui_su_pool(funzione, args)
+                except BrokenProcessPool:
+                    if tentativo == 1:
+                        raise
+                    logger.warning("Pool di rendering interrotto: ripeto la conversione su un pool nuovo")
+        except TimeoutRendering:
+            raise
+        except Exception:
+            with self._lock:
+                self._fallite += 1
+            raise
+        finally:
+            with self._lock:
+                self._attive -= 1
+
+    async def _esegui_su_pool(self, funzione: Callable[..., Any], args) -> Any:
+        with self._lock:
+            executor = self._executor_corrente()
+
+        inviata = time.monotonic()
+        try:
+            future = executor.submit(_esegui_misurato, funzione, args)
+        except BrokenProcessPool:
+            self._scarta(executor)
+            raise
+
+        try:
+            inizio, risultato = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._scadute += 1
+            # Una conversione ancora in coda viene annullata; una già avviata si può
+            # fermare solo terminando i processi del pool
+            if not future.cancel():
+                self._termina(executor)
+            raise TimeoutRendering(f"La conversione non è terminata entro {self.timeout:.0f} secondi")
+        except BrokenProcessPool:
+            self._scarta(executor)
+            raise
+
+        with self._lock:
+            self._completate += 1
+            self._attesa_totale += max(0.0, inizio - inviata)
+            self._durata_totale += time.monotonic() - inizio
+        return risultato
+
+    def _scarta(self, executor: ProcessPoolExecutor):
+        # Le richieste successive creeranno un pool nuovo
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def _termina(self, executor: ProcessPoolExecutor):
+        """Termina i processi di un pool con una conversione scaduta; le nuove richieste usano un pool nuovo."""
+        self._scarta(executor)
+        logger.warning("Conversione scaduta: termino i processi del pool di rendering")
+        # ProcessPoolExecutor non espone un modo pubblico per interrompere un processo
+        # occupato; le altre conversioni del pool ricevono BrokenProcessPool e vengono ripetute
+        for processo in list((getattr(executor, "_processes", None) or {}).values()):
+            processo.terminate()
+        executor.shutdown(wait=False)
+
+    def chiudi(self):
+        """Arresta il pool, annullando le conversioni ancora in coda."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce le metriche del pool: coda, conversioni completate, fallite, scadute e rifiutate."""
+        with self._lock:
+            return {
+                "processi": self.processi,
+                "coda_max": self.coda_max,
+                "timeout": self.timeout,
+                "attive": self._attive,
+                "completate": self._completate,
+                "fallite": self._fallite,
+                "scadute": self._scadute,
+                "rifiutate": self._rifiutate,
+                "attesa_media_ms": round(self._attesa_totale / self._completate * 1000, 1) if self._completate else 0.0,
+                "durata_media_ms": round(self._durata_totale / self._completate * 1000, 1) if self._completate else 0.0
+            }
+
+def _esegui_misurato(funzione: Callable[..., Any], args) -> Any:
+    # Eseguita nel processo del pool: restituisce anche l'istante di inizio, per
+    # separare il tempo di attesa in coda da quello di conversione
+    inizio = time.monotonic()
+    return inizio, funzione(*args)
+
+pool_rendering = PoolRendering()
+atexit.register(pool_rendering.chiudi)
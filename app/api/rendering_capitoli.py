@@ -0,0 +1,103 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from xml.etree.ElementTree import Element
+
+from app.models.cache import CacheLRU
+
+# markdown_albero importa Python-Markdown: viene caricato alla prima pagina di un
+# capitolo, non all'avvio dell'applicazione (come negli export)
+if TYPE_CHECKING:
+    from app.api.markdown_albero import DocumentoMarkdown
+
+# Da incrementare quando cambia l'HTML prodotto: rende obsolete le voci in cache
+VERSIONE_RENDERER_CAPITOLI = 1
+
+# Sotto questa dimensione (HTML) il capitolo viene inviato in una sola sezione
+SEZIONE_MIN_BYTES = 24 * 1024
+
+# Titoli di primo livello del capitolo da cui può iniziare una sezione
+TAG_INIZIO_SEZIONE = ("h1", "h2")
+
+def dividi_sezioni(documento: "DocumentoMarkdown", minimo_bytes: int = SEZIONE_MIN_BYTES) -> List[str]:
+    """
+    Divide l'HTML di un capitolo in sezioni che iniziano con un titolo h1/h2.
+
+    Le sezioni vengono serializzate separatamente dai blocchi di primo livello
+    dell'albero, così nessun elemento resta spezzato; quelle più piccole di
+    minimo_bytes vengono unite alla successiva. Un capitolo senza titoli, o più
+    piccolo di minimo_bytes, resta una sezione sola.
+    """
+    from app.api.markdown_albero import DocumentoMarkdown
+
+    gruppi: List[List[Element]] = []
+    for elemento in documento.radice:
+        if not gruppi or elemento.tag in TAG_INIZIO_SEZIONE:
+            gruppi.append([])
+        gruppi[-1].append(elemento)
+
+    sezioni: List[str] = []
+    corrente = ""
+    for gruppo in gruppi:
+        radice = Element(documento.radice.tag)
+        radice.extend(gruppo)
+        corrente = f"{corrente}\n{DocumentoMarkdown(radice, documento.html_salvato).html()}".strip()
+        if len(corrente.encode("utf-8")) >= minimo_bytes:
+            sezioni.append(corrente)
+            corrente = ""
+    if corrente or not sezioni:
+        if sezioni and len(corrente.encode("utf-8")) < minimo_bytes // 2:
+            # Un resto piccolo non vale una richiesta in più
+            sezioni[-1] = f"{sezioni[-1]}\n{corrente}"
+        else:
+            sezioni.append(corrente)
+    return sezioni
+
+def rendi_capitolo(testo: str) -> List[str]:
+    """HTML di un capitolo diviso in sezioni, con lo stesso parser ed estensioni degli export."""
+    if not testo.strip():
+        return [""]
+    from app.api.markdown_albero import AlberoMarkdown
+    return dividi_sezioni(AlberoMarkdown().analizza(testo))
+
+class HtmlCapitoli:
+    """
+    Cache dell'HTML dei capitoli, per processo, indirizzata per contenuto.
+
+    La chiave è l'hash del contenuto del capitolo e la versione è quella del renderer:
+    una modifica produce un nuovo hash, e la voce precedente esce per LRU. Con un hit
+    la pagina del capitolo non legge il contenuto dall'archivio. Il rendering dei miss
+    avviene in un thread, per non bloccare l'event loop sui capitoli lunghi.
+    """
+
+    def __init__(self, max_voci: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self._cache = CacheLRU("html_capitoli", max_voci=max_voci, max_bytes=max_bytes)
+
+    def cerca(self, hash_contenuto: str) -> Optional[List[str]]:
+        """Sezioni HTML del contenuto con l'hash indicato, se in cache."""
+        return self._cache.get(hash_contenuto, VERSIONE_RENDERER_CAPITOLI)
+
+    async def sezioni(self, hash_contenuto: str, carica: Callable[[], Optional[str]]) -> Optional[List[str]]:
+        """
+        Restituisce le sezioni HTML del capitolo, dalla cache o rendendo il testo.
+
+        Args:
+            carica: Funzione che carica il Markdown del capitolo, chiamata solo in caso di miss
+
+        Returns:
+            Le sezioni, o None se il contenuto non è disponibile
+        """
+        sezioni = self.cerca(hash_contenuto)
+        if sezioni is not None:
+            return sezioni
+
+        testo = carica()
+        if testo is None:
+            return None
+        sezioni = await asyncio.to_thread(rendi_capitolo, testo)
+        self._cache.set(hash_contenuto, sezioni, VERSIONE_RENDERER_CAPITOLI)
+        return sezioni
+
+    def statistiche(self) -> Dict[str, Any]:
+        return self._cache.statistiche()
+
+html_capitoli = HtmlCapitoli()
@@ -9,7 +9,9 @@ from app.api.controllers import (
     genera_contenuto_capitolo,
     modifica_scaletta,
     modifica_contenuto_capitolo,
-    esporta_corso
+    esporta_corso,
+    avvia_esportazione,
+    stato_esportazione
 )
 
 # Definizione dei modelli di richiesta/risposta API
@@ -42,6 +44,12 @@ class EsportaResponse(BaseModel):
     content: Optional[str] = None
     filename: Optional[str] = None
     url: Optional[str] = None
+    # Esportazioni in background: url viene valorizzato quando stato è "completato"
+    job_id: Optional[str] = None
+    stato: Optional[str] = None
+    capitoli_completati: Optional[int] = None
+    capitoli_totali: Optional[int] = None
+    scadenza: Optional[str] = None
 
 router = APIRouter(prefix="/api", tags=["API"])
 
@@ -115,9 +123,15 @@ async def esporta_corso_endpoint(corso_id: str, formato: str):
     """
     risultato = await esporta_corso(corso_id, formato)
     
-    # Aggiungiamo l'URL per il download se l'esportazione è avvenuta con successo
-    if risultato["success"] and "content" in risultato:
-        return risultato
+    # In caso di successo l'URL punta al download in streaming del file esportato
+    if risultato["success"]:
+        return {
+            "success": True,
+            "message": risultato["message"],
+            "content": None,
+            "filename": risultato["filename"],
+            "url": risultato["url"]
+        }
     else:
         return {
             "success": risultato["success"],
@@ -125,4 +139,24 @@ async def esporta_corso_endpoint(corso_id: str, formato: str):
             "content": None,
             "filename": None,
             "url": None
-        } 
\ No newline at end of file
+        }
+
+@router.post("/corsi/{corso_id}/esportazioni", response_model=EsportaResponse, status_code=202)
+async def avvia_esportazione_endpoint(corso_id: str, formato: str):
+    """
+    Avvia l'esportazione del corso in background e restituisce l'ID del lavoro.
+    """
+    risultato = await avvia_esportazione(corso_id, formato)
+    if not risultato["success"]:
+        raise HTTPException(status_code=risultato.get("status_code", 500), detail=risultato["message"])
+    return risultato
+
+@router.get("/esportazioni/{job_id}", response_model=EsportaResponse)
+async def stato_esportazione_endpoint(job_id: str):
+    """
+    Restituisce l'avanzamento di un'esportazione in background e, al termine, l'URL di download.
+    """
+    risultato = stato_esportazione(job_id)
+    if "status_code" in risultato:
+        raise HTTPException(status_code=risultato["status_code"], detail=risultato["message"])
+    return risultato
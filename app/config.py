@@ -1,7 +1,8 @@
 import json
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 # Carica le variabili d'ambiente dal file .env
@@ -22,53 +23,137 @@ DEFAULT_CONFIG = {
     "deepseek_model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),  # Default a deepseek-chat (V3)
     "openai_api_key": os.getenv("OPENAI_API_KEY", ""),
     "openai_base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com"),
-    "openai_model": os.getenv("OPENAI_MODEL", "o1-preview")  # Modello predefinito: o1-preview (più probabile nome corretto)
+    "openai_model": os.getenv("OPENAI_MODEL", "o1-preview"),  # Modello predefinito: o1-preview (più probabile nome corretto)
+    "archivio_contenuti": os.getenv("ARCHIVIO_CONTENUTI", "database"),  # Opzioni: "database", "blob"
+    "mirror_markdown": os.getenv("MIRROR_MARKDOWN", "").lower() in ("1", "true", "si"),  # Copia .md dei capitoli in app/data/contenuti
+    "compressione_contenuti": os.getenv("COMPRESSIONE_CONTENUTI", ""),  # Opzioni: "" (nessuna), "zlib", "zstd"
+    "revisioni_conservate": int(os.getenv("REVISIONI_CONSERVATE", "50")),  # Revisioni per capitolo (0 = tutte)
+    "cache_esportazioni_mb": int(os.getenv("CACHE_ESPORTAZIONI_MB", "500")),  # Spazio massimo dei file esportati in cache
+    "rendering_processi": int(os.getenv("RENDERING_PROCESSI", "2")),  # Processi per le conversioni HTML, PDF e DOCX
+    "rendering_coda_max": int(os.getenv("RENDERING_CODA_MAX", "8")),  # Conversioni in attesa oltre le quali si risponde 503
+    "rendering_timeout": int(os.getenv("RENDERING_TIMEOUT", "300")),  # Secondi concessi a una conversione
+    "esportazioni_scadenza_minuti": int(os.getenv("ESPORTAZIONI_SCADENZA_MINUTI", "60")),  # Durata dei link delle esportazioni in background
+    "compressione_risposte_min_bytes": int(os.getenv("COMPRESSIONE_RISPOSTE_MIN_BYTES", "1024"))  # Risposte più piccole non vengono compresse
 }
 
+# Cache in memoria del file di configurazione: viene riletto solo quando cambiano
+# data di modifica o dimensione del file, oppure dopo invalida_config()
+_cache_lock = threading.Lock()
+_cache_firma: Optional[Tuple[int, int]] = None
+_cache_file: Optional[Dict[str, Any]] = None
+_cache_config: Optional[Dict[str, Any]] = None
+
+def _firma_file() -> Optional[Tuple[int, int]]:
+    """Restituisce (mtime in ns, dimensione) del file di configurazione, o None se manca."""
+    try:
+        stat = CONFIG_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _applica_ambiente(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Completa la configurazione letta dal file con i valori predefiniti e le variabili d'ambiente."""
+    # Assicurati che tutte le chiavi predefinite esistano
+    for key, value in DEFAULT_CONFIG.items():
+        if key not in config:
+            config[key] = value
+    
+    # Sovrascrivi con variabili d'ambiente se presenti, MA NON sovrascrivere ai_provider
+    # perché vogliamo rispettare la scelta dell'utente
+    # La variabile DEFAULT_AI_PROVIDER serve solo per l'inizializzazione iniziale
+    # if os.getenv("DEFAULT_AI_PROVIDER"):
+    #     config["ai_provider"] = os.getenv("DEFAULT_AI_PROVIDER")
+    
+    # Aggiorna solo le chiavi API e URL se presenti come variabili d'ambiente
+    if os.getenv("DEEPSEEK_API_KEY"):
+        config["deepseek_api_key"] = os.getenv("DEEPSEEK_API_KEY")
+    if os.getenv("DEEPSEEK_BASE_URL"):
+        config["deepseek_base_url"] = os.getenv("DEEPSEEK_BASE_URL")
+    if os.getenv("OPENAI_API_KEY"):
+        config["openai_api_key"] = os.getenv("OPENAI_API_KEY")
+    if os.getenv("OPENAI_BASE_URL"):
+        config["openai_base_url"] = os.getenv("OPENAI_BASE_URL")
+    if os.getenv("OPENAI_MODEL"):
+        config["openai_model"] = os.getenv("OPENAI_MODEL")
+    
+    return config
+
+def _config_corrente() -> Dict[str, Any]:
+    """
+    Restituisce la configurazione in cache, rileggendo il file solo se è cambiato.
+    
+    Il dizionario restituito è condiviso: i chiamanti non devono modificarlo.
+    """
+    global _cache_firma, _cache_file, _cache_config
+    
+    firma = _firma_file()
+    if firma is not None and firma == _cache_firma and _cache_config is not None:
+        return _cache_config
+    
+    with _cache_lock:
+        firma = _firma_file()
+        if firma is not None and firma == _cache_firma and _cache_config is not None:
+            return _cache_config
+        
+        if firma is None:
+            # Se il file non esiste, crea uno con la configurazione predefinita
+            try:
+                _scrivi_config(DEFAULT_CONFIG)
+            except Exception as e:
+                print(f"Errore nel salvataggio della configurazione: {e}")
+                return DEFAULT_CONFIG
+            return _cache_config
+        
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                contenuto_file = json.load(f)
+        except Exception as e:
+            print(f"Errore nel caricamento della configurazione: {e}")
+            return DEFAULT_CONFIG
+        
+        _cache_firma = firma
+        _cache_file = contenuto_file
+        _cache_config = _applica_ambiente(dict(contenuto_file))
+        return _cache_config
+
+def invalida_config():
+    """Svuota la cache: la prossima lettura ricarica il file di configurazione."""
+    global _cache_firma, _cache_file, _cache_config
+    with _cache_lock:
+        _cache_firma = _cache_file = _cache_config = None
+
 def load_config() -> Dict[str, Any]:
     """Carica la configurazione dal file JSON e sovrascrive con variabili d'ambiente se presenti."""
-    if not CONFIG_FILE.exists():
-        # Se il file non esiste, crea uno con la configurazione predefinita
-        save_config(DEFAULT_CONFIG)
-        return DEFAULT_CONFIG.copy()
+    return dict(_config_corrente())
+
+def _scrivi_config(config: Dict[str, Any]):
+    """
+    Scrive il file di configurazione tramite file temporaneo e rename, così un
+    lettore concorrente non vede mai un file parziale. Da chiamare con _cache_lock.
+    """
+    global _cache_firma, _cache_file, _cache_config
     
+    temporaneo = CONFIG_FILE.with_name(f".{CONFIG_FILE.name}.{os.getpid()}.{threading.get_ident()}.tmp")
     try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            
-            # Assicurati che tutte le chiavi predefinite esistano
-            for key, value in DEFAULT_CONFIG.items():
-                if key not in config:
-                    config[key] = value
-            
-            # Sovrascrivi con variabili d'ambiente se presenti, MA NON sovrascrivere ai_provider
-            # perché vogliamo rispettare la scelta dell'utente
-            # La variabile DEFAULT_AI_PROVIDER serve solo per l'inizializzazione iniziale
-            # if os.getenv("DEFAULT_AI_PROVIDER"):
-            #     config["ai_provider"] = os.getenv("DEFAULT_AI_PROVIDER")
-            
-            # Aggiorna solo le chiavi API e URL se presenti come variabili d'ambiente
-            if os.getenv("DEEPSEEK_API_KEY"):
-                config["deepseek_api_key"] = os.getenv("DEEPSEEK_API_KEY")
-            if os.getenv("DEEPSEEK_BASE_URL"):
-                config["deepseek_base_url"] = os.getenv("DEEPSEEK_BASE_URL")
-            if os.getenv("OPENAI_API_KEY"):
-                config["openai_api_key"] = os.getenv("OPENAI_API_KEY")
-            if os.getenv("OPENAI_BASE_URL"):
-                config["openai_base_url"] = os.getenv("OPENAI_BASE_URL")
-            if os.getenv("OPENAI_MODEL"):
-                config["openai_model"] = os.getenv("OPENAI_MODEL")
-            
-            return config
-    except Exception as e:
-        print(f"Errore nel caricamento della configurazione: {e}")
-        return DEFAULT_CONFIG.copy()
+        with open(temporaneo, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(temporaneo, CONFIG_FILE)
+    finally:
+        if temporaneo.exists():
+            temporaneo.unlink()
+    
+    _cache_firma = _firma_file()
+    _cache_file = dict(config)
+    _cache_config = _applica_ambiente(dict(config))
 
 def save_config(config: Dict[str, Any]) -> bool:
-    """Salva la configurazione nel file JSON."""
+    """Salva la configurazione nel file JSON, solo se diversa da quella già salvata."""
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        _config_corrente()
+        with _cache_lock:
+            if _cache_file == config and _cache_firma is not None and _cache_firma == _firma_file():
+                return True
+            _scrivi_config(config)
         return True
     except Exception as e:
         print(f"Errore nel salvataggio della configurazione: {e}")
@@ -76,8 +161,7 @@ def save_config(config: Dict[str, Any]) -> bool:
 
 def get_config_value(key: str, default: Any = None) -> Any:
     """Ottiene un valore specifico dalla configurazione."""
-    config = load_config()
-    return config.get(key, default)
+    return _config_corrente().get(key, default)
 
 def set_config_value(key: str, value: Any) -> bool:
     """Imposta un valore specifico nella configurazione."""
@@ -87,7 +171,7 @@ def set_config_value(key: str, value: Any) -> bool:
 
 def get_current_api_key() -> str:
     """Ottiene l'API key del provider attualmente in uso."""
-    config = load_config()
+    config = _config_corrente()
     provider = config.get("ai_provider", "deepseek")
     
     if provider == "openai":
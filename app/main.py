@@ -1,26 +1,39 @@
 from fastapi import FastAPI, Request, Form, Depends, HTTPException, Body, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
-import yaml
 import uuid
 import traceback
-import uvicorn
 import logging
 from typing import Dict, Any, List, Optional
 
 from app.config import load_config, save_config, get_config_value
-from app.api.ai_client import create_ai_client
+from app.api.ai_client import get_ai_client
 from app.models.database import (
     init_db, 
     carica_corso, 
-    carica_contenuti_corso,
-    lista_corsi,
-    elimina_corso
+    carica_metadati_capitoli,
+    carica_versioni,
+    elimina_corso,
+    statistiche_cache_corsi,
+    cerca_contenuti
 )
+from app.api.pool_rendering import pool_rendering
+from app.api.asset_statici import StaticFilesAsset, url_asset, versione_asset
+from app.api.compressione_http import MiddlewareCompressione
+from app.api.rendering_capitoli import VERSIONE_RENDERER_CAPITOLI, html_capitoli
+from app.api.cache_http import (
+    data_http,
+    etag_forte,
+    firma_template,
+    intestazioni_cache,
+    non_modificato,
+    risposta_non_modificata
+)
+from app.api.lavori_esportazione import lavori_esportazione
+from app.models.cache_esportazioni import cache_esportazioni
 from app.api.controllers import (
     crea_corso, 
     genera_scaletta_corso, 
@@ -28,8 +41,19 @@ from app.api.controllers import (
     modifica_scaletta,
     modifica_contenuto_capitolo,
     esporta_corso,
+    file_esportazione,
+    esporta_pacchetto,
+    file_pacchetto,
+    avvia_esportazione,
+    stato_esportazione,
+    file_lavoro_esportazione,
     percento_completamento,
+    elenco_corsi,
     carica_contenuto_capitolo,
+    sezioni_html_capitolo,
+    revisioni_capitolo,
+    carica_revisione_capitolo,
+    ripristina_revisione_capitolo,
     espandi_contenuti_corso,
     get_stato_espansione,
     pausa_espansione,
@@ -41,14 +65,22 @@ from app.api.controllers import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Numero di corsi per pagina nelle liste e viste che le caricano in modo incrementale
+CORSI_PER_PAGINA = 24
+VISTE_LISTA_CORSI = ("miei_corsi", "corsi")
+
 # Crea l'app FastAPI
 app = FastAPI(title="AI Course Generator")
 
-# Configura i template
+# Compressione gzip/brotli delle risposte testuali oltre compressione_risposte_min_bytes
+app.add_middleware(MiddlewareCompressione)
+
+# Configura i template; url_asset restituisce gli URL dei file statici con l'impronta
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["url_asset"] = url_asset
 
-# Configura i file statici
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Configura i file statici, con Cache-Control immutable per quelli con l'impronta
+app.mount("/static", StaticFilesAsset(directory="app/static"), name="static")
 
 # Inizializza il database
 os.makedirs("app/data/corsi", exist_ok=True)
@@ -63,13 +95,10 @@ init_db()  # Inizializza esplicitamente il database
 async def home(request: Request):
     """Pagina principale dell'applicazione."""
     try:
-        # Carica la lista dei corsi
-        corsi = lista_corsi()
-        
-        # Rendering del template
+        # La home non mostra la lista dei corsi: non serve caricarla
         return templates.TemplateResponse(
             "home.html", 
-            {"request": request, "title": "AI Course Generator", "corsi": corsi}
+            {"request": request, "title": "AI Course Generator"}
         )
     except Exception as e:
         print(f"ERRORE in home(): {str(e)}")
@@ -83,55 +112,16 @@ async def miei_corsi_page(request: Request):
     logger.info("Accesso alla pagina /miei-corsi richiesto - usando template dedicato")
     
     try:
-        # Carica tutti i corsi disponibili
-        logger.info("Tentativo di caricare la lista dei corsi (route /miei-corsi)")
-        corsi = lista_corsi()
-        logger.info(f"Corsi caricati in /miei-corsi: {len(corsi)} trovati")
+        # Carica solo la prima pagina: le successive arrivano da /corsi/pagina
+        pagina = elenco_corsi(limite=CORSI_PER_PAGINA)
+        logger.info(f"Corsi caricati in /miei-corsi: {len(pagina['corsi'])} (prima pagina)")
         
-        # Prepara i dati per il template
-        percentuale_completamento = {}
-        capitoli_generati = {}
-        num_capitoli = {}
-        
-        # Calcola lo stato di completamento per ogni corso
-        for corso_item in corsi:
-            corso_id = corso_item["id"]
-            percentuale = percento_completamento(corso_id)
-            percentuale_completamento[corso_id] = percentuale
-            
-            # Carica il corso completo per ottenere informazioni sui capitoli
-            corso_completo = carica_corso(corso_id)
-            
-            # Verifica attentamente la struttura del corso
-            if (corso_completo and 
-                corso_completo.get("scaletta") is not None and 
-                isinstance(corso_completo["scaletta"], dict) and 
-                "capitoli" in corso_completo["scaletta"]):
-                
-                num_capitoli_totali = len(corso_completo["scaletta"]["capitoli"])
-                num_capitoli[corso_id] = num_capitoli_totali
-                
-                # Conta i capitoli già generati
-                contenuti = carica_contenuti_corso(corso_id)
-                capitoli_con_contenuto = 0
-                for capitolo in corso_completo["scaletta"]["capitoli"]:
-                    if capitolo["id"] in contenuti:
-                        capitoli_con_contenuto += 1
-                
-                capitoli_generati[corso_id] = capitoli_con_contenuto
-            else:
-                # Se non c'è una scaletta valida, imposta i valori predefiniti
-                num_capitoli[corso_id] = 0
-                capitoli_generati[corso_id] = 0
-
         logger.info("Rendering del template miei_corsi.html da /miei-corsi")
         return templates.TemplateResponse("miei_corsi.html", {
             "request": request,
             "title": "I Miei Corsi",
-            "corsi": corsi,
-            "percentuale_completamento": percentuale_completamento,
-            "capitoli_generati": capitoli_generati,
-            "num_capitoli": num_capitoli
+            "corsi": pagina["corsi"],
+            "cursore_successivo": pagina["cursore_successivo"]
         })
     except Exception as e:
         logger.error(f"Errore nella pagina /miei-corsi: {str(e)}")
@@ -145,61 +135,59 @@ async def lista_corsi_page(request: Request):
     logger.info("Accesso alla pagina /corsi richiesto")
     
     try:
-        # Carica tutti i corsi disponibili
-        logger.info("Tentativo di caricare la lista dei corsi (route /corsi)")
-        corsi = lista_corsi()
-        logger.info(f"Corsi caricati in /corsi: {len(corsi)} trovati")
-        
-        # Prepara i dati per il template
-        percentuale_completamento = {}
-        capitoli_generati = {}
-        num_capitoli = {}
+        # Carica solo la prima pagina: le successive arrivano da /corsi/pagina
+        pagina = elenco_corsi(limite=CORSI_PER_PAGINA)
+        logger.info(f"Corsi caricati in /corsi: {len(pagina['corsi'])} (prima pagina)")
         
-        # Calcola lo stato di completamento per ogni corso
-        for corso_item in corsi:
-            corso_id = corso_item["id"]
-            percentuale = percento_completamento(corso_id)
-            percentuale_completamento[corso_id] = percentuale
-            
-            # Carica il corso completo per ottenere informazioni sui capitoli
-            corso_completo = carica_corso(corso_id)
-            
-            # Verifica attentamente la struttura del corso
-            if (corso_completo and 
-                corso_completo.get("scaletta") is not None and 
-                isinstance(corso_completo["scaletta"], dict) and 
-                "capitoli" in corso_completo["scaletta"]):
-                
-                num_capitoli_totali = len(corso_completo["scaletta"]["capitoli"])
-                num_capitoli[corso_id] = num_capitoli_totali
-                
-                # Conta i capitoli già generati
-                contenuti = carica_contenuti_corso(corso_id)
-                capitoli_con_contenuto = 0
-                for capitolo in corso_completo["scaletta"]["capitoli"]:
-                    if capitolo["id"] in contenuti:
-                        capitoli_con_contenuto += 1
-                
-                capitoli_generati[corso_id] = capitoli_con_contenuto
-            else:
-                # Se non c'è una scaletta valida, imposta i valori predefiniti
-                num_capitoli[corso_id] = 0
-                capitoli_generati[corso_id] = 0
-
         logger.info("Rendering del template corsi.html da /corsi")
         return templates.TemplateResponse("corsi.html", {
             "request": request,
             "title": "I Miei Corsi",
-            "corsi": corsi,
-            "percentuale_completamento": percentuale_completamento,
-            "capitoli_generati": capitoli_generati,
-            "num_capitoli": num_capitoli
+            "corsi": pagina["corsi"],
+            "cursore_successivo": pagina["cursore_successivo"]
         })
     except Exception as e:
         logger.error(f"Errore nella pagina /corsi: {str(e)}")
         logger.error(f"Tracciamento: {traceback.format_exc()}")
         raise
 
+@app.get("/corsi/pagina", response_class=HTMLResponse)
+async def pagina_corsi_fragment(
+    request: Request,
+    vista: str = Query("miei_corsi"),
+    cursore: Optional[str] = Query(None),
+    stato: Optional[str] = Query(None),
+    ordine: str = Query("recenti")
+):
+    """Frammento HTML con una pagina di card, per il caricamento incrementale delle liste."""
+    if vista not in VISTE_LISTA_CORSI:
+        raise HTTPException(status_code=400, detail=f"Vista non valida: {vista}")
+    try:
+        pagina = elenco_corsi(CORSI_PER_PAGINA, cursore, ordine, stato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return templates.TemplateResponse(
+        "_pagina_corsi.html",
+        {"request": request, "corsi": pagina["corsi"], "vista": vista},
+        headers={"X-Cursore-Successivo": pagina["cursore_successivo"] or ""}
+    )
+
+@app.get("/api/corsi", response_class=JSONResponse)
+async def api_lista_corsi(
+    limite: int = Query(CORSI_PER_PAGINA, ge=1, le=100),
+    cursore: Optional[str] = Query(None, description="Cursore restituito dalla pagina precedente"),
+    stato: Optional[str] = Query(None, description="completo, in-progress o non-iniziato"),
+    ordine: str = Query("recenti", description="recenti o meno_recenti")
+):
+    """Lista paginata dei corsi con le sole informazioni delle card."""
+    try:
+        pagina = elenco_corsi(limite, cursore, ordine, stato)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+    
+    return {"success": True, **pagina}
+
 @app.get("/nuovo-corso", response_class=HTMLResponse)
 async def nuovo_corso_form(request: Request):
     """Form per la creazione di un nuovo corso."""
@@ -294,8 +282,8 @@ async def generazione_contenuti(request: Request, corso_id: str):
     if not corso.get("scaletta"):
         return RedirectResponse(url=f"/corso/{corso_id}", status_code=303)
     
-    # Carica i contenuti già generati
-    contenuti = carica_contenuti_corso(corso_id)
+    # Carica i metadati dei capitoli già generati (senza leggerne il contenuto)
+    metadati = carica_metadati_capitoli(corso_id)
     
     # Prepara i dati dei capitoli con lo stato di generazione
     capitoli = []
@@ -312,7 +300,7 @@ async def generazione_contenuti(request: Request, corso_id: str):
             "id": cap["id"],
             "titolo": cap["titolo"],
             "num_sottoargomenti": num_elementi,
-            "generato": cap["id"] in contenuti
+            "generato": cap["id"] in metadati
         })
     
     # Calcola la percentuale di completamento
@@ -330,9 +318,34 @@ async def generazione_contenuti(request: Request, corso_id: str):
         }
     )
 
+def _intestazioni_pagina(template: str, *parti: Any, ultimo_aggiornamento: Optional[str] = None) -> Dict[str, str]:
+    """Intestazioni di validazione di una pagina HTML: ETag dalle versioni indicate e dal template."""
+    return intestazioni_cache(
+        etag_forte(template, firma_template(template, "base.html"), versione_asset(), *parti),
+        data_http(ultimo_aggiornamento)
+    )
+
+def _intestazioni_download(risultato: Dict[str, Any]) -> Dict[str, str]:
+    return intestazioni_cache(risultato["etag"], risultato["ultima_modifica"])
+
 @app.get("/corso/{corso_id}/scaletta", response_class=HTMLResponse)
 async def visualizza_scaletta(request: Request, corso_id: str):
-    """Visualizza e consente di modificare la scaletta di un corso."""
+    """
+    Visualizza e consente di modificare la scaletta di un corso.
+    
+    La pagina ha un ETag derivato dalla versione del corso: se il client ne ha già
+    la copia corrente riceve 304 senza che il corso venga caricato.
+    """
+    versioni = carica_versioni(corso_id)
+    if not versioni:
+        raise HTTPException(status_code=404, detail="Corso non trovato")
+    
+    intestazioni = _intestazioni_pagina(
+        "scaletta.html", corso_id, versioni["versione"], ultimo_aggiornamento=versioni["ultimo_aggiornamento"]
+    )
+    if non_modificato(request, intestazioni["ETag"], intestazioni.get("Last-Modified")):
+        return risposta_non_modificata(intestazioni)
+    
     # Carica il corso dal database
     corso = carica_corso(corso_id)
     
@@ -354,12 +367,36 @@ async def visualizza_scaletta(request: Request, corso_id: str):
             "scaletta": corso["scaletta"],
             "requisiti_specifici": corso["parametri"].get("requisiti_specifici", ""),
             "stile_scrittura": corso["parametri"].get("stile_scrittura", "")
-        }
+        },
+        headers=intestazioni
     )
 
 @app.get("/corso/{corso_id}/capitolo/{capitolo_id}", response_class=HTMLResponse)
 async def visualizza_capitolo(request: Request, corso_id: str, capitolo_id: str):
-    """Visualizza un singolo capitolo del corso."""
+    """
+    Visualizza un singolo capitolo del corso.
+    
+    L'ETag deriva dalla versione del corso (scaletta e navigazione) e dall'hash del
+    contenuto del capitolo: le richieste condizionali ricevono 304 senza leggere il contenuto.
+    Il Markdown viene reso in HTML sul server (con cache per hash del contenuto): la
+    pagina contiene la prima sezione, le altre vengono caricate dal browser subito dopo.
+    """
+    versioni = carica_versioni(corso_id, capitolo_id)
+    if not versioni:
+        raise HTTPException(status_code=404, detail="Corso non trovato")
+    
+    contenuto_capitolo = versioni["capitolo"] or {}
+    intestazioni = _intestazioni_pagina(
+        "capitolo.html", corso_id, capitolo_id, versioni["versione"], contenuto_capitolo.get("hash_contenuto"),
+        VERSIONE_RENDERER_CAPITOLI,
+        ultimo_aggiornamento=max(
+            filter(None, (versioni["ultimo_aggiornamento"], contenuto_capitolo.get("ultimo_aggiornamento"))),
+            default=None
+        )
+    )
+    if non_modificato(request, intestazioni["ETag"], intestazioni.get("Last-Modified")):
+        return risposta_non_modificata(intestazioni)
+    
     # Carica il corso dal database
     corso = carica_corso(corso_id)
     
@@ -380,14 +417,17 @@ async def visualizza_capitolo(request: Request, corso_id: str, capitolo_id: str)
     if not capitolo:
         raise HTTPException(status_code=404, detail="Capitolo non trovato")
     
-    # Controlla se il contenuto è già stato generato
-    contenuto = carica_contenuto_capitolo(corso_id, capitolo_id)
-    has_contenuto = contenuto is not None
+    # Controlla se il contenuto è già stato generato e ne ottiene l'HTML, diviso in sezioni
+    has_contenuto = bool(contenuto_capitolo)
+    sezioni = []
+    if has_contenuto:
+        risultato = await sezioni_html_capitolo(corso_id, capitolo_id, contenuto_capitolo["hash_contenuto"])
+        if not risultato["success"]:
+            raise HTTPException(status_code=risultato["status_code"], detail=risultato["message"])
+        sezioni = risultato["sezioni"]
     
     # Carica il modello utilizzato per la generazione, se disponibile
-    modello_utilizzato = None
-    if hasattr(capitolo, "modello_utilizzato"):
-        modello_utilizzato = capitolo.get("modello_utilizzato")
+    modello_utilizzato = capitolo.get("modello_utilizzato")
     
     return templates.TemplateResponse(
         "capitolo.html", 
@@ -399,10 +439,14 @@ async def visualizza_capitolo(request: Request, corso_id: str, capitolo_id: str)
             "capitolo": capitolo,
             "capitolo_id": capitolo_id,
             "has_contenuto": has_contenuto,
-            "contenuto": contenuto or "",
+            "contenuto_html": sezioni[0] if sezioni else "",
+            "sezioni_totali": len(sezioni),
+            "versione_contenuto": contenuto_capitolo.get("hash_contenuto", ""),
+            "versione_renderer": VERSIONE_RENDERER_CAPITOLI,
             "scaletta": corso["scaletta"],
             "modello_utilizzato": modello_utilizzato
-        }
+        },
+        headers=intestazioni
     )
 
 @app.get("/impostazioni")
@@ -494,9 +538,8 @@ async def impostazioni_submit(
         # Salva le impostazioni
         success = save_config(config)
         
-        # Ricrea il client AI con le nuove impostazioni
-        create_ai_client()
-        logger.info(f"Client AI ricreato con il provider: {ai_provider}")
+        # Le nuove impostazioni valgono dalla prossima richiesta, che crea il proprio client AI
+        logger.info(f"Provider AI impostato: {ai_provider}")
         
         # Prepara i dati per la risposta
         openai_configured = bool(config.get("openai_api_key", ""))
@@ -583,14 +626,58 @@ async def api_genera_contenuto(corso_id: str, capitolo_id: str):
     return await genera_contenuto_capitolo(corso_id, capitolo_id)
 
 @app.get("/api/corso/{corso_id}/capitolo/{capitolo_id}/contenuto")
-async def api_get_contenuto(corso_id: str, capitolo_id: str):
-    """API per ottenere il contenuto di un capitolo."""
+async def api_get_contenuto(request: Request, corso_id: str, capitolo_id: str):
+    """
+    API per ottenere il contenuto di un capitolo.
+    
+    L'ETag deriva da versione e hash del contenuto del capitolo: se il client ha già
+    la versione corrente riceve 304 senza che il contenuto venga letto dall'archivio.
+    """
+    versioni = carica_versioni(corso_id, capitolo_id)
+    capitolo = versioni["capitolo"] if versioni else None
+    if not capitolo:
+        return {"success": False, "message": "Contenuto non trovato"}
+    
+    intestazioni = intestazioni_cache(
+        etag_forte("contenuto", corso_id, capitolo_id, capitolo["versione"], capitolo["hash_contenuto"]),
+        data_http(capitolo["ultimo_aggiornamento"])
+    )
+    if non_modificato(request, intestazioni["ETag"], intestazioni.get("Last-Modified")):
+        return risposta_non_modificata(intestazioni)
+    
     contenuto = carica_contenuto_capitolo(corso_id, capitolo_id)
     
     if not contenuto:
         return {"success": False, "message": "Contenuto non trovato"}
     
-    return {"success": True, "contenuto": contenuto}
+    return JSONResponse(content={"success": True, "contenuto": contenuto}, headers=intestazioni)
+
+@app.get("/api/corso/{corso_id}/capitolo/{capitolo_id}/sezioni/{indice}", response_class=HTMLResponse)
+async def api_sezione_capitolo(corso_id: str, capitolo_id: str, indice: int, versione: str, renderer: int):
+    """
+    HTML di una sezione del capitolo, per la pagina del capitolo che la carica in differita.
+    
+    L'URL contiene hash del contenuto e versione del renderer, quindi la risposta non
+    cambia mai ed è servita con Cache-Control immutable; dopo una modifica la pagina
+    usa URL nuovi. Per una versione non più corrente la risposta è 409.
+    """
+    if renderer != VERSIONE_RENDERER_CAPITOLI:
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "message": "Il contenuto del capitolo è cambiato: ricarica la pagina"}
+        )
+    
+    risultato = await sezioni_html_capitolo(corso_id, capitolo_id, versione)
+    if not risultato["success"]:
+        return JSONResponse(
+            status_code=risultato.get("status_code", 500),
+            content={"success": False, "message": risultato["message"]}
+        )
+    
+    sezioni = risultato["sezioni"]
+    if not 0 <= indice < len(sezioni):
+        return JSONResponse(status_code=404, content={"success": False, "message": "Sezione non trovata"})
+    return HTMLResponse(sezioni[indice], headers={"Cache-Control": "public, max-age=31536000, immutable"})
 
 @app.put("/api/corso/{corso_id}/capitolo/{capitolo_id}/contenuto/edit")
 async def api_modifica_contenuto(corso_id: str, capitolo_id: str, dati: dict = Body(...)):
@@ -602,6 +689,21 @@ async def api_modifica_contenuto(corso_id: str, capitolo_id: str, dati: dict = B
     risultato = await modifica_contenuto_capitolo(corso_id, capitolo_id, contenuto)
     return risultato
 
+@app.get("/api/corso/{corso_id}/capitolo/{capitolo_id}/revisioni")
+async def api_revisioni_capitolo(corso_id: str, capitolo_id: str):
+    """API per ottenere la cronologia delle revisioni di un capitolo."""
+    return revisioni_capitolo(corso_id, capitolo_id)
+
+@app.get("/api/corso/{corso_id}/capitolo/{capitolo_id}/revisioni/{revisione}")
+async def api_revisione_capitolo(corso_id: str, capitolo_id: str, revisione: int):
+    """API per ottenere il testo di una revisione di un capitolo."""
+    return carica_revisione_capitolo(corso_id, capitolo_id, revisione)
+
+@app.post("/api/corso/{corso_id}/capitolo/{capitolo_id}/revisioni/{revisione}/ripristina")
+async def api_ripristina_revisione(corso_id: str, capitolo_id: str, revisione: int):
+    """API per ripristinare una revisione precedente di un capitolo."""
+    return await ripristina_revisione_capitolo(corso_id, capitolo_id, revisione)
+
 @app.post("/api/corso/{corso_id}/genera-scaletta-redirect")
 async def api_genera_scaletta_redirect(corso_id: str, request: Request):
     """API per generare la scaletta di un corso con reindirizzamento diretto."""
@@ -620,6 +722,23 @@ async def api_genera_scaletta_redirect(corso_id: str, request: Request):
         # Torna alla pagina del corso con un messaggio di errore
         return RedirectResponse(url=f"/corso/{corso_id}", status_code=303)
 
+@app.get("/api/cerca", response_class=JSONResponse)
+async def api_cerca(
+    q: str = Query("", description="Parole da cercare"),
+    limite: int = Query(20, ge=1, le=100),
+    corso_id: Optional[str] = Query(None, description="Limita la ricerca a un corso")
+):
+    """Ricerca full-text su corsi e capitoli, con risultati ordinati per rilevanza."""
+    try:
+        risultati = cerca_contenuti(q, limite, corso_id)
+        return {"success": True, "query": q, "risultati": risultati}
+    except Exception as e:
+        logger.error(f"Errore nella ricerca '{q}': {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Errore nella ricerca: {str(e)}"}
+        )
+
 @app.get("/api/status", response_class=JSONResponse)
 async def api_status():
     """Verifica lo stato e la configurazione delle API."""
@@ -657,7 +776,14 @@ async def api_status():
                 "base_url": config.get("deepseek_base_url", "")
             }
         },
-        "config": safe_config
+        "config": safe_config,
+        "cache": {
+            "corsi": statistiche_cache_corsi(),
+            "html_capitoli": html_capitoli.statistiche(),
+            "esportazioni": cache_esportazioni.statistiche()
+        },
+        "rendering": pool_rendering.statistiche(),
+        "esportazioni_in_background": lavori_esportazione.statistiche()
     }
 
 @app.middleware("http")
@@ -688,13 +814,13 @@ async def finalizza_corso_page(request: Request, corso_id: str):
     if not corso.get("scaletta"):
         return RedirectResponse(url=f"/corso/{corso_id}", status_code=303)
     
-    # Carica i contenuti già generati
-    contenuti = carica_contenuti_corso(corso_id)
+    # Carica i metadati dei capitoli già generati
+    metadati = carica_metadati_capitoli(corso_id)
     
     # Verifica se tutti i capitoli sono stati generati
     capitoli_mancanti = []
     for cap in corso["scaletta"]["capitoli"]:
-        if cap["id"] not in contenuti:
+        if cap["id"] not in metadati:
             capitoli_mancanti.append(cap["titolo"])
     
     # Calcola la percentuale di completamento
@@ -718,6 +844,112 @@ async def api_esporta_corso(corso_id: str, formato: str = "markdown"):
     """API per esportare un corso nel formato specificato."""
     return await esporta_corso(corso_id, formato)
 
+@app.get("/api/corso/{corso_id}/esporta/download")
+async def api_scarica_esportazione(request: Request, corso_id: str, formato: str = "markdown"):
+    """
+    Scarica il corso esportato nel formato specificato.
+    
+    Il file viene inviato in streaming con Content-Disposition di allegato; le
+    richieste Range (e If-Range) permettono di riprendere un download interrotto.
+    L'ETag è la chiave di cache dell'esportazione: con una copia ancora valida il
+    client riceve 304 senza che il file venga preparato.
+    """
+    risultato = await file_esportazione(
+        corso_id, formato, copia_valida=lambda etag, data: non_modificato(request, etag, data)
+    )
+    if not risultato["success"]:
+        return JSONResponse(
+            status_code=risultato.get("status_code", 500),
+            content={"success": False, "message": risultato["message"]}
+        )
+    if risultato.get("non_modificato"):
+        return risposta_non_modificata(_intestazioni_download(risultato))
+    
+    return FileResponse(
+        risultato["percorso"],
+        media_type=risultato["media_type"],
+        filename=risultato["filename"],
+        headers=_intestazioni_download(risultato)
+    )
+
+@app.post("/api/corso/{corso_id}/esportazioni")
+async def api_avvia_esportazione(corso_id: str, formato: str = "markdown"):
+    """
+    Avvia l'esportazione del corso in background e risponde subito (202) con l'ID del lavoro.
+    
+    L'avanzamento si legge da /api/esportazioni/{job_id}; a lavoro completato la
+    risposta contiene in url l'indirizzo di download, valido per un tempo limitato.
+    """
+    risultato = await avvia_esportazione(corso_id, formato)
+    if not risultato["success"]:
+        return JSONResponse(
+            status_code=risultato.get("status_code", 500),
+            content={"success": False, "message": risultato["message"]}
+        )
+    return JSONResponse(status_code=202, content=risultato)
+
+@app.get("/api/esportazioni/{job_id}")
+async def api_stato_esportazione(job_id: str):
+    """Stato di un'esportazione in background: capitoli convertiti e, al termine, URL di download."""
+    risultato = stato_esportazione(job_id)
+    if "status_code" in risultato:
+        return JSONResponse(
+            status_code=risultato["status_code"],
+            content={"success": False, "message": risultato["message"]}
+        )
+    return risultato
+
+@app.get("/api/esportazioni/{job_id}/download")
+async def api_scarica_esportazione_lavoro(request: Request, job_id: str):
+    """Scarica il file di un'esportazione in background completata, finché il link non scade."""
+    risultato = file_lavoro_esportazione(job_id)
+    if not risultato["success"]:
+        return JSONResponse(
+            status_code=risultato.get("status_code", 500),
+            content={"success": False, "message": risultato["message"]}
+        )
+    intestazioni = _intestazioni_download(risultato)
+    if non_modificato(request, risultato["etag"], risultato["ultima_modifica"]):
+        return risposta_non_modificata(intestazioni)
+    
+    return FileResponse(
+        risultato["percorso"],
+        media_type=risultato["media_type"],
+        filename=risultato["filename"],
+        headers=intestazioni
+    )
+
+@app.get("/api/corso/{corso_id}/esporta/pacchetto")
+async def api_esporta_pacchetto(corso_id: str, formati: Optional[str] = None):
+    """API per esportare un corso in più formati (es. formati=pdf,docx,epub) in un pacchetto ZIP."""
+    return await esporta_pacchetto(corso_id, formati)
+
+@app.get("/api/corso/{corso_id}/esporta/pacchetto/download")
+async def api_scarica_pacchetto(request: Request, corso_id: str, formati: Optional[str] = None):
+    """
+    Scarica il pacchetto ZIP del corso esportato nei formati indicati (tutti se omessi).
+
+    Come per i singoli formati, il file viene inviato in streaming, supporta le richieste
+    Range e le richieste condizionali (304 senza preparare il pacchetto).
+    """
+    risultato = await file_pacchetto(
+        corso_id, formati, copia_valida=lambda etag, data: non_modificato(request, etag, data)
+    )
+    if not risultato["success"]:
+        return JSONResponse(
+            status_code=risultato.get("status_code", 500),
+            content={"success": False, "message": risultato["message"]}
+        )
+    if risultato.get("non_modificato"):
+        return risposta_non_modificata(_intestazioni_download(risultato))
+
+    return FileResponse(
+        risultato["percorso"],
+        media_type=risultato["media_type"],
+        filename=risultato["filename"],
+        headers=_intestazioni_download(risultato)
+    )
+
 @app.delete("/api/corso/{corso_id}", response_class=JSONResponse)
 async def api_elimina_corso(corso_id: str):
     """Elimina un corso e tutti i suoi contenuti associati."""
@@ -967,8 +1199,8 @@ async def api_verifica_chiave_api():
         Risultato della verifica
     """
     try:
-        # Inizializza il client AI
-        ai_client = create_ai_client()
+        # Client AI della richiesta
+        ai_client = get_ai_client()
         
         # Verifica la chiave API
         risultato = await ai_client.verifica_chiave_api()
@@ -989,8 +1221,8 @@ async def api_modelli_disponibili():
         Lista dei modelli disponibili
     """
     try:
-        # Inizializza il client AI
-        ai_client = create_ai_client()
+        # Client AI della richiesta
+        ai_client = get_ai_client()
         
         # Ottieni la lista dei modelli disponibili
         modelli = await ai_client.get_available_models()
@@ -1011,4 +1243,5 @@ async def api_modelli_disponibili():
         }
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
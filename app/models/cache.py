@@ -0,0 +1,91 @@
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class CacheLRU:
+    """
+    Cache in memoria con politica LRU, limitata per numero di voci e per byte.
+    
+    I valori vengono memorizzati serializzati con pickle: ogni lettura restituisce
+    quindi una copia indipendente, che il chiamante può modificare liberamente
+    senza alterare il contenuto della cache. Ogni voce è associata a una versione:
+    una lettura con una versione diversa da quella memorizzata è un miss.
+    """
+    
+    def __init__(self, nome: str, max_voci: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.nome = nome
+        self.max_voci = max_voci
+        self.max_bytes = max_bytes
+        self._voci: "OrderedDict[Hashable, Tuple[Any, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hit = 0
+        self._miss = 0
+        self._evizioni = 0
+        self._invalidazioni = 0
+    
+    def get(self, chiave: Hashable, versione: Any = None) -> Optional[Any]:
+        """Restituisce una copia del valore memorizzato, o None se assente o di un'altra versione."""
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None or voce[0] != versione:
+                self._miss += 1
+                return None
+            self._voci.move_to_end(chiave)
+            self._hit += 1
+            dati = voce[1]
+        return pickle.loads(dati)
+    
+    def set(self, chiave: Hashable, valore: Any, versione: Any = None):
+        """Memorizza un valore, rimuovendo le voci usate meno di recente se necessario."""
+        dati = pickle.dumps(valore, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(dati) > self.max_bytes:
+            return
+        
+        with self._lock:
+            self._rimuovi(chiave)
+            self._voci[chiave] = (versione, dati)
+            self._bytes += len(dati)
+            
+            while len(self._voci) > self.max_voci or self._bytes > self.max_bytes:
+                _, (_, rimossi) = self._voci.popitem(last=False)
+                self._bytes -= len(rimossi)
+                self._evizioni += 1
+    
+    def invalida(self, chiave: Hashable):
+        """Rimuove una voce dalla cache."""
+        with self._lock:
+            if self._rimuovi(chiave):
+                self._invalidazioni += 1
+    
+    def svuota(self):
+        """Rimuove tutte le voci dalla cache."""
+        with self._lock:
+            self._invalidazioni += len(self._voci)
+            self._voci.clear()
+            self._bytes = 0
+    
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce le metriche della cache (hit rate, voci, byte occupati, evizioni)."""
+        with self._lock:
+            richieste = self._hit + self._miss
+            return {
+                "nome": self.nome,
+                "voci": len(self._voci),
+                "bytes": self._bytes,
+                "max_voci": self.max_voci,
+                "max_bytes": self.max_bytes,
+                "hit": self._hit,
+                "miss": self._miss,
+                "hit_rate": round(self._hit / richieste, 4) if richieste else 0.0,
+                "evizioni": self._evizioni,
+                "invalidazioni": self._invalidazioni
+            }
+    
+    def _rimuovi(self, chiave: Hashable) -> bool:
+        voce = self._voci.pop(chiave, None)
+        if voce is None:
+            return False
+        self._bytes -= len(voce[1])
+        return True
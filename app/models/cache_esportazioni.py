@@ -0,0 +1,194 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import get_config_value
+
+# Directory dei file esportati, una sottodirectory per corso
+ESPORTAZIONI_DIR = Path("app/data/esportazioni")
+
+def _collega(sorgente: Path, destinazione: Path):
+    """Hard link di un file (copia se non è possibile); una destinazione esistente ha già lo stesso contenuto."""
+    if destinazione.exists():
+        return
+    try:
+        os.link(sorgente, destinazione)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(sorgente, destinazione)
+
+class CacheEsportazioni:
+    """
+    Cache su disco dei file esportati, con politica LRU limitata per byte totali.
+
+    Ogni file è identificato da una chiave calcolata dal chiamante sul contenuto del
+    corso, sul formato e sulla versione del renderer: un corso modificato produce una
+    chiave diversa, quindi un file in cache non è mai obsoleto. Le modifiche al corso
+    invalidano comunque i suoi file non più usati, per liberare subito lo spazio; i file
+    temporanei delle esportazioni in corso non vengono toccati. L'ordine LRU è
+    dato dalla data di modifica dei file, aggiornata a ogni hit, così è condiviso tra
+    più worker.
+    """
+
+    def __init__(self, directory: Path = ESPORTAZIONI_DIR, max_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hit = 0
+        self._miss = 0
+        self._evizioni = 0
+        self._invalidazioni = 0
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return int(get_config_value("cache_esportazioni_mb", 500)) * 1024 * 1024
+
+    def _percorso(self, corso_id: str, chiave: str, estensione: str) -> Path:
+        return self.directory / corso_id / f"{chiave}.{estensione}"
+
+    def cerca(self, corso_id: str, chiave: str, estensione: str,
+              collega_in: Optional[Path] = None) -> Optional[Path]:
+        """
+        Restituisce il file in cache con la chiave indicata, o None se assente.
+
+        Con collega_in il file viene anche collegato in quel percorso, fuori dalla cache,
+        e viene restituito il collegamento: resta leggibile anche se nel frattempo l'LRU
+        o l'invalidazione rimuovono il file dalla cache.
+        """
+        percorso = self._percorso(corso_id, chiave, estensione)
+        try:
+            os.utime(percorso)
+            if collega_in is not None:
+                _collega(percorso, collega_in)
+                percorso = collega_in
+        except FileNotFoundError:
+            with self._lock:
+                self._miss += 1
+            return None
+        with self._lock:
+            self._hit += 1
+        return percorso
+
+    async def salva(self, corso_id: str, chiave: str, estensione: str,
+                    scrivi: Callable[[Path], Awaitable[None]], collega_in: Optional[Path] = None) -> Path:
+        """
+        Produce un file con la coroutine scrivi e lo aggiunge alla cache.
+
+        scrivi riceve un percorso temporaneo; il file viene spostato nella posizione
+        definitiva solo se la scrittura termina senza errori. collega_in funziona come
+        in cerca(): il collegamento viene creato prima che il file entri in cache, quindi
+        nessuna evizione può precederlo.
+        """
+        percorso = self._percorso(corso_id, chiave, estensione)
+        percorso.parent.mkdir(parents=True, exist_ok=True)
+        temporaneo = percorso.with_name(f".{percorso.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            await scrivi(temporaneo)
+            if collega_in is not None:
+                _collega(temporaneo, collega_in)
+            try:
+                os.replace(temporaneo, percorso)
+            except FileNotFoundError:
+                # Directory del corso rimossa durante la scrittura (es. da una versione
+                # precedente in un altro worker): viene ricreata
+                if not temporaneo.exists():
+                    raise
+                percorso.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temporaneo, percorso)
+        finally:
+            if temporaneo.exists():
+                temporaneo.unlink()
+
+        self._applica_limite(percorso)
+        return collega_in if collega_in is not None else percorso
+
+    def invalida_corso(self, corso_id: str):
+        """
+        Rimuove i file in cache di un corso non usati dopo l'inizio dell'invalidazione.
+
+        Le chiavi sono indirizzate per contenuto, quindi i file rimossi non verrebbero più
+        serviti: l'invalidazione libera solo spazio. La directory e i file temporanei
+        (nomi con il punto iniziale) restano, perché un'esportazione in corso può stare
+        scrivendo; un file prodotto o servito da una richiesta concorrente ha la data di
+        modifica aggiornata e viene lasciato alla politica LRU.
+        """
+        directory = self.directory / corso_id
+        if not directory.exists():
+            return
+        inizio = time.time()
+        for percorso in directory.iterdir():
+            if percorso.name.startswith("."):
+                continue
+            try:
+                if percorso.is_file() and percorso.stat().st_mtime < inizio:
+                    percorso.unlink()
+            except OSError:
+                continue
+        with self._lock:
+            self._invalidazioni += 1
+
+    def _applica_limite(self, appena_scritto: Path):
+        """Rimuove i file usati meno di recente finché la cache non rientra nel limite."""
+        file_cache = []
+        totale = 0
+        for percorso in self.directory.glob("*/*"):
+            if percorso.name.startswith("."):
+                continue
+            try:
+                stat = percorso.stat()
+            except FileNotFoundError:
+                continue
+            file_cache.append((stat.st_mtime, stat.st_size, percorso))
+            totale += stat.st_size
+
+        limite = self.max_bytes
+        if totale <= limite:
+            return
+
+        file_cache.sort()
+        for _, dimensione, percorso in file_cache:
+            if totale <= limite:
+                break
+            if percorso == appena_scritto:
+                continue
+            try:
+                percorso.unlink()
+            except FileNotFoundError:
+                continue
+            totale -= dimensione
+            with self._lock:
+                self._evizioni += 1
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce le metriche della cache (hit rate, file, byte occupati, evizioni)."""
+        file_cache = [p for p in self.directory.glob("*/*") if not p.name.startswith(".")]
+        dimensione = 0
+        for percorso in file_cache:
+            try:
+                dimensione += percorso.stat().st_size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            richieste = self._hit + self._miss
+            return {
+                "nome": "esportazioni",
+                "file": len(file_cache),
+                "bytes": dimensione,
+                "max_bytes": self.max_bytes,
+                "hit": self._hit,
+                "miss": self._miss,
+                "hit_rate": round(self._hit / richieste, 4) if richieste else 0.0,
+                "evizioni": self._evizioni,
+                "invalidazioni": self._invalidazioni
+            }
+
+cache_esportazioni = CacheEsportazioni()
@@ -0,0 +1,270 @@
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import atexit
+import logging
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+# zstd è opzionale: se la libreria non è installata si ripiega su zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Directory dei blob indirizzati per contenuto e del mirror Markdown opzionale
+BLOB_DIR = Path("app/data/blob")
+CONTENUTI_DIR = Path("app/data/contenuti")
+
+def _scrivi_file_atomico(percorso: Path, dati: bytes):
+    """Scrive un file tramite file temporaneo e rename, per non lasciare file parziali."""
+    percorso.parent.mkdir(parents=True, exist_ok=True)
+    temporaneo = percorso.with_name(f".{percorso.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(temporaneo, "wb") as f:
+        f.write(dati)
+    os.replace(temporaneo, percorso)
+
+# Codec di compressione supportati; "" indica testo non compresso
+CODEC_NESSUNO = ""
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+# Sotto questa soglia la compressione non conviene e il testo resta in chiaro
+SOGLIA_COMPRESSIONE = 512
+
+def codifica_contenuto(contenuto: str, codec: Optional[str]) -> Tuple[Union[str, bytes], str]:
+    """
+    Comprime un contenuto con il codec richiesto.
+    
+    Returns:
+        Coppia (valore da archiviare, codec effettivamente usato). Se zstd non è
+        disponibile viene usato zlib; i contenuti brevi restano non compressi.
+    """
+    if not codec or codec == CODEC_NESSUNO or len(contenuto) < SOGLIA_COMPRESSIONE:
+        return contenuto, CODEC_NESSUNO
+    
+    dati = contenuto.encode("utf-8")
+    if codec == CODEC_ZSTD:
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=3).compress(dati), CODEC_ZSTD
+        logger.warning("Libreria zstandard non installata, uso zlib per la compressione")
+    elif codec != CODEC_ZLIB:
+        logger.warning(f"Codec di compressione sconosciuto '{codec}', uso zlib")
+    
+    return zlib.compress(dati, 6), CODEC_ZLIB
+
+def decodifica_contenuto(valore: Union[str, bytes, None], codec: Optional[str]) -> Optional[str]:
+    """Restituisce il testo di un contenuto archiviato con il codec indicato."""
+    if valore is None or not codec:
+        return valore
+    
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(valore).decode("utf-8")
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Per leggere contenuti compressi con zstd installa 'zstandard' (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(valore).decode("utf-8")
+    
+    raise ValueError(f"Codec di compressione sconosciuto: {codec}")
+
+class ContentStore:
+    """
+    Archivio del testo dei capitoli.
+
+    La riga di contenuti_capitoli esiste sempre (metadati, hash, stato); l'archivio
+    decide dove vive il testo. Il nome dell'archivio viene salvato per ogni riga nella
+    colonna "archivio", così le righe scritte con archivi diversi restano leggibili.
+    """
+
+    nome = ""
+
+    def salva(self, contenuto: str, hash_contenuto: str, codec: str = CODEC_NESSUNO) -> Tuple[Optional[Union[str, bytes]], str]:
+        """
+        Archivia il contenuto, compresso con il codec richiesto.
+        
+        Returns:
+            Coppia (valore da salvare nella colonna contenuto, codec effettivamente usato)
+        """
+        raise NotImplementedError
+
+    def carica(self, valore_colonna: Optional[Union[str, bytes]], hash_contenuto: Optional[str],
+               codec: Optional[str] = CODEC_NESSUNO) -> Optional[str]:
+        """Restituisce il testo a partire dalla colonna contenuto, dall'hash e dal codec della riga."""
+        raise NotImplementedError
+
+    def rilascia(self, cursor: sqlite3.Cursor, hash_contenuto: Optional[str], codec: Optional[str] = CODEC_NESSUNO):
+        """
+        Libera lo spazio di un contenuto non più referenziato da alcuna riga.
+
+        Va chiamato dopo il commit del chiamante, fuori da una transazione: il controllo
+        dei riferimenti e la rimozione avvengono con il lock di scrittura del database.
+        """
+
+class DatabaseContentStore(ContentStore):
+    """Archivio predefinito: il testo è salvato nella colonna contenuti_capitoli.contenuto."""
+
+    nome = "database"
+
+    def salva(self, contenuto: str, hash_contenuto: str, codec: str = CODEC_NESSUNO) -> Tuple[Optional[Union[str, bytes]], str]:
+        return codifica_contenuto(contenuto, codec)
+
+    def carica(self, valore_colonna: Optional[Union[str, bytes]], hash_contenuto: Optional[str],
+               codec: Optional[str] = CODEC_NESSUNO) -> Optional[str]:
+        return decodifica_contenuto(valore_colonna, codec)
+
+class BlobContentStore(ContentStore):
+    """
+    Archivio su disco indirizzato per contenuto: app/data/blob/ab/<sha256>[.codec].
+
+    Contenuti identici sono salvati una sola volta; il file viene rimosso quando
+    nessuna riga di contenuti_capitoli ne fa più riferimento.
+
+    salva() va chiamato nella transazione di scrittura (BEGIN IMMEDIATE) che inserisce
+    la riga, e rilascia() ricontrolla i riferimenti con lo stesso lock: così un file
+    già presente, che salva() non riscrive, non può essere rimosso tra il salvataggio
+    e l'inserimento della riga che lo referenzia.
+    """
+
+    nome = "blob"
+
+    def __init__(self, directory: Path = BLOB_DIR):
+        self.directory = Path(directory)
+
+    def _percorso(self, hash_contenuto: str, codec: Optional[str]) -> Path:
+        nome_file = f"{hash_contenuto}.{codec}" if codec else hash_contenuto
+        return self.directory / hash_contenuto[:2] / nome_file
+
+    def salva(self, contenuto: str, hash_contenuto: str, codec: str = CODEC_NESSUNO) -> Tuple[Optional[Union[str, bytes]], str]:
+        valore, codec = codifica_contenuto(contenuto, codec)
+        percorso = self._percorso(hash_contenuto, codec)
+        if not percorso.exists():
+            _scrivi_file_atomico(percorso, valore.encode("utf-8") if isinstance(valore, str) else valore)
+        return None, codec
+
+    def carica(self, valore_colonna: Optional[Union[str, bytes]], hash_contenuto: Optional[str],
+               codec: Optional[str] = CODEC_NESSUNO) -> Optional[str]:
+        if not hash_contenuto:
+            return decodifica_contenuto(valore_colonna, codec)
+        try:
+            dati = self._percorso(hash_contenuto, codec).read_bytes()
+        except FileNotFoundError:
+            logger.error(f"Blob {hash_contenuto} non trovato")
+            return None
+        return decodifica_contenuto(dati, codec) if codec else dati.decode("utf-8")
+
+    def rilascia(self, cursor: sqlite3.Cursor, hash_contenuto: Optional[str], codec: Optional[str] = CODEC_NESSUNO):
+        if not hash_contenuto:
+            return
+        conn = cursor.connection
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            # Il salvataggio del chiamante è già confermato: un blob non rimosso occupa solo spazio
+            logger.warning(f"Blob {hash_contenuto} non rilasciato: {e}")
+            return
+        try:
+            cursor.execute(
+                """SELECT 1 FROM contenuti_capitoli
+                   WHERE hash_contenuto = ? AND archivio = ? AND codec = ? LIMIT 1""",
+                (hash_contenuto, self.nome, codec or CODEC_NESSUNO)
+            )
+            if not cursor.fetchone():
+                try:
+                    self._percorso(hash_contenuto, codec).unlink()
+                except FileNotFoundError:
+                    pass
+        finally:
+            # Nessuna modifica da salvare: la transazione serve solo a tenere il lock
+            conn.rollback()
+
+ARCHIVI: Dict[str, ContentStore] = {
+    DatabaseContentStore.nome: DatabaseContentStore(),
+    BlobContentStore.nome: BlobContentStore(),
+}
+
+def get_content_store(nome: Optional[str]) -> ContentStore:
+    """Restituisce l'archivio con il nome indicato (predefinito: database)."""
+    return ARCHIVI.get(nome or DatabaseContentStore.nome, ARCHIVI[DatabaseContentStore.nome])
+
+class MirrorMarkdown:
+    """
+    Esporta in background i capitoli come file app/data/contenuti/{corso_id}/{capitolo_id}.md.
+
+    Le richieste vengono accodate e scritte a blocchi da un thread dedicato: più
+    salvataggi dello stesso capitolo tra due scritture producono un solo file.
+    """
+
+    def __init__(self, directory: Path = CONTENUTI_DIR, intervallo: float = 2.0, max_blocco: int = 50):
+        self.directory = Path(directory)
+        self.intervallo = intervallo
+        self.max_blocco = max_blocco
+        self._coda: "queue.Queue[Tuple[str, str, Optional[str], Optional[str]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def scrivi(self, corso_id: str, capitolo_id: str, contenuto: str):
+        """Accoda la scrittura del file Markdown di un capitolo."""
+        self._avvia()
+        self._coda.put(("scrivi", corso_id, capitolo_id, contenuto))
+
+    def elimina_corso(self, corso_id: str):
+        """Accoda la rimozione della directory dei file Markdown di un corso."""
+        self._avvia()
+        self._coda.put(("elimina", corso_id, None, None))
+
+    def svuota(self):
+        """Attende che tutte le operazioni accodate siano state scritte su disco."""
+        if self._thread is not None:
+            self._coda.put(("flush", "", None, None))
+            self._coda.join()
+
+    def _avvia(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._esegui, name="mirror-markdown", daemon=True)
+                self._thread.start()
+
+    def _esegui(self):
+        while True:
+            operazioni = [self._coda.get()]
+
+            # Raccoglie le altre operazioni arrivate nel frattempo, fino a max_blocco
+            try:
+                while len(operazioni) < self.max_blocco and operazioni[-1][0] != "flush":
+                    operazioni.append(self._coda.get(timeout=self.intervallo))
+            except queue.Empty:
+                pass
+
+            try:
+                self._applica(operazioni)
+            except Exception as e:
+                logger.error(f"Errore nella scrittura del mirror Markdown: {str(e)}")
+            finally:
+                for _ in operazioni:
+                    self._coda.task_done()
+
+    def _applica(self, operazioni):
+        # Mantiene solo l'ultima versione di ogni capitolo; un'eliminazione del corso
+        # annulla le scritture precedenti dello stesso corso
+        scritture: Dict[Tuple[str, str], str] = {}
+        for tipo, corso_id, capitolo_id, contenuto in operazioni:
+            if tipo == "scrivi":
+                scritture[(corso_id, capitolo_id)] = contenuto
+            elif tipo == "elimina":
+                for chiave in [k for k in scritture if k[0] == corso_id]:
+                    del scritture[chiave]
+                shutil.rmtree(self.directory / corso_id, ignore_errors=True)
+
+        for (corso_id, capitolo_id), contenuto in scritture.items():
+            _scrivi_file_atomico(self.directory / corso_id / f"{capitolo_id}.md", contenuto.encode("utf-8"))
+
+        if scritture:
+            logger.info(f"Mirror Markdown: scritti {len(scritture)} file")
+
+mirror_markdown = MirrorMarkdown()
+atexit.register(mirror_markdown.svuota)
@@ -1,13 +1,79 @@
 import sqlite3
 import json
 import uuid
+import re
+import hashlib
+import base64
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 import os
+import threading
+
+from app.config import get_config_value
+from app.models.cache import CacheLRU
+from app.models.content_store import get_content_store, mirror_markdown
+from app.models.cache_esportazioni import cache_esportazioni
+from app.models.revisioni import registra_revisione, ricostruisci_revisione, applica_conservazione
+from app.models import ricerca
 
 DB_PATH = Path("app/data/corsi.db")
 
+# Cache dei corsi già decodificati (parametri e scaletta assemblata), per processo.
+# Ogni voce è legata a corsi.versione: le scritture di altri worker incrementano la
+# versione nel database e rendono automaticamente obsoleta la copia in cache.
+_cache_corsi = CacheLRU("corsi", max_voci=256, max_bytes=16 * 1024 * 1024)
+
+# Connessione di sola lettura per thread usata per verificare la versione dei corsi in
+# cache: aprire una nuova connessione costa più della lettura stessa dalla cache
+_connessioni_versione = threading.local()
+
+def _connessione_versione() -> sqlite3.Connection:
+    conn = getattr(_connessioni_versione, "conn", None)
+    if conn is None or getattr(_connessioni_versione, "percorso", None) != DB_PATH:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _connessioni_versione.conn = conn
+        _connessioni_versione.percorso = DB_PATH
+    return conn
+
+def _versione_corso(corso_id: str) -> Optional[int]:
+    """Restituisce la versione corrente di un corso, o None se il corso non esiste."""
+    row = _connessione_versione().execute("SELECT versione FROM corsi WHERE id = ?", (corso_id,)).fetchone()
+    return row[0] if row else None
+
+def carica_versioni(corso_id: str, capitolo_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Restituisce versione e data dell'ultima modifica di un corso e, se indicato, di un suo
+    capitolo, con una sola lettura: senza decodificare il corso né caricare contenuti.
+    
+    Returns:
+        None se il corso non esiste; altrimenti versione e ultimo_aggiornamento del corso
+        (scaletta o qualsiasi capitolo) e in capitolo hash_contenuto, versione e
+        ultimo_aggiornamento del contenuto, o None se il capitolo non è stato generato
+    """
+    row = _connessione_versione().execute(
+        """SELECT c.versione,
+                  MAX(COALESCE(c.ultimo_aggiornamento, c.creato), COALESCE(c.ultima_attivita, c.creato)),
+                  cc.hash_contenuto, cc.versione, cc.ultimo_aggiornamento
+           FROM corsi c
+           LEFT JOIN contenuti_capitoli cc
+               ON cc.corso_id = c.id AND cc.capitolo_id = ? AND cc.generato = 1
+           WHERE c.id = ?""",
+        (capitolo_id, corso_id)
+    ).fetchone()
+    if not row:
+        return None
+    
+    versione, ultimo_aggiornamento, hash_contenuto, versione_capitolo, aggiornamento_capitolo = row
+    capitolo = None
+    if hash_contenuto is not None:
+        capitolo = {
+            "hash_contenuto": hash_contenuto,
+            "versione": versione_capitolo,
+            "ultimo_aggiornamento": aggiornamento_capitolo
+        }
+    return {"versione": versione, "ultimo_aggiornamento": ultimo_aggiornamento, "capitolo": capitolo}
+
 # Assicurati che la directory esista
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
@@ -42,8 +108,426 @@ def init_db():
     ''')
     
     conn.commit()
+    
+    # Applica le migrazioni dello schema non ancora eseguite
+    _applica_migrazioni(conn)
+    
     conn.close()
 
+def _applica_migrazioni(conn: sqlite3.Connection):
+    """
+    Applica in ordine le migrazioni dello schema non ancora eseguite.
+    
+    La versione dello schema è memorizzata in PRAGMA user_version: la migrazione
+    in posizione i porta il database alla versione i + 1.
+    """
+    versione = conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    for numero, migrazione in enumerate(_MIGRAZIONI[versione:], start=versione + 1):
+        try:
+            conn.execute("BEGIN")
+            migrazione(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+            print(f"Migrazione {numero} ({migrazione.__name__}) applicata")
+        except Exception as e:
+            conn.rollback()
+            print(f"Errore nella migrazione {numero} ({migrazione.__name__}): {e}")
+            raise
+
+def _migrazione_capitoli_normalizzati(cursor: sqlite3.Cursor):
+    """Sposta capitoli e sottocapitoli della scaletta in tabelle dedicate."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS capitoli (
+        corso_id TEXT NOT NULL,
+        capitolo_id TEXT NOT NULL,
+        ordine INTEGER NOT NULL,
+        titolo TEXT NOT NULL,
+        descrizione TEXT,
+        modello_utilizzato TEXT,
+        stato TEXT NOT NULL DEFAULT 'da_generare',
+        extra TEXT,
+        creato TEXT NOT NULL,
+        ultimo_aggiornamento TEXT,
+        PRIMARY KEY (corso_id, capitolo_id),
+        FOREIGN KEY (corso_id) REFERENCES corsi(id)
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sottocapitoli (
+        corso_id TEXT NOT NULL,
+        capitolo_id TEXT NOT NULL,
+        sottocapitolo_id TEXT NOT NULL,
+        ordine INTEGER NOT NULL,
+        titolo TEXT NOT NULL,
+        descrizione TEXT,
+        extra TEXT,
+        creato TEXT NOT NULL,
+        ultimo_aggiornamento TEXT,
+        PRIMARY KEY (corso_id, capitolo_id, sottocapitolo_id),
+        FOREIGN KEY (corso_id, capitolo_id) REFERENCES capitoli(corso_id, capitolo_id)
+    )
+    ''')
+    
+    # Esplode le scalette esistenti nelle nuove tabelle e lascia in corsi.scaletta
+    # solo l'intestazione (titolo, descrizione, durata stimata, ...)
+    cursor.execute("SELECT id, scaletta, ultimo_aggiornamento, creato FROM corsi WHERE scaletta IS NOT NULL")
+    for corso_id, scaletta_json, ultimo_aggiornamento, creato in cursor.fetchall():
+        try:
+            scaletta = json.loads(scaletta_json)
+        except (TypeError, ValueError) as e:
+            print(f"Scaletta non valida per il corso {corso_id}, migrazione saltata: {e}")
+            continue
+        
+        if not isinstance(scaletta, dict):
+            continue
+        
+        ora = ultimo_aggiornamento or creato
+        _scrivi_scaletta(cursor, corso_id, scaletta, ora)
+        
+        # Lo stato iniziale riflette i contenuti già presenti
+        cursor.execute(
+            """UPDATE capitoli SET stato = 'generato'
+               WHERE corso_id = ? AND capitolo_id IN (
+                   SELECT capitolo_id FROM contenuti_capitoli
+                   WHERE corso_id = ? AND generato = 1
+               )""",
+            (corso_id, corso_id)
+        )
+
+def _migrazione_indice_contenuti(cursor: sqlite3.Cursor):
+    """Aggiunge l'indice univoco (corso_id, capitolo_id) su contenuti_capitoli."""
+    # Rimuove eventuali duplicati mantenendo la riga aggiornata più di recente
+    cursor.execute('''
+    DELETE FROM contenuti_capitoli
+    WHERE rowid NOT IN (
+        SELECT rowid FROM (
+            SELECT rowid, ROW_NUMBER() OVER (
+                PARTITION BY corso_id, capitolo_id
+                ORDER BY ultimo_aggiornamento DESC, rowid DESC
+            ) AS posizione
+            FROM contenuti_capitoli
+        )
+        WHERE posizione = 1
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_contenuti_capitoli_corso_capitolo
+    ON contenuti_capitoli (corso_id, capitolo_id)
+    ''')
+
+# Ricalcola i contatori di avanzamento del corso a partire dalle righe dei capitoli.
+# Il conteggio usa la chiave primaria (corso_id, capitolo_id), quindi tocca solo
+# i capitoli del corso interessato.
+_SQL_AGGIORNA_CONTATORI = '''
+    UPDATE corsi SET
+        num_capitoli = (SELECT COUNT(*) FROM capitoli WHERE corso_id = {riga}.corso_id),
+        capitoli_generati = (
+            SELECT COUNT(*) FROM capitoli
+            WHERE corso_id = {riga}.corso_id AND stato IN ('generato', 'espanso')
+        ),
+        capitoli_espansi = (
+            SELECT COUNT(*) FROM capitoli
+            WHERE corso_id = {riga}.corso_id AND stato = 'espanso'
+        ),
+        ultima_attivita = MAX(COALESCE(ultima_attivita, creato), COALESCE({ultima_attivita}, creato))
+    WHERE id = {riga}.corso_id;
+'''
+
+def _migrazione_contatori_avanzamento(cursor: sqlite3.Cursor):
+    """Aggiunge a corsi i contatori di avanzamento mantenuti da trigger sui capitoli."""
+    cursor.execute("ALTER TABLE corsi ADD COLUMN num_capitoli INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE corsi ADD COLUMN capitoli_generati INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE corsi ADD COLUMN capitoli_espansi INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE corsi ADD COLUMN ultima_attivita TEXT")
+    
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_capitoli_inserimento AFTER INSERT ON capitoli
+    BEGIN
+        {_SQL_AGGIORNA_CONTATORI.format(riga="NEW", ultima_attivita="NEW.ultimo_aggiornamento")}
+    END
+    ''')
+    
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_capitoli_aggiornamento
+    AFTER UPDATE OF stato, ultimo_aggiornamento ON capitoli
+    BEGIN
+        {_SQL_AGGIORNA_CONTATORI.format(riga="NEW", ultima_attivita="NEW.ultimo_aggiornamento")}
+    END
+    ''')
+    
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_capitoli_eliminazione AFTER DELETE ON capitoli
+    BEGIN
+        {_SQL_AGGIORNA_CONTATORI.format(riga="OLD", ultima_attivita="NULL")}
+    END
+    ''')
+    
+    # Indice per l'elenco dei corsi ordinato per data di creazione
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corsi_creato ON corsi (creato, id)")
+    
+    # Inizializza i contatori dei corsi esistenti
+    cursor.execute('''
+    UPDATE corsi SET
+        num_capitoli = (SELECT COUNT(*) FROM capitoli WHERE corso_id = corsi.id),
+        capitoli_generati = (
+            SELECT COUNT(*) FROM capitoli
+            WHERE corso_id = corsi.id AND stato IN ('generato', 'espanso')
+        ),
+        capitoli_espansi = (
+            SELECT COUNT(*) FROM capitoli
+            WHERE corso_id = corsi.id AND stato = 'espanso'
+        ),
+        ultima_attivita = MAX(
+            COALESCE(ultimo_aggiornamento, creato),
+            COALESCE((SELECT MAX(ultimo_aggiornamento) FROM capitoli WHERE corso_id = corsi.id), creato)
+        )
+    ''')
+
+def _migrazione_metadati_contenuti(cursor: sqlite3.Cursor):
+    """Aggiunge a contenuti_capitoli i metadati calcolati al momento della scrittura."""
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN lunghezza_bytes INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN lunghezza_caratteri INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN num_parole INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN token_stimati INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN hash_contenuto TEXT")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN outline TEXT")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN versione INTEGER NOT NULL DEFAULT 1")
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN lunghezza_originale INTEGER")
+    
+    # Calcola i metadati dei contenuti esistenti, una riga alla volta
+    cursor.execute("SELECT rowid FROM contenuti_capitoli")
+    for (rowid,) in cursor.fetchall():
+        cursor.execute("SELECT contenuto FROM contenuti_capitoli WHERE rowid = ?", (rowid,))
+        metadati = calcola_metadati_contenuto(cursor.fetchone()[0] or "")
+        cursor.execute(
+            """UPDATE contenuti_capitoli SET
+                   lunghezza_bytes = ?, lunghezza_caratteri = ?, num_parole = ?,
+                   token_stimati = ?, hash_contenuto = ?, outline = ?
+               WHERE rowid = ?""",
+            (metadati["lunghezza_bytes"], metadati["lunghezza_caratteri"], metadati["num_parole"],
+             metadati["token_stimati"], metadati["hash_contenuto"], json.dumps(metadati["outline"], ensure_ascii=False),
+             rowid)
+        )
+
+def _migrazione_versione_corsi(cursor: sqlite3.Cursor):
+    """Aggiunge a corsi un numero di versione incrementato a ogni scrittura."""
+    cursor.execute("ALTER TABLE corsi ADD COLUMN versione INTEGER NOT NULL DEFAULT 1")
+
+def _migrazione_archivio_contenuti(cursor: sqlite3.Cursor):
+    """Registra per ogni contenuto l'archivio in cui è salvato il testo."""
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN archivio TEXT NOT NULL DEFAULT 'database'")
+
+def _migrazione_codec_contenuti(cursor: sqlite3.Cursor):
+    """Registra per ogni contenuto il codec di compressione ('' = testo in chiaro)."""
+    cursor.execute("ALTER TABLE contenuti_capitoli ADD COLUMN codec TEXT NOT NULL DEFAULT ''")
+
+def _migrazione_revisioni_capitoli(cursor: sqlite3.Cursor):
+    """Crea la cronologia delle revisioni dei capitoli (snapshot periodici e delta compressi)."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS revisioni_capitoli (
+        corso_id TEXT NOT NULL,
+        capitolo_id TEXT NOT NULL,
+        revisione INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        dati BLOB NOT NULL,
+        stato TEXT,
+        modello_utilizzato TEXT,
+        hash_contenuto TEXT,
+        lunghezza_caratteri INTEGER,
+        creato TEXT,
+        PRIMARY KEY (corso_id, capitolo_id, revisione)
+    )
+    ''')
+
+def _migrazione_indice_ricerca(cursor: sqlite3.Cursor):
+    """Crea l'indice full-text FTS5 e vi inserisce i corsi e i capitoli esistenti."""
+    if not ricerca.crea_indice(cursor):
+        return
+    
+    cursor.execute("SELECT id, parametri FROM corsi")
+    for corso_id, parametri in cursor.fetchall():
+        ricerca.indicizza_corso(cursor, corso_id, json.loads(parametri) if parametri else {})
+    
+    cursor.execute(
+        """SELECT corso_id, capitolo_id, contenuto, hash_contenuto, archivio, codec
+           FROM contenuti_capitoli WHERE generato = 1"""
+    )
+    for corso_id, capitolo_id, valore, hash_contenuto, archivio, codec in cursor.fetchall():
+        contenuto = get_content_store(archivio).carica(valore, hash_contenuto, codec)
+        if contenuto is not None:
+            ricerca.indicizza_capitolo(cursor, corso_id, capitolo_id, contenuto)
+
+# Elenco ordinato delle migrazioni: aggiungere sempre in coda
+_MIGRAZIONI = [
+    _migrazione_capitoli_normalizzati,
+    _migrazione_indice_contenuti,
+    _migrazione_contatori_avanzamento,
+    _migrazione_metadati_contenuti,
+    _migrazione_versione_corsi,
+    _migrazione_archivio_contenuti,
+    _migrazione_codec_contenuti,
+    _migrazione_revisioni_capitoli,
+    _migrazione_indice_ricerca,
+]
+
+# Stima approssimativa dei token: circa 4 caratteri per token
+CARATTERI_PER_TOKEN = 4
+
+_PATTERN_TITOLO = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+
+def calcola_metadati_contenuto(contenuto: str) -> Dict[str, Any]:
+    """
+    Calcola i metadati di un contenuto Markdown.
+    
+    Args:
+        contenuto: Il contenuto del capitolo in formato Markdown
+        
+    Returns:
+        Dizionario con lunghezza in bytes e caratteri, numero di parole, token stimati,
+        hash SHA-256 del contenuto e outline dei titoli (livello e testo)
+    """
+    codificato = contenuto.encode("utf-8")
+    
+    outline = []
+    in_blocco_codice = False
+    for linea in contenuto.split("\n"):
+        if linea.lstrip().startswith("```"):
+            in_blocco_codice = not in_blocco_codice
+            continue
+        if in_blocco_codice:
+            continue
+        corrispondenza = _PATTERN_TITOLO.match(linea)
+        if corrispondenza:
+            outline.append({
+                "livello": len(corrispondenza.group(1)),
+                "titolo": corrispondenza.group(2)
+            })
+    
+    return {
+        "lunghezza_bytes": len(codificato),
+        "lunghezza_caratteri": len(contenuto),
+        "num_parole": len(contenuto.split()),
+        "token_stimati": -(-len(contenuto) // CARATTERI_PER_TOKEN),
+        "hash_contenuto": hashlib.sha256(codificato).hexdigest(),
+        "outline": outline
+    }
+
+# Campi della scaletta salvati in colonne dedicate; gli altri finiscono in "extra"
+_CAMPI_CAPITOLO = {"id", "titolo", "descrizione", "ordine", "modello_utilizzato", "sottocapitoli", "sottoargomenti"}
+_CAMPI_SOTTOCAPITOLO = {"id", "titolo", "descrizione", "ordine"}
+
+def _extra_json(elemento: Dict[str, Any], campi_noti: set) -> Optional[str]:
+    """Serializza i campi non mappati su colonne dedicate."""
+    extra = {k: v for k, v in elemento.items() if k not in campi_noti}
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+def _scrivi_scaletta(cursor: sqlite3.Cursor, corso_id: str, scaletta: Dict[str, Any], ora: str):
+    """
+    Sincronizza le righe di capitoli e sottocapitoli con la scaletta fornita.
+    
+    I capitoli esistenti mantengono stato, modello utilizzato e data di creazione;
+    quelli non più presenti nella scaletta vengono rimossi.
+    """
+    intestazione = {k: v for k, v in scaletta.items() if k != "capitoli"}
+    cursor.execute(
+        "UPDATE corsi SET scaletta = ? WHERE id = ?",
+        (json.dumps(intestazione, ensure_ascii=False), corso_id)
+    )
+    
+    capitoli_ids = set()
+    sottocapitoli_ids = set()
+    
+    for i, capitolo in enumerate(scaletta.get("capitoli", [])):
+        capitolo_id = str(capitolo.get("id") or f"cap{i+1}")
+        capitoli_ids.add(capitolo_id)
+        
+        cursor.execute(
+            """INSERT INTO capitoli
+               (corso_id, capitolo_id, ordine, titolo, descrizione, modello_utilizzato, extra, creato, ultimo_aggiornamento)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (corso_id, capitolo_id) DO UPDATE SET
+                   ordine = excluded.ordine,
+                   titolo = excluded.titolo,
+                   descrizione = excluded.descrizione,
+                   modello_utilizzato = COALESCE(excluded.modello_utilizzato, capitoli.modello_utilizzato),
+                   extra = excluded.extra,
+                   ultimo_aggiornamento = excluded.ultimo_aggiornamento""",
+            (corso_id, capitolo_id, i + 1, capitolo.get("titolo", ""), capitolo.get("descrizione"),
+             capitolo.get("modello_utilizzato"), _extra_json(capitolo, _CAMPI_CAPITOLO), ora, ora)
+        )
+        
+        # Il vecchio formato usa "sottoargomenti" al posto di "sottocapitoli"
+        sottocapitoli = capitolo.get("sottocapitoli", capitolo.get("sottoargomenti", []))
+        for j, sottocapitolo in enumerate(sottocapitoli):
+            sottocapitolo_id = str(sottocapitolo.get("id") or f"{capitolo_id}-sub-{j+1}")
+            sottocapitoli_ids.add((capitolo_id, sottocapitolo_id))
+            
+            cursor.execute(
+                """INSERT INTO sottocapitoli
+                   (corso_id, capitolo_id, sottocapitolo_id, ordine, titolo, descrizione, extra, creato, ultimo_aggiornamento)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (corso_id, capitolo_id, sottocapitolo_id) DO UPDATE SET
+                       ordine = excluded.ordine,
+                       titolo = excluded.titolo,
+                       descrizione = excluded.descrizione,
+                       extra = excluded.extra,
+                       ultimo_aggiornamento = excluded.ultimo_aggiornamento""",
+                (corso_id, capitolo_id, sottocapitolo_id, j + 1, sottocapitolo.get("titolo", ""),
+                 sottocapitolo.get("descrizione"), _extra_json(sottocapitolo, _CAMPI_SOTTOCAPITOLO), ora, ora)
+            )
+    
+    # Rimuove capitoli e sottocapitoli eliminati dalla scaletta
+    cursor.execute("SELECT capitolo_id, sottocapitolo_id FROM sottocapitoli WHERE corso_id = ?", (corso_id,))
+    for capitolo_id, sottocapitolo_id in cursor.fetchall():
+        if (capitolo_id, sottocapitolo_id) not in sottocapitoli_ids:
+            cursor.execute(
+                "DELETE FROM sottocapitoli WHERE corso_id = ? AND capitolo_id = ? AND sottocapitolo_id = ?",
+                (corso_id, capitolo_id, sottocapitolo_id)
+            )
+    
+    cursor.execute("SELECT capitolo_id FROM capitoli WHERE corso_id = ?", (corso_id,))
+    for (capitolo_id,) in cursor.fetchall():
+        if capitolo_id not in capitoli_ids:
+            cursor.execute("DELETE FROM capitoli WHERE corso_id = ? AND capitolo_id = ?", (corso_id, capitolo_id))
+
+def _assembla_capitoli(cursor: sqlite3.Cursor, corso_id: str) -> List[Dict[str, Any]]:
+    """Ricostruisce la lista dei capitoli della scaletta a partire dalle righe normalizzate."""
+    cursor.execute(
+        """SELECT capitolo_id, sottocapitolo_id, ordine, titolo, descrizione, extra
+           FROM sottocapitoli WHERE corso_id = ? ORDER BY capitolo_id, ordine""",
+        (corso_id,)
+    )
+    sottocapitoli_per_capitolo = {}
+    for row in cursor.fetchall():
+        sottocapitolo = {"id": row[1], "titolo": row[3], "ordine": row[2]}
+        if row[4] is not None:
+            sottocapitolo["descrizione"] = row[4]
+        if row[5]:
+            sottocapitolo.update(json.loads(row[5]))
+        sottocapitoli_per_capitolo.setdefault(row[0], []).append(sottocapitolo)
+    
+    cursor.execute(
+        """SELECT capitolo_id, ordine, titolo, descrizione, modello_utilizzato, extra
+           FROM capitoli WHERE corso_id = ? ORDER BY ordine""",
+        (corso_id,)
+    )
+    capitoli = []
+    for row in cursor.fetchall():
+        capitolo = {"id": row[0], "titolo": row[2], "ordine": row[1]}
+        if row[3] is not None:
+            capitolo["descrizione"] = row[3]
+        if row[4]:
+            capitolo["modello_utilizzato"] = row[4]
+        if row[5]:
+            capitolo.update(json.loads(row[5]))
+        capitolo["sottocapitoli"] = sottocapitoli_per_capitolo.get(row[0], [])
+        capitoli.append(capitolo)
+    
+    return capitoli
+
 def salva_corso(parametri: Dict[str, Any]) -> str:
     """Salva un nuovo corso nel database e restituisce l'ID generato."""
     conn = sqlite3.connect(DB_PATH)
@@ -56,6 +540,7 @@ def salva_corso(parametri: Dict[str, Any]) -> str:
         "INSERT INTO corsi (id, parametri, creato) VALUES (?, ?, ?)",
         (corso_id, json.dumps(parametri), ora)
     )
+    ricerca.indicizza_corso(cursor, corso_id, parametri)
     
     conn.commit()
     conn.close()
@@ -70,20 +555,29 @@ def salva_scaletta(corso_id: str, scaletta: Dict[str, Any]) -> bool:
     ora = datetime.now().isoformat()
     
     try:
+        conn.execute("BEGIN")
         cursor.execute(
-            "UPDATE corsi SET scaletta = ?, ultimo_aggiornamento = ? WHERE id = ?",
-            (json.dumps(scaletta), ora, corso_id)
+            "UPDATE corsi SET ultimo_aggiornamento = ?, versione = versione + 1 WHERE id = ?",
+            (ora, corso_id)
         )
         
+        # Capitoli e sottocapitoli vengono salvati come righe dedicate
+        _scrivi_scaletta(cursor, corso_id, scaletta, ora)
+        ricerca.aggiorna_titoli_capitoli(cursor, corso_id)
+        
         conn.commit()
+        _cache_corsi.invalida(corso_id)
+        cache_esportazioni.invalida_corso(corso_id)
         return True
     except Exception as e:
+        conn.rollback()
         print(f"Errore nel salvataggio della scaletta: {e}")
         return False
     finally:
         conn.close()
 
-def salva_contenuto_capitolo(corso_id: str, capitolo_id: str, contenuto: str, modello_utilizzato: str = None):
+def salva_contenuto_capitolo(corso_id: str, capitolo_id: str, contenuto: str, modello_utilizzato: str = None,
+                             espanso: Optional[bool] = None):
     """
     Salva il contenuto di un capitolo nel database.
     
@@ -92,83 +586,152 @@ def salva_contenuto_capitolo(corso_id: str, capitolo_id: str, contenuto: str, mo
         capitolo_id: ID del capitolo
         contenuto: Contenuto del capitolo in formato Markdown
         modello_utilizzato: (Opzionale) Il modello AI utilizzato per generare il contenuto
+        espanso: (Opzionale) True se il contenuto è il risultato di un'espansione, False se è
+            una nuova generazione; None mantiene lo stato attuale (es. modifica manuale)
     """
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
     try:
-        # Carica il corso
-        corso = carica_corso(corso_id)
-        if not corso:
-            return None
+        # Lettura dello stato precedente e scrittura nella stessa transazione, che prende
+        # subito il lock di scrittura: due salvataggi concorrenti dello stesso capitolo
+        # vengono serializzati e non calcolano la stessa versione
+        conn.execute("BEGIN IMMEDIATE")
         
-        # Trova il capitolo nella scaletta
-        capitolo = None
-        for cap in corso['scaletta']['capitoli']:
-            if cap['id'] == capitolo_id:
-                capitolo = cap
-                break
-                
-        if not capitolo:
+        # Verifica che il capitolo esista nella scaletta e recupera lo stato attuale
+        c.execute(
+            """SELECT cap.stato, cap.modello_utilizzato, cc.lunghezza_caratteri, cc.lunghezza_originale,
+                      cc.hash_contenuto, cc.archivio, cc.codec, cc.contenuto, cc.versione
+               FROM capitoli cap
+               LEFT JOIN contenuti_capitoli cc
+                   ON cc.corso_id = cap.corso_id AND cc.capitolo_id = cap.capitolo_id
+               WHERE cap.corso_id = ? AND cap.capitolo_id = ?""",
+            (corso_id, capitolo_id)
+        )
+        stato_attuale = c.fetchone()
+        if not stato_attuale:
+            conn.rollback()
             return None
         
-        # Crea una connessione al database
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        # Alla prima espansione conserva la lunghezza del contenuto originale
+        (stato_precedente, modello_precedente, lunghezza_precedente, lunghezza_originale,
+         hash_precedente, archivio_precedente, codec_precedente, valore_precedente, versione_precedente) = stato_attuale
+        if espanso:
+            if stato_precedente != 'espanso':
+                lunghezza_originale = lunghezza_precedente
+        elif espanso is not None:
+            lunghezza_originale = None
+        
+        metadati = calcola_metadati_contenuto(contenuto)
+        
+        # Il testo viene salvato una sola volta, nell'archivio configurato e con la compressione scelta
+        archivio = get_content_store(get_config_value("archivio_contenuti", "database"))
+        valore_contenuto, codec = archivio.salva(
+            contenuto, metadati["hash_contenuto"], get_config_value("compressione_contenuti", "")
+        )
         
-        # Salva il modello utilizzato nel capitolo, se fornito
-        if modello_utilizzato:
-            capitolo['modello_utilizzato'] = modello_utilizzato
-            # Aggiorna la scaletta con questa nuova informazione
-            c.execute("UPDATE corsi SET scaletta = ? WHERE id = ?", 
-                    (json.dumps(corso['scaletta']), corso_id))
-            
-        # Aggiorna o inserisce record nella tabella contenuti_capitoli
         ora = datetime.now().isoformat()
-        id_contenuto = f"{corso_id}_{capitolo_id}"
         
-        # Controlla se esiste già un record per questo capitolo
+        # Aggiorna solo la riga del capitolo, salvando il modello utilizzato se fornito.
+        # I trigger sulla tabella capitoli aggiornano i contatori di avanzamento del corso.
+        if espanso is None:
+            stato = 'generato' if stato_precedente == 'da_generare' else stato_precedente
+        else:
+            stato = 'espanso' if espanso else 'generato'
         c.execute(
-            "SELECT id FROM contenuti_capitoli WHERE corso_id = ? AND capitolo_id = ?",
-            (corso_id, capitolo_id)
+            """UPDATE capitoli
+               SET stato = ?, modello_utilizzato = COALESCE(?, modello_utilizzato), ultimo_aggiornamento = ?
+               WHERE corso_id = ? AND capitolo_id = ?""",
+            (stato, modello_utilizzato, ora, corso_id, capitolo_id)
+        )
+        c.execute("UPDATE corsi SET versione = versione + 1 WHERE id = ?", (corso_id,))
+            
+        # Inserisce o aggiorna contenuto e metadati con un'unica istruzione (UPSERT)
+        c.execute(
+            """INSERT INTO contenuti_capitoli 
+               (id, corso_id, capitolo_id, contenuto, generato, ultimo_aggiornamento,
+                lunghezza_bytes, lunghezza_caratteri, num_parole, token_stimati,
+                hash_contenuto, outline, versione, lunghezza_originale, archivio, codec)
+               VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
+               ON CONFLICT (corso_id, capitolo_id) DO UPDATE SET
+                   contenuto = excluded.contenuto,
+                   archivio = excluded.archivio,
+                   codec = excluded.codec,
+                   generato = 1,
+                   ultimo_aggiornamento = excluded.ultimo_aggiornamento,
+                   lunghezza_bytes = excluded.lunghezza_bytes,
+                   lunghezza_caratteri = excluded.lunghezza_caratteri,
+                   num_parole = excluded.num_parole,
+                   token_stimati = excluded.token_stimati,
+                   hash_contenuto = excluded.hash_contenuto,
+                   outline = excluded.outline,
+                   versione = contenuti_capitoli.versione + 1,
+                   lunghezza_originale = excluded.lunghezza_originale""",
+            (f"{corso_id}_{capitolo_id}", corso_id, capitolo_id, valore_contenuto, ora,
+             metadati["lunghezza_bytes"], metadati["lunghezza_caratteri"], metadati["num_parole"],
+             metadati["token_stimati"], metadati["hash_contenuto"],
+             json.dumps(metadati["outline"], ensure_ascii=False), lunghezza_originale, archivio.nome, codec)
         )
         
-        if c.fetchone():
-            # Aggiorna il record esistente
-            c.execute(
-                """UPDATE contenuti_capitoli 
-                   SET contenuto = ?, generato = 1, ultimo_aggiornamento = ? 
-                   WHERE corso_id = ? AND capitolo_id = ?""",
-                (contenuto, ora, corso_id, capitolo_id)
-            )
-        else:
-            # Inserisce un nuovo record
-            c.execute(
-                """INSERT INTO contenuti_capitoli 
-                   (id, corso_id, capitolo_id, contenuto, generato, ultimo_aggiornamento)
-                   VALUES (?, ?, ?, ?, 1, ?)""",
-                (id_contenuto, corso_id, capitolo_id, contenuto, ora)
+        # Registra la nuova revisione nella cronologia del capitolo (delta rispetto alla precedente)
+        precedente = None
+        if hash_precedente:
+            precedente = get_content_store(archivio_precedente).carica(
+                valore_precedente, hash_precedente, codec_precedente
             )
+        registra_revisione(
+            c, corso_id, capitolo_id, (versione_precedente or 0) + 1, contenuto, precedente,
+            {"stato": stato, "modello_utilizzato": modello_utilizzato or modello_precedente,
+             "hash_contenuto": metadati["hash_contenuto"], "lunghezza_caratteri": metadati["lunghezza_caratteri"]},
+            ora, stato_precedente
+        )
+        applica_conservazione(c, corso_id, capitolo_id, int(get_config_value("revisioni_conservate", 50)))
+        ricerca.indicizza_capitolo(c, corso_id, capitolo_id, contenuto)
             
         # Commit delle modifiche
         conn.commit()
-        conn.close()
-            
-        # Crea la directory per i contenuti se non esiste
-        os.makedirs(f"app/data/contenuti/{corso_id}", exist_ok=True)
+        _cache_corsi.invalida(corso_id)
+        cache_esportazioni.invalida_corso(corso_id)
+        
+        # Libera il contenuto precedente se non è più referenziato
+        if hash_precedente and (hash_precedente, archivio_precedente, codec_precedente) != (
+                metadati["hash_contenuto"], archivio.nome, codec):
+            get_content_store(archivio_precedente).rilascia(c, hash_precedente, codec_precedente)
         
-        # Salva il contenuto in un file
-        with open(f"app/data/contenuti/{corso_id}/{capitolo_id}.md", "w", encoding="utf-8") as f:
-            f.write(contenuto)
+        # Copia Markdown opzionale, scritta in background a blocchi
+        if get_config_value("mirror_markdown", False):
+            mirror_markdown.scrivi(corso_id, capitolo_id, contenuto)
         
         return True
     except Exception as e:
+        if conn.in_transaction:
+            conn.rollback()
         print(f"Errore nel salvataggio del contenuto: {str(e)}")
         return None
+    finally:
+        conn.close()
 
 def carica_corso(corso_id: str) -> Optional[Dict[str, Any]]:
-    """Carica un corso dal database."""
+    """
+    Carica un corso dal database.
+    
+    Il corso decodificato viene letto dalla cache se la sua versione coincide con
+    quella presente nel database; il dizionario restituito è sempre una copia.
+    """
+    versione = _versione_corso(corso_id)
+    if versione is None:
+        _cache_corsi.invalida(corso_id)
+        return None
+    
+    corso = _cache_corsi.get(corso_id, versione)
+    if corso is not None:
+        return corso
+    
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
+    # Legge corso e capitoli nella stessa transazione, per una versione coerente
+    conn.execute("BEGIN")
     cursor.execute("SELECT * FROM corsi WHERE id = ?", (corso_id,))
     corso_row = cursor.fetchone()
     
@@ -180,11 +743,18 @@ def carica_corso(corso_id: str) -> Optional[Dict[str, Any]]:
     corso['parametri'] = json.loads(corso['parametri'])
     
     if corso.get('scaletta'):
+        # La scaletta viene assemblata dall'intestazione e dalle righe dei capitoli
         corso['scaletta'] = json.loads(corso['scaletta'])
+        corso['scaletta']['capitoli'] = _assembla_capitoli(cursor, corso_id)
     
     conn.close()
+    _cache_corsi.set(corso_id, corso, corso['versione'])
     return corso
 
+def statistiche_cache_corsi() -> Dict[str, Any]:
+    """Restituisce le metriche della cache dei corsi."""
+    return _cache_corsi.statistiche()
+
 def carica_contenuti_corso(corso_id: str) -> Dict[str, str]:
     """Carica tutti i contenuti generati per un corso."""
     conn = sqlite3.connect(DB_PATH)
@@ -192,33 +762,355 @@ def carica_contenuti_corso(corso_id: str) -> Dict[str, str]:
     cursor = conn.cursor()
     
     cursor.execute(
-        "SELECT capitolo_id, contenuto FROM contenuti_capitoli WHERE corso_id = ? AND generato = 1",
+        """SELECT capitolo_id, contenuto, hash_contenuto, archivio, codec
+           FROM contenuti_capitoli WHERE corso_id = ? AND generato = 1""",
         (corso_id,)
     )
     
     contenuti = {}
     for row in cursor.fetchall():
-        contenuti[row['capitolo_id']] = row['contenuto']
+        contenuto = get_content_store(row['archivio']).carica(row['contenuto'], row['hash_contenuto'], row['codec'])
+        if contenuto is not None:
+            contenuti[row['capitolo_id']] = contenuto
     
     conn.close()
     return contenuti
 
-def lista_corsi() -> List[Dict[str, Any]]:
-    """Restituisce una lista di tutti i corsi."""
+def carica_hash_contenuti(corso_id: str) -> Dict[str, str]:
+    """Restituisce capitolo_id -> hash del contenuto dei capitoli generati, senza leggerne il testo."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return dict(conn.execute(
+            "SELECT capitolo_id, hash_contenuto FROM contenuti_capitoli WHERE corso_id = ? AND generato = 1",
+            (corso_id,)
+        ).fetchall())
+    finally:
+        conn.close()
+
+def carica_contenuto(corso_id: str, capitolo_id: str) -> Optional[str]:
+    """Carica il testo di un singolo capitolo generato, o None se non è stato generato."""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
-    cursor.execute("SELECT id, parametri, creato, ultimo_aggiornamento, completato FROM corsi ORDER BY creato DESC")
+    cursor.execute(
+        """SELECT contenuto, hash_contenuto, archivio, codec FROM contenuti_capitoli
+           WHERE corso_id = ? AND capitolo_id = ? AND generato = 1""",
+        (corso_id, capitolo_id)
+    )
+    row = cursor.fetchone()
+    conn.close()
     
-    corsi = []
-    for row in cursor.fetchall():
-        corso = dict(row)
-        corso['parametri'] = json.loads(corso['parametri'])
-        corsi.append(corso)
+    if not row:
+        return None
+    return get_content_store(row['archivio']).carica(row['contenuto'], row['hash_contenuto'], row['codec'])
+
+def _dimensione_valore(valore) -> int:
+    """Byte occupati da un valore della colonna contenuto (testo o compresso)."""
+    if valore is None:
+        return 0
+    return len(valore.encode("utf-8")) if isinstance(valore, str) else len(valore)
+
+def ricomprimi_contenuti(codec: str, dimensione_blocco: int = 200) -> Dict[str, int]:
+    """
+    Riscrive i contenuti esistenti con il codec di compressione indicato.
+    
+    Le righe vengono elaborate a blocchi, ognuno in una propria transazione; il testo
+    e i metadati non cambiano, quindi versioni e contatori non vengono toccati.
+    
+    Args:
+        codec: Codec di destinazione ("" per decomprimere, "zlib" o "zstd")
+        dimensione_blocco: Numero di righe per transazione
+        
+    Returns:
+        Numero di righe esaminate e convertite, byte occupati prima e dopo
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    risultato = {"righe": 0, "convertite": 0, "bytes_prima": 0, "bytes_dopo": 0}
+    ultimo_rowid = 0
+    try:
+        while True:
+            # Lettura e scrittura del blocco con il lock di scrittura: i blob salvati non
+            # possono essere rimossi da un rilascio concorrente prima dell'UPDATE
+            conn.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                """SELECT rowid, contenuto, hash_contenuto, archivio, codec FROM contenuti_capitoli
+                   WHERE rowid > ? AND generato = 1 ORDER BY rowid LIMIT ?""",
+                (ultimo_rowid, dimensione_blocco)
+            )
+            righe = cursor.fetchall()
+            if not righe:
+                conn.rollback()
+                break
+            
+            da_rilasciare = []
+            for row in righe:
+                ultimo_rowid = row['rowid']
+                risultato["righe"] += 1
+                archivio = get_content_store(row['archivio'])
+                contenuto = archivio.carica(row['contenuto'], row['hash_contenuto'], row['codec'])
+                if contenuto is None:
+                    continue
+                
+                valore, nuovo_codec = archivio.salva(contenuto, row['hash_contenuto'], codec)
+                risultato["bytes_prima"] += _dimensione_valore(row['contenuto'])
+                risultato["bytes_dopo"] += _dimensione_valore(valore)
+                if nuovo_codec == row['codec']:
+                    continue
+                
+                cursor.execute(
+                    "UPDATE contenuti_capitoli SET contenuto = ?, codec = ? WHERE rowid = ?",
+                    (valore, nuovo_codec, row['rowid'])
+                )
+                da_rilasciare.append((archivio, row['hash_contenuto'], row['codec']))
+                risultato["convertite"] += 1
+            conn.commit()
+            
+            for archivio, hash_contenuto, codec_precedente in da_rilasciare:
+                archivio.rilascia(cursor, hash_contenuto, codec_precedente)
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.close()
+    
+    return risultato
+
+def lista_revisioni(corso_id: str, capitolo_id: str) -> List[Dict[str, Any]]:
+    """Restituisce i metadati delle revisioni di un capitolo, dalla più recente."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        """SELECT revisione, tipo, stato, modello_utilizzato, hash_contenuto, lunghezza_caratteri,
+                  length(dati) AS bytes_archiviati, creato
+           FROM revisioni_capitoli WHERE corso_id = ? AND capitolo_id = ?
+           ORDER BY revisione DESC""",
+        (corso_id, capitolo_id)
+    )
+    revisioni = [dict(row) for row in cursor.fetchall()]
+    
+    conn.close()
+    return revisioni
+
+def carica_revisione(corso_id: str, capitolo_id: str, revisione: int) -> Optional[str]:
+    """
+    Restituisce il testo di una revisione di un capitolo.
+    
+    La revisione corrente viene letta direttamente da contenuti_capitoli; le precedenti
+    sono ricostruite dallo snapshot più vicino applicando al più pochi delta.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            """SELECT contenuto, hash_contenuto, archivio, codec, versione FROM contenuti_capitoli
+               WHERE corso_id = ? AND capitolo_id = ? AND generato = 1""",
+            (corso_id, capitolo_id)
+        )
+        row = cursor.fetchone()
+        if row and row['versione'] == revisione:
+            return get_content_store(row['archivio']).carica(row['contenuto'], row['hash_contenuto'], row['codec'])
+        
+        return ricostruisci_revisione(cursor, corso_id, capitolo_id, revisione)
+    finally:
+        conn.close()
+
+def ripristina_revisione(corso_id: str, capitolo_id: str, revisione: int) -> Optional[bool]:
+    """
+    Ripristina una revisione precedente di un capitolo.
+    
+    Il ripristino non cancella la cronologia: il testo della revisione viene salvato
+    come nuova revisione, con lo stato (generato o espanso) che aveva allora.
+    
+    Returns:
+        True se il ripristino è riuscito, False se la revisione non esiste, None in caso di errore
+    """
+    testo = carica_revisione(corso_id, capitolo_id, revisione)
+    if testo is None:
+        return False
+    
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT stato FROM revisioni_capitoli WHERE corso_id = ? AND capitolo_id = ? AND revisione = ?",
+        (corso_id, capitolo_id, revisione)
+    )
+    row = cursor.fetchone()
+    conn.close()
     
+    stato = row[0] if row else None
+    espanso = (stato == 'espanso') if stato else None
+    return salva_contenuto_capitolo(corso_id, capitolo_id, testo, espanso=espanso)
+
+def cerca_contenuti(testo: str, limite: int = 20, corso_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Ricerca full-text su parametri dei corsi e testo dei capitoli.
+    
+    Args:
+        testo: Parole da cercare (tutte devono comparire, anche come prefisso)
+        limite: Numero massimo di risultati
+        corso_id: (Opzionale) Limita la ricerca ai capitoli di un corso
+        
+    Returns:
+        Risultati ordinati per rilevanza, con snippet HTML dei passaggi trovati
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return ricerca.cerca(conn.cursor(), testo, limite, corso_id)
+    finally:
+        conn.close()
+
+def carica_avanzamento_corso(corso_id: str) -> Optional[Dict[str, Any]]:
+    """Restituisce i contatori di avanzamento di un corso senza caricarne scaletta o contenuti."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        """SELECT num_capitoli, capitoli_generati, capitoli_espansi, ultima_attivita
+           FROM corsi WHERE id = ?""",
+        (corso_id,)
+    )
+    row = cursor.fetchone()
     conn.close()
-    return corsi
+    
+    return dict(row) if row else None
+
+_COLONNE_METADATI = """cc.capitolo_id, cap.stato, cc.lunghezza_bytes, cc.lunghezza_caratteri, cc.num_parole,
+    cc.token_stimati, cc.hash_contenuto, cc.outline, cc.versione, cc.lunghezza_originale, cc.ultimo_aggiornamento"""
+
+def _riga_metadati(row: sqlite3.Row) -> Dict[str, Any]:
+    """Converte una riga di metadati in dizionario, decodificando l'outline."""
+    metadati = dict(row)
+    metadati['outline'] = json.loads(metadati['outline']) if metadati.get('outline') else []
+    return metadati
+
+def carica_metadati_capitoli(corso_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Carica i metadati di tutti i capitoli generati di un corso, senza leggerne il contenuto.
+    
+    Returns:
+        Dizionario capitolo_id -> metadati (stato, lunghezze, parole, token stimati,
+        hash, outline, versione)
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        f"""SELECT {_COLONNE_METADATI}
+            FROM contenuti_capitoli cc
+            LEFT JOIN capitoli cap ON cap.corso_id = cc.corso_id AND cap.capitolo_id = cc.capitolo_id
+            WHERE cc.corso_id = ? AND cc.generato = 1""",
+        (corso_id,)
+    )
+    
+    metadati = {row['capitolo_id']: _riga_metadati(row) for row in cursor.fetchall()}
+    
+    conn.close()
+    return metadati
+
+def carica_metadati_capitolo(corso_id: str, capitolo_id: str) -> Optional[Dict[str, Any]]:
+    """Carica i metadati di un singolo capitolo generato, o None se non è stato generato."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        f"""SELECT {_COLONNE_METADATI}
+            FROM contenuti_capitoli cc
+            LEFT JOIN capitoli cap ON cap.corso_id = cc.corso_id AND cap.capitolo_id = cc.capitolo_id
+            WHERE cc.corso_id = ? AND cc.capitolo_id = ? AND cc.generato = 1""",
+        (corso_id, capitolo_id)
+    )
+    row = cursor.fetchone()
+    
+    conn.close()
+    return _riga_metadati(row) if row else None
+
+# Condizioni SQL dei filtri per stato di completamento, coerenti con calcola_percentuale
+FILTRI_STATO_CORSI = {
+    "completo": "num_capitoli > 0 AND capitoli_generati >= num_capitoli",
+    "in-progress": "capitoli_generati > 0 AND capitoli_generati < num_capitoli",
+    "non-iniziato": "(capitoli_generati = 0 OR num_capitoli = 0)",
+}
+
+def _codifica_cursore(creato: str, corso_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([creato, corso_id]).encode("utf-8")).decode("ascii")
+
+def _decodifica_cursore(cursore: str) -> List[str]:
+    try:
+        creato, corso_id = json.loads(base64.urlsafe_b64decode(cursore.encode("ascii")))
+        return [creato, corso_id]
+    except Exception:
+        raise ValueError("Cursore di paginazione non valido")
+
+def lista_corsi_pagina(limite: int = 20, cursore: Optional[str] = None, ordine: str = "recenti",
+                       stato: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Restituisce una pagina della lista dei corsi, con le sole colonne delle card.
+    
+    La paginazione è per chiave (creato, id) sull'indice idx_corsi_creato: il costo di
+    una pagina non dipende da quante pagine la precedono né dal numero totale di corsi.
+    
+    Args:
+        limite: Numero di corsi per pagina
+        cursore: Cursore restituito dalla pagina precedente (None per la prima pagina)
+        ordine: "recenti" (dal più recente) o "meno_recenti"
+        stato: (Opzionale) "completo", "in-progress" o "non-iniziato"
+        
+    Returns:
+        Dizionario con i corsi della pagina e il cursore della pagina successiva (o None)
+        
+    Raises:
+        ValueError: Se cursore, ordine o stato non sono validi
+    """
+    if ordine not in ("recenti", "meno_recenti"):
+        raise ValueError(f"Ordinamento non valido: {ordine}")
+    if stato and stato not in FILTRI_STATO_CORSI:
+        raise ValueError(f"Stato non valido: {stato}")
+    
+    direzione, confronto = ("DESC", "<") if ordine == "recenti" else ("ASC", ">")
+    condizioni = []
+    parametri: List[Any] = []
+    if cursore:
+        condizioni.append(f"(creato, id) {confronto} (?, ?)")
+        parametri.extend(_decodifica_cursore(cursore))
+    if stato:
+        condizioni.append(FILTRI_STATO_CORSI[stato])
+    where = f"WHERE {' AND '.join(condizioni)}" if condizioni else ""
+    parametri.append(limite + 1)
+    
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        f"""SELECT id, json_extract(parametri, '$.titolo') AS titolo,
+                   substr(json_extract(parametri, '$.descrizione'), 1, 200) AS descrizione,
+                   creato, ultimo_aggiornamento, num_capitoli, capitoli_generati,
+                   capitoli_espansi, ultima_attivita
+            FROM corsi {where}
+            ORDER BY creato {direzione}, id {direzione}
+            LIMIT ?""",
+        parametri
+    )
+    corsi = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    # Una riga in più del limite indica che esiste una pagina successiva
+    cursore_successivo = None
+    if len(corsi) > limite:
+        corsi = corsi[:limite]
+        cursore_successivo = _codifica_cursore(corsi[-1]["creato"], corsi[-1]["id"])
+    
+    return {"corsi": corsi, "cursore_successivo": cursore_successivo}
 
 def elimina_corso(corso_id: str) -> bool:
     """Elimina un corso e tutti i suoi contenuti associati dal database.
@@ -237,13 +1129,32 @@ def elimina_corso(corso_id: str) -> bool:
         conn.execute("BEGIN TRANSACTION")
         
         # Elimina prima i contenuti dei capitoli associati
+        cursor.execute(
+            "SELECT hash_contenuto, archivio, codec FROM contenuti_capitoli WHERE corso_id = ?",
+            (corso_id,)
+        )
+        contenuti_archiviati = cursor.fetchall()
         cursor.execute("DELETE FROM contenuti_capitoli WHERE corso_id = ?", (corso_id,))
         
+        cursor.execute("DELETE FROM revisioni_capitoli WHERE corso_id = ?", (corso_id,))
+        ricerca.rimuovi_corso(cursor, corso_id)
+        
+        # Elimina i capitoli e i sottocapitoli della scaletta
+        cursor.execute("DELETE FROM sottocapitoli WHERE corso_id = ?", (corso_id,))
+        cursor.execute("DELETE FROM capitoli WHERE corso_id = ?", (corso_id,))
+        
         # Elimina il corso
         cursor.execute("DELETE FROM corsi WHERE id = ?", (corso_id,))
         
         # Commit della transazione
         conn.commit()
+        _cache_corsi.invalida(corso_id)
+        
+        # Libera i contenuti archiviati e rimuove gli eventuali file Markdown del corso
+        for hash_contenuto, archivio, codec in contenuti_archiviati:
+            get_content_store(archivio).rilascia(cursor, hash_contenuto, codec)
+        mirror_markdown.elimina_corso(corso_id)
+        cache_esportazioni.invalida_corso(corso_id)
         return True
     except Exception as e:
         # Rollback in caso di errore
@@ -0,0 +1,166 @@
+import difflib
+import json
+import sqlite3
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Ogni INTERVALLO_SNAPSHOT revisioni viene salvata una copia completa del testo: la
+# ricostruzione di una revisione applica al più INTERVALLO_SNAPSHOT - 1 delta
+INTERVALLO_SNAPSHOT = 10
+
+TIPO_SNAPSHOT = "snapshot"
+TIPO_DELTA = "delta"
+
+def calcola_delta(precedente: str, nuovo: str) -> List[Any]:
+    """
+    Calcola il delta per righe che trasforma il testo precedente nel nuovo.
+
+    Il delta è una lista di operazioni: [inizio, fine] copia le righe del testo
+    precedente in quell'intervallo, una stringa inserisce nuovo testo.
+    """
+    righe_precedenti = precedente.splitlines(keepends=True)
+    righe_nuove = nuovo.splitlines(keepends=True)
+
+    operazioni: List[Any] = []
+    matcher = difflib.SequenceMatcher(None, righe_precedenti, righe_nuove, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            operazioni.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            operazioni.append("".join(righe_nuove[j1:j2]))
+    return operazioni
+
+def applica_delta(precedente: str, delta: List[Any]) -> str:
+    """Ricostruisce il nuovo testo applicando un delta calcolato con calcola_delta."""
+    righe_precedenti = precedente.splitlines(keepends=True)
+    parti = []
+    for operazione in delta:
+        if isinstance(operazione, str):
+            parti.append(operazione)
+        else:
+            parti.append("".join(righe_precedenti[operazione[0]:operazione[1]]))
+    return "".join(parti)
+
+def _comprimi(valore: Any) -> bytes:
+    return zlib.compress(json.dumps(valore, ensure_ascii=False).encode("utf-8"), 9)
+
+def _decomprimi(dati: bytes) -> Any:
+    return json.loads(zlib.decompress(dati).decode("utf-8"))
+
+def registra_revisione(cursor: sqlite3.Cursor, corso_id: str, capitolo_id: str, revisione: int,
+                       contenuto: str, precedente: Optional[str], metadati: Dict[str, Any], ora: str,
+                       stato_precedente: Optional[str] = None):
+    """
+    Aggiunge una revisione alla cronologia di un capitolo, nella transazione del chiamante.
+    La transazione deve aver letto la versione precedente con il lock di scrittura
+    (BEGIN IMMEDIATE); se la revisione esiste già viene sollevato sqlite3.IntegrityError.
+
+    La revisione è salvata come delta rispetto alla precedente se questa è presente in
+    cronologia e l'ultimo snapshot non è troppo lontano, altrimenti come snapshot.
+
+    Args:
+        revisione: Numero di revisione (coincide con contenuti_capitoli.versione)
+        precedente: Testo della revisione precedente, se esiste
+        metadati: stato, modello_utilizzato, hash_contenuto e lunghezza_caratteri della revisione
+        stato_precedente: Stato del capitolo prima del salvataggio, registrato se il testo
+            precedente entra in cronologia per la prima volta
+    """
+    cursor.execute(
+        """SELECT MAX(revisione), MAX(CASE WHEN tipo = ? THEN revisione END)
+           FROM revisioni_capitoli WHERE corso_id = ? AND capitolo_id = ?""",
+        (TIPO_SNAPSHOT, corso_id, capitolo_id)
+    )
+    ultima, ultimo_snapshot = cursor.fetchone()
+
+    # Il contenuto salvato prima dell'introduzione della cronologia diventa la prima revisione
+    if ultima is None and precedente is not None and revisione > 1:
+        cursor.execute(
+            """INSERT OR IGNORE INTO revisioni_capitoli
+               (corso_id, capitolo_id, revisione, tipo, dati, stato, modello_utilizzato,
+                hash_contenuto, lunghezza_caratteri, creato)
+               VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, ?, ?)""",
+            (corso_id, capitolo_id, revisione - 1, TIPO_SNAPSHOT, _comprimi(precedente), stato_precedente,
+             len(precedente), ora)
+        )
+        ultima = ultimo_snapshot = revisione - 1
+
+    usa_delta = (
+        precedente is not None
+        and ultima == revisione - 1
+        and ultimo_snapshot is not None
+        and revisione - ultimo_snapshot < INTERVALLO_SNAPSHOT
+    )
+    if usa_delta:
+        tipo, dati = TIPO_DELTA, _comprimi(calcola_delta(precedente, contenuto))
+    else:
+        tipo, dati = TIPO_SNAPSHOT, _comprimi(contenuto)
+
+    # INSERT semplice: una revisione già presente indica due salvataggi sulla stessa
+    # versione, e sovrascriverla spezzerebbe la catena dei delta successivi
+    cursor.execute(
+        """INSERT INTO revisioni_capitoli
+           (corso_id, capitolo_id, revisione, tipo, dati, stato, modello_utilizzato,
+            hash_contenuto, lunghezza_caratteri, creato)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (corso_id, capitolo_id, revisione, tipo, dati, metadati.get("stato"), metadati.get("modello_utilizzato"),
+         metadati.get("hash_contenuto"), metadati.get("lunghezza_caratteri"), ora)
+    )
+
+def ricostruisci_revisione(cursor: sqlite3.Cursor, corso_id: str, capitolo_id: str, revisione: int) -> Optional[str]:
+    """
+    Ricostruisce il testo di una revisione partendo dallo snapshot più vicino.
+
+    Returns:
+        Il testo della revisione, o None se la revisione non è in cronologia
+    """
+    cursor.execute(
+        """SELECT revisione, tipo, dati FROM revisioni_capitoli
+           WHERE corso_id = ? AND capitolo_id = ? AND revisione <= ?
+             AND revisione >= (SELECT MAX(revisione) FROM revisioni_capitoli
+                               WHERE corso_id = ? AND capitolo_id = ? AND revisione <= ? AND tipo = ?)
+           ORDER BY revisione""",
+        (corso_id, capitolo_id, revisione, corso_id, capitolo_id, revisione, TIPO_SNAPSHOT)
+    )
+    righe = cursor.fetchall()
+    if not righe or righe[-1][0] != revisione:
+        return None
+
+    testo = None
+    for _, tipo, dati in righe:
+        valore = _decomprimi(dati)
+        testo = valore if tipo == TIPO_SNAPSHOT else applica_delta(testo, valore)
+    return testo
+
+def applica_conservazione(cursor: sqlite3.Cursor, corso_id: str, capitolo_id: str, revisioni_conservate: int):
+    """
+    Mantiene solo le ultime revisioni_conservate revisioni di un capitolo (0 = tutte).
+
+    Se la revisione più vecchia da conservare è un delta, viene prima convertita in
+    snapshot, così le revisioni rimaste restano ricostruibili.
+    """
+    if revisioni_conservate <= 0:
+        return
+
+    cursor.execute(
+        """SELECT revisione, tipo FROM revisioni_capitoli
+           WHERE corso_id = ? AND capitolo_id = ?
+           ORDER BY revisione DESC LIMIT 1 OFFSET ?""",
+        (corso_id, capitolo_id, revisioni_conservate - 1)
+    )
+    prima_conservata = cursor.fetchone()
+    if not prima_conservata:
+        return
+
+    revisione, tipo = prima_conservata
+    if tipo == TIPO_DELTA:
+        testo = ricostruisci_revisione(cursor, corso_id, capitolo_id, revisione)
+        cursor.execute(
+            """UPDATE revisioni_capitoli SET tipo = ?, dati = ?
+               WHERE corso_id = ? AND capitolo_id = ? AND revisione = ?""",
+            (TIPO_SNAPSHOT, _comprimi(testo), corso_id, capitolo_id, revisione)
+        )
+
+    cursor.execute(
+        "DELETE FROM revisioni_capitoli WHERE corso_id = ? AND capitolo_id = ? AND revisione < ?",
+        (corso_id, capitolo_id, revisione)
+    )
@@ -0,0 +1,200 @@
+import html
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+# Indice full-text FTS5: un documento per corso (capitolo_id = '') con titolo, descrizione
+# e pubblico, più un documento per ogni capitolo generato con titolo e testo.
+# ricerca_documenti assegna a ogni documento un rowid stabile, così aggiornamenti ed
+# eliminazioni toccano solo le righe interessate invece di scandire l'indice.
+TABELLA_RICERCA = "ricerca_corsi"
+
+# Pesi bm25 delle colonne indicizzate: titolo, descrizione, pubblico, testo
+PESI_BM25 = (10.0, 5.0, 2.0, 1.0)
+
+# Delimitatori temporanei degli snippet, sostituiti da <mark> dopo l'escape HTML
+_INIZIO_EVIDENZA = "\x02"
+_FINE_EVIDENZA = "\x03"
+
+_PATTERN_TERMINE = re.compile(r"\w+", re.UNICODE)
+
+# Parole troppo frequenti per essere utili al ranking: vengono ignorate se la query
+# contiene anche altri termini (altrimenti costringono a valutare quasi ogni documento)
+PAROLE_VUOTE = frozenset("""
+a ad al allo ai agli all alla alle anche che chi ci come con contro cui da dal dallo dai dagli
+dall dalla dalle degli dei del dell della delle dello di e ed gli i il in io l la le lo ma ne nei
+nel nello nell nella nelle negli non o per perché più se si sono su sul sulla sui tra fra un
+una uno è
+the of and to in is for on with
+""".split())
+
+def crea_indice(cursor: sqlite3.Cursor) -> bool:
+    """
+    Crea la tabella FTS5 dell'indice di ricerca e la tabella dei documenti.
+
+    Returns:
+        False se la libreria SQLite in uso non include FTS5
+    """
+    try:
+        cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {TABELLA_RICERCA} USING fts5(
+            titolo,
+            descrizione,
+            pubblico,
+            testo,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Ricerca full-text non disponibile (FTS5 mancante): {e}")
+        return False
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ricerca_documenti (
+        id INTEGER PRIMARY KEY,
+        corso_id TEXT NOT NULL,
+        capitolo_id TEXT NOT NULL,
+        UNIQUE (corso_id, capitolo_id)
+    )
+    ''')
+
+    # Il ranking predefinito con i pesi delle colonne permette ORDER BY rank
+    pesi = ", ".join(str(p) for p in PESI_BM25)
+    cursor.execute(
+        f"INSERT INTO {TABELLA_RICERCA} ({TABELLA_RICERCA}, rank) VALUES ('rank', ?)",
+        (f"bm25({pesi})",)
+    )
+    return True
+
+def indice_disponibile(cursor: sqlite3.Cursor) -> bool:
+    """Verifica che l'indice di ricerca esista nel database."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (TABELLA_RICERCA,))
+    return cursor.fetchone() is not None
+
+def _scrivi_documento(cursor: sqlite3.Cursor, corso_id: str, capitolo_id: str,
+                      titolo: str, descrizione: str, pubblico: str, testo: str):
+    """Sostituisce il documento (corso_id, capitolo_id) nell'indice."""
+    cursor.execute(
+        "INSERT OR IGNORE INTO ricerca_documenti (corso_id, capitolo_id) VALUES (?, ?)",
+        (corso_id, capitolo_id)
+    )
+    cursor.execute(
+        "SELECT id FROM ricerca_documenti WHERE corso_id = ? AND capitolo_id = ?",
+        (corso_id, capitolo_id)
+    )
+    documento_id = cursor.fetchone()[0]
+    cursor.execute(f"DELETE FROM {TABELLA_RICERCA} WHERE rowid = ?", (documento_id,))
+    cursor.execute(
+        f"INSERT INTO {TABELLA_RICERCA} (rowid, titolo, descrizione, pubblico, testo) VALUES (?, ?, ?, ?, ?)",
+        (documento_id, titolo or "", descrizione or "", pubblico or "", testo or "")
+    )
+
+def indicizza_corso(cursor: sqlite3.Cursor, corso_id: str, parametri: Dict[str, Any]):
+    """Inserisce o sostituisce il documento dell'indice con i parametri del corso."""
+    if not indice_disponibile(cursor):
+        return
+    _scrivi_documento(cursor, corso_id, "", parametri.get("titolo"), parametri.get("descrizione"),
+                      parametri.get("pubblico_target"), "")
+
+def indicizza_capitolo(cursor: sqlite3.Cursor, corso_id: str, capitolo_id: str, contenuto: str):
+    """Inserisce o sostituisce il documento dell'indice con il testo di un capitolo."""
+    if not indice_disponibile(cursor):
+        return
+    cursor.execute(
+        "SELECT titolo FROM capitoli WHERE corso_id = ? AND capitolo_id = ?",
+        (corso_id, capitolo_id)
+    )
+    row = cursor.fetchone()
+    _scrivi_documento(cursor, corso_id, capitolo_id, row[0] if row else "", "", "", contenuto)
+
+def aggiorna_titoli_capitoli(cursor: sqlite3.Cursor, corso_id: str):
+    """Riallinea i titoli dei capitoli indicizzati dopo una modifica della scaletta."""
+    if not indice_disponibile(cursor):
+        return
+    cursor.execute(
+        f"""UPDATE {TABELLA_RICERCA}
+            SET titolo = (SELECT cap.titolo FROM ricerca_documenti d
+                          JOIN capitoli cap ON cap.corso_id = d.corso_id AND cap.capitolo_id = d.capitolo_id
+                          WHERE d.id = {TABELLA_RICERCA}.rowid)
+            WHERE rowid IN (SELECT d.id FROM ricerca_documenti d
+                            JOIN capitoli cap ON cap.corso_id = d.corso_id AND cap.capitolo_id = d.capitolo_id
+                            WHERE d.corso_id = ? AND d.capitolo_id != '' AND cap.titolo IS NOT NULL)""",
+        (corso_id,)
+    )
+
+def rimuovi_corso(cursor: sqlite3.Cursor, corso_id: str):
+    """Rimuove dall'indice il corso e tutti i suoi capitoli."""
+    if not indice_disponibile(cursor):
+        return
+    cursor.execute(
+        f"DELETE FROM {TABELLA_RICERCA} WHERE rowid IN (SELECT id FROM ricerca_documenti WHERE corso_id = ?)",
+        (corso_id,)
+    )
+    cursor.execute("DELETE FROM ricerca_documenti WHERE corso_id = ?", (corso_id,))
+
+def componi_query(testo: str) -> Optional[str]:
+    """
+    Converte il testo digitato dall'utente in una query FTS5 sicura.
+
+    Ogni parola diventa un termine tra virgolette (niente errori di sintassi FTS5 su
+    apici, trattini o parole chiave come OR/NOT) e tutti i termini devono essere
+    presenti. L'ultima parola è cercata anche come prefisso, per i risultati mentre
+    si scrive.
+    """
+    termini = _PATTERN_TERMINE.findall((testo or "").lower())
+    termini = [t for t in termini if t not in PAROLE_VUOTE] or termini
+    if not termini:
+        return None
+    return " ".join([f'"{t}"' for t in termini[:-1]] + [f'"{termini[-1]}"*'])
+
+def _evidenzia(snippet: Optional[str]) -> str:
+    """Esegue l'escape HTML dello snippet e marca i termini trovati con <mark>."""
+    testo = html.escape(snippet or "")
+    return testo.replace(_INIZIO_EVIDENZA, "<mark>").replace(_FINE_EVIDENZA, "</mark>")
+
+def cerca(cursor: sqlite3.Cursor, testo: str, limite: int = 20, corso_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Cerca nei corsi e nei capitoli, ordinando i risultati per rilevanza (bm25).
+
+    Returns:
+        Lista di risultati con corso, capitolo (None per i risultati sul corso),
+        titoli, punteggio e snippet HTML con i termini evidenziati
+    """
+    query = componi_query(testo)
+    if not query or not indice_disponibile(cursor):
+        return []
+
+    # Ranking e snippet sono calcolati sull'indice; le join riguardano solo i risultati
+    filtro_corso = "AND rowid IN (SELECT id FROM ricerca_documenti WHERE corso_id = ?)" if corso_id else ""
+    parametri: List[Any] = [_INIZIO_EVIDENZA, _FINE_EVIDENZA, query]
+    if corso_id:
+        parametri.append(corso_id)
+    parametri.append(limite)
+
+    cursor.execute(
+        f"""SELECT d.corso_id, d.capitolo_id, r.titolo, r.rank, r.snippet,
+                   json_extract(c.parametri, '$.titolo') AS titolo_corso
+            FROM (SELECT rowid, titolo, rank,
+                         snippet({TABELLA_RICERCA}, -1, ?, ?, '…', 16) AS snippet
+                  FROM {TABELLA_RICERCA}
+                  WHERE {TABELLA_RICERCA} MATCH ? {filtro_corso}
+                  ORDER BY rank
+                  LIMIT ?) r
+            JOIN ricerca_documenti d ON d.id = r.rowid
+            JOIN corsi c ON c.id = d.corso_id
+            ORDER BY r.rank""",
+        parametri
+    )
+
+    return [
+        {
+            "corso_id": corso,
+            "capitolo_id": capitolo or None,
+            "titolo_corso": titolo_corso,
+            "titolo_capitolo": titolo if capitolo else None,
+            "punteggio": round(-rank, 4),
+            "snippet": _evidenzia(snippet),
+        }
+        for corso, capitolo, titolo, rank, snippet, titolo_corso in cursor.fetchall()
+    ]
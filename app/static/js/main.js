@@ -54,4 +54,66 @@ document.addEventListener('DOMContentLoaded', function() {
             }, 300);
         }, 5000);
     };
-}); 
\ No newline at end of file
+}); 
+/**
+ * Lista dei corsi paginata: carica le pagine successive quando la fine della lista
+ * diventa visibile e ricarica dal server la prima pagina quando cambia il filtro.
+ * Restituisce un oggetto con il metodo filtra(stato).
+ */
+window.inizializzaListaCorsi = function() {
+    const listaCorsi = document.getElementById('listaCorsi');
+    const altriCorsi = document.getElementById('altriCorsi');
+    const btnAltriCorsi = document.getElementById('btnAltriCorsi');
+    if (!listaCorsi || !altriCorsi) return null;
+    
+    const vista = altriCorsi.getAttribute('data-vista');
+    let cursore = altriCorsi.getAttribute('data-cursore') || '';
+    let stato = '';
+    let inCaricamento = false;
+    
+    async function caricaPagina(reset) {
+        if (inCaricamento || (!reset && !cursore)) return;
+        inCaricamento = true;
+        
+        const parametri = new URLSearchParams({ vista: vista });
+        if (!reset && cursore) parametri.set('cursore', cursore);
+        if (stato) parametri.set('stato', stato);
+        
+        try {
+            const response = await fetch(`/corsi/pagina?${parametri.toString()}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const html = await response.text();
+            cursore = response.headers.get('X-Cursore-Successivo') || '';
+            
+            if (reset) {
+                listaCorsi.innerHTML = html.trim()
+                    ? html
+                    : '<div class="col-12 text-center text-muted py-5">Nessun corso in questa categoria</div>';
+            } else {
+                listaCorsi.insertAdjacentHTML('beforeend', html);
+            }
+            btnAltriCorsi.classList.toggle('d-none', !cursore);
+        } catch (error) {
+            console.error('Errore nel caricamento dei corsi:', error);
+        } finally {
+            inCaricamento = false;
+        }
+    }
+    
+    btnAltriCorsi.addEventListener('click', () => caricaPagina(false));
+    
+    // Carica la pagina successiva quando il fondo della lista entra nella viewport
+    if ('IntersectionObserver' in window) {
+        const osservatore = new IntersectionObserver(voci => {
+            if (voci.some(voce => voce.isIntersecting)) caricaPagina(false);
+        }, { rootMargin: '400px' });
+        osservatore.observe(altriCorsi);
+    }
+    
+    return {
+        filtra: function(nuovoStato) {
+            stato = nuovoStato === 'all' ? '' : nuovoStato;
+            caricaPagina(true);
+        }
+    };
+};
@@ -0,0 +1,112 @@
+"""
+Benchmark dell'avvio dell'applicazione: tempo di importazione e tempo fino alla prima risposta.
+
+Ogni misura avviene in un interprete nuovo, come a ogni riavvio di uvicorn con
+reload=True, in una directory di lavoro temporanea con database vuoto e provider
+OpenAI configurato con una chiave di prova verso un indirizzo locale non in ascolto:
+un client che interroga l'API all'avvio viene quindi rilevato senza uscire in rete.
+Per ciascuna esecuzione riporta:
+- il tempo di importazione di app.main;
+- il tempo fino alla prima risposta di GET / (avvio dell'app compreso);
+- le connessioni di rete tentate durante l'avvio (devono essere zero);
+- i moduli pesanti già caricati (yaml, markdown, reportlab, pypandoc), che devono
+  essere importati solo quando servono.
+
+Termina con codice 1 se il tempo fino alla prima risposta supera il budget o se
+durante l'avvio vengono aperte connessioni di rete.
+
+Uso:
+    python benchmarks/bench_avvio.py [--esecuzioni 5] [--budget-ms 2000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+RADICE = Path(__file__).resolve().parent.parent
+
+MODULI_PESANTI = ("yaml", "markdown", "reportlab", "pypandoc")
+
+# Eseguito in un processo separato nella directory di lavoro temporanea
+_SCRIPT_MISURA = """
+import json, socket, sys, time
+
+connessioni = []
+_connect_originale = socket.socket.connect
+def _connect_registrato(self, indirizzo):
+    connessioni.append(str(indirizzo))
+    return _connect_originale(self, indirizzo)
+socket.socket.connect = _connect_registrato
+
+inizio = time.perf_counter()
+import app.main
+importazione = time.perf_counter() - inizio
+
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    stato = client.get("/").status_code
+pronto = time.perf_counter() - inizio
+
+print(json.dumps({
+    "importazione": importazione,
+    "pronto": pronto,
+    "stato": stato,
+    "connessioni": connessioni,
+    "moduli_pesanti": [m for m in MODULI if m in sys.modules],
+}))
+"""
+
+def prepara_directory(directory: Path):
+    """Prepara una directory di lavoro con template, file statici e configurazione di prova."""
+    (directory / "app" / "config").mkdir(parents=True)
+    (directory / "app" / "data").mkdir(parents=True)
+    for nome in ("templates", "static"):
+        (directory / "app" / nome).symlink_to(RADICE / "app" / nome)
+    (directory / "app" / "config" / "settings.json").write_text(json.dumps({
+        "ai_provider": "openai",
+        "openai_api_key": "sk-prova-avvio",
+        "openai_base_url": "http://127.0.0.1:9",
+    }), encoding="utf-8")
+
+def misura_avvio() -> dict:
+    """Avvia un interprete nuovo e restituisce le misure dell'avvio."""
+    script = f"MODULI = {MODULI_PESANTI!r}\n" + _SCRIPT_MISURA
+    ambiente = dict(os.environ)
+    ambiente["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RADICE), ambiente.get("PYTHONPATH")]))
+    ambiente.pop("OPENAI_API_KEY", None)
+    ambiente.pop("OPENAI_BASE_URL", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        prepara_directory(Path(tmp))
+        risultato = subprocess.run(
+            [sys.executable, "-c", script], cwd=tmp, env=ambiente, capture_output=True, text=True
+        )
+    if risultato.returncode != 0:
+        raise RuntimeError(f"Avvio non riuscito:\n{risultato.stderr}")
+    return json.loads(risultato.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--esecuzioni", type=int, default=5, help="Avvii da misurare")
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="Tempo massimo fino alla prima risposta")
+    args = parser.parse_args()
+
+    misure = [misura_avvio() for _ in range(args.esecuzioni)]
+    importazione = statistics.median(m["importazione"] for m in misure) * 1000
+    pronto = statistics.median(m["pronto"] for m in misure) * 1000
+    connessioni = sorted({c for m in misure for c in m["connessioni"]})
+    moduli = sorted({n for m in misure for n in m["moduli_pesanti"]})
+
+    print(f"Importazione di app.main (mediana): {importazione:8.1f} ms")
+    print(f"Prima risposta di GET / (mediana):  {pronto:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"Connessioni di rete all'avvio:      {len(connessioni)} {connessioni if connessioni else ''}")
+    print(f"Moduli pesanti caricati all'avvio:  {', '.join(moduli) if moduli else 'nessuno'}")
+
+    if pronto > args.budget_ms or connessioni:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Test di carico delle modalità di avvio di run.py con il provider AI di mock.
+
+Prepara una directory di lavoro temporanea (template e file statici del progetto,
+provider "mock", database popolato con --corsi corsi generati dal client di mock),
+poi per ogni modalità avvia `run.py --produzione` su una porta libera e invia
+richieste per --durata secondi da --connessioni client concorrenti. Le richieste
+ruotano tra pagine e API di sola lettura: home, elenco dei corsi, pagina di un
+corso, contenuto di un capitolo, ricerca e stato.
+
+Per ogni modalità riporta richieste al secondo, latenza mediana e 99° percentile,
+ed errori. Le modalità che richiedono uvloop o httptools vengono saltate se le
+librerie non sono installate.
+
+Uso:
+    python benchmarks/bench_carico.py [--durata 15] [--connessioni 32] [--workers 4] [--corsi 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from pathlib import Path
+
+import httpx
+
+RADICE = Path(__file__).resolve().parent.parent
+
+# Popola il database della directory di lavoro usando i controller con il client di mock
+_SCRIPT_DATI = """
+import asyncio, json, sys
+from app.api.controllers import crea_corso, genera_scaletta_corso, genera_contenuto_capitolo
+from app.models.database import carica_corso, init_db
+
+async def popola(numero):
+    elenco = []
+    for i in range(numero):
+        corso_id = (await crea_corso({
+            "titolo": f"Corso di prova {i}",
+            "descrizione": "Corso generato per il test di carico",
+            "pubblico_target": "Studenti",
+            "livello_complessita": "intermedio",
+            "tono": "formale",
+        }))["corso_id"]
+        await genera_scaletta_corso(corso_id)
+        capitolo_id = carica_corso(corso_id)["scaletta"]["capitoli"][0]["id"]
+        await genera_contenuto_capitolo(corso_id, capitolo_id)
+        elenco.append([corso_id, capitolo_id])
+    print(json.dumps(elenco))
+
+init_db()
+asyncio.run(popola(int(sys.argv[1])))
+"""
+
+def modalita_disponibili(workers: int):
+    """Restituisce le modalità da misurare: (nome, opzioni di run.py, librerie mancanti)."""
+    veloci_mancanti = [m for m in ("uvloop", "httptools") if find_spec(m) is None]
+    return [
+        ("asyncio + h11, 1 worker", ["--workers", "1", "--loop", "asyncio", "--http", "h11"], []),
+        (f"asyncio + h11, {workers} worker", ["--workers", str(workers), "--loop", "asyncio", "--http", "h11"], []),
+        ("uvloop + httptools, 1 worker", ["--workers", "1", "--loop", "uvloop", "--http", "httptools"], veloci_mancanti),
+        (f"uvloop + httptools, {workers} worker", ["--workers", str(workers), "--loop", "uvloop", "--http", "httptools"],
+         veloci_mancanti),
+    ]
+
+def prepara_directory(directory: Path, ambiente: dict, corsi: int):
+    """Crea la directory di lavoro e restituisce le coppie (corso, capitolo) generate."""
+    (directory / "app" / "config").mkdir(parents=True)
+    (directory / "app" / "data").mkdir(parents=True)
+    for nome in ("templates", "static"):
+        (directory / "app" / nome).symlink_to(RADICE / "app" / nome)
+    (directory / "app" / "config" / "settings.json").write_text(
+        json.dumps({"ai_provider": "mock"}), encoding="utf-8"
+    )
+    risultato = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_DATI, str(corsi)], cwd=directory, env=ambiente,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(risultato.stdout.strip().splitlines()[-1])
+
+def porta_libera() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def attendi_avvio(url: str, timeout: float = 30.0):
+    """Attende che il server risponda, fino a timeout secondi."""
+    limite = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < limite:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Il server non risponde su {url}")
+
+async def genera_carico(base_url: str, percorsi, durata: float, connessioni: int):
+    """Invia richieste da connessioni client concorrenti e raccoglie latenze ed errori."""
+    latenze = []
+    errori = 0
+    fine = time.monotonic() + durata
+    limiti = httpx.Limits(max_connections=connessioni, max_keepalive_connections=connessioni)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limiti, timeout=30.0) as client:
+        async def utente(indice: int):
+            nonlocal errori
+            i = indice
+            while time.monotonic() < fine:
+                percorso = percorsi[i % len(percorsi)]
+                i += 1
+                inizio = time.perf_counter()
+                try:
+                    risposta = await client.get(percorso)
+                    if risposta.status_code >= 400:
+                        errori += 1
+                except httpx.HTTPError:
+                    errori += 1
+                latenze.append(time.perf_counter() - inizio)
+
+        inizio = time.monotonic()
+        await asyncio.gather(*(utente(i) for i in range(connessioni)))
+        trascorso = time.monotonic() - inizio
+
+    return latenze, errori, trascorso
+
+def misura_modalita(directory: Path, ambiente: dict, opzioni, percorsi, args):
+    """Avvia run.py con le opzioni indicate, genera il carico e arresta il server."""
+    porta = porta_libera()
+    server = subprocess.Popen(
+        [sys.executable, str(RADICE / "run.py"), "--produzione", "--host", "127.0.0.1", "--port", str(porta), *opzioni],
+        cwd=directory, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{porta}"
+    try:
+        asyncio.run(attendi_avvio(base_url + "/"))
+        latenze, errori, trascorso = asyncio.run(genera_carico(base_url, percorsi, args.durata, args.connessioni))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latenze.sort()
+    return {
+        "richieste": len(latenze),
+        "rps": len(latenze) / trascorso,
+        "p50": statistics.median(latenze) * 1000,
+        "p99": latenze[int(len(latenze) * 0.99) - 1] * 1000,
+        "errori": errori,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durata", type=float, default=15.0, help="Secondi di carico per modalità")
+    parser.add_argument("--connessioni", type=int, default=32, help="Client concorrenti")
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1), help="Worker delle modalità multi-processo")
+    parser.add_argument("--corsi", type=int, default=50, help="Corsi generati con il client di mock")
+    args = parser.parse_args()
+
+    ambiente = dict(os.environ)
+    ambiente["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RADICE), ambiente.get("PYTHONPATH")]))
+    for variabile in ("MODALITA", "WORKERS", "EVENT_LOOP", "PARSER_HTTP", "DEFAULT_AI_PROVIDER"):
+        ambiente.pop(variabile, None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        elenco = prepara_directory(directory, ambiente, args.corsi)
+        percorsi = ["/", "/miei-corsi", "/api/corsi?limite=24", "/api/cerca?q=corso", "/api/status"]
+        for corso_id, capitolo_id in elenco:
+            percorsi.append(f"/corso/{corso_id}")
+            percorsi.append(f"/api/corso/{corso_id}/capitolo/{capitolo_id}/contenuto")
+
+        print(f"CPU: {os.cpu_count()}  connessioni: {args.connessioni}  durata: {args.durata:.0f} s  corsi: {len(elenco)}")
+        print(f"{'Modalità':<32} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errori':>7}")
+        for nome, opzioni, mancanti in modalita_disponibili(args.workers):
+            if mancanti:
+                print(f"{nome:<32} saltata: {', '.join(mancanti)} non installati")
+                continue
+            r = misura_modalita(directory, ambiente, opzioni, percorsi, args)
+            print(f"{nome:<32} {r['rps']:8.1f} {r['p50']:8.1f} {r['p99']:8.1f} {r['errori']:7d}")
+
+if __name__ == "__main__":
+    main()
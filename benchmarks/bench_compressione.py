@@ -0,0 +1,93 @@
+"""
+Benchmark della compressione dei contenuti dei capitoli: spazio occupato e latenza di lettura.
+
+Usa i dati reali: i contenuti di app/data/corsi.db e i file Markdown in
+app/data/contenuti. Per ogni codec disponibile (nessuno, zlib, zstd se installato)
+misura i byte archiviati, il tempo di compressione e il tempo medio di una lettura
+completa dal database (SELECT + decompressione) su una copia temporanea.
+
+Uso:
+    python benchmarks/bench_compressione.py [--db app/data/corsi.db] [--letture 200]
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.content_store import (  # noqa: E402
+    CODEC_NESSUNO, CODEC_ZLIB, CODEC_ZSTD, codifica_contenuto, decodifica_contenuto, zstandard
+)
+
+def carica_testi(percorso_db: Path, directory_md: Path):
+    """Raccoglie i testi reali dal database e dai file Markdown."""
+    testi = []
+    if percorso_db.exists():
+        conn = sqlite3.connect(f"file:{percorso_db}?mode=ro", uri=True)
+        colonne = {r[1] for r in conn.execute("PRAGMA table_info(contenuti_capitoli)")}
+        codec_sql = "codec" if "codec" in colonne else "''"
+        for contenuto, codec in conn.execute(
+                f"SELECT contenuto, {codec_sql} FROM contenuti_capitoli WHERE contenuto IS NOT NULL"):
+            testi.append(decodifica_contenuto(contenuto, codec))
+        conn.close()
+    if directory_md.exists():
+        testi.extend(p.read_text(encoding="utf-8") for p in sorted(directory_md.rglob("*.md")))
+    return testi
+
+def misura(testi, codec: str, letture: int):
+    """Scrive i testi in un database temporaneo con il codec indicato e misura le letture."""
+    inizio = time.perf_counter()
+    valori = [codifica_contenuto(t, codec) for t in testi]
+    tempo_compressione = time.perf_counter() - inizio
+    
+    byte_archiviati = sum(len(v.encode("utf-8")) if isinstance(v, str) else len(v) for v, _ in valori)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "bench.db")
+        conn.execute("CREATE TABLE contenuti (id INTEGER PRIMARY KEY, contenuto, codec TEXT)")
+        conn.executemany("INSERT INTO contenuti (contenuto, codec) VALUES (?, ?)", valori)
+        conn.commit()
+        conn.execute("VACUUM")
+        dimensione_file = (Path(tmp) / "bench.db").stat().st_size
+        
+        inizio = time.perf_counter()
+        for i in range(letture):
+            riga = conn.execute(
+                "SELECT contenuto, codec FROM contenuti WHERE id = ?", (i % len(testi) + 1,)
+            ).fetchone()
+            decodifica_contenuto(riga[0], riga[1])
+        tempo_lettura = (time.perf_counter() - inizio) / letture
+        conn.close()
+    
+    return byte_archiviati, dimensione_file, tempo_compressione, tempo_lettura
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della compressione dei contenuti")
+    parser.add_argument("--db", type=Path, default=Path("app/data/corsi.db"))
+    parser.add_argument("--md", type=Path, default=Path("app/data/contenuti"))
+    parser.add_argument("--letture", type=int, default=2000)
+    args = parser.parse_args()
+    
+    testi = carica_testi(args.db, args.md)
+    if not testi:
+        print("Nessun contenuto trovato")
+        return
+    
+    originale = sum(len(t.encode("utf-8")) for t in testi)
+    print(f"Contenuti: {len(testi)}, testo originale: {originale} byte\n")
+    print(f"{'codec':<8} {'archiviati':>12} {'rapporto':>9} {'file db':>10} {'compr. tot':>11} {'lettura':>10}")
+    
+    codec_disponibili = [CODEC_NESSUNO, CODEC_ZLIB] + ([CODEC_ZSTD] if zstandard is not None else [])
+    for codec in codec_disponibili:
+        archiviati, file_db, t_compr, t_lettura = misura(testi, codec, args.letture)
+        print(f"{codec or 'nessuno':<8} {archiviati:>12} {archiviati / originale:>9.2f} {file_db:>10} "
+              f"{t_compr * 1000:>9.1f}ms {t_lettura * 1e6:>8.1f}µs")
+    
+    if zstandard is None:
+        print("\nzstd non misurato: pacchetto 'zstandard' non installato")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark della lettura della configurazione: cache in memoria contro lettura del file.
+
+Lavora in una directory temporanea con un settings.json di prova. Misura il tempo
+medio di get_config_value con la cache e quello della lettura e del parsing del file
+a ogni chiamata (il comportamento precedente), poi verifica quante scritture su disco
+producono salvataggi ripetuti dello stesso valore, come avviene durante la generazione.
+
+Uso:
+    python benchmarks/bench_config.py [--letture 20000] [--salvataggi 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RADICE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RADICE))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--letture", type=int, default=20000, help="Letture di un valore da misurare")
+    parser.add_argument("--salvataggi", type=int, default=1000, help="Salvataggi dello stesso valore")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # CONFIG_FILE è relativo alla directory di lavoro: il file reale non viene toccato
+        os.chdir(tmp)
+        from app import config  # noqa: E402
+
+        config.CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        config.save_config(config.DEFAULT_CONFIG)
+
+        inizio = time.perf_counter()
+        for _ in range(args.letture):
+            with open(config.CONFIG_FILE, "r", encoding="utf-8") as f:
+                json.load(f).get("openai_model")
+        senza_cache = (time.perf_counter() - inizio) / args.letture
+
+        inizio = time.perf_counter()
+        for _ in range(args.letture):
+            config.get_config_value("openai_model")
+        con_cache = (time.perf_counter() - inizio) / args.letture
+
+        print(f"get_config_value senza cache: {senza_cache * 1e6:8.2f} µs")
+        print(f"get_config_value con cache:   {con_cache * 1e6:8.2f} µs")
+
+        firma_iniziale = config.CONFIG_FILE.stat().st_mtime_ns
+        scritture = 0
+        for _ in range(args.salvataggi):
+            config.set_config_value("openai_model", "o1-preview")
+            firma = config.CONFIG_FILE.stat().st_mtime_ns
+            if firma != firma_iniziale:
+                scritture += 1
+                firma_iniziale = firma
+        print(f"Scritture su disco per {args.salvataggi} salvataggi dello stesso valore: {scritture}")
+
+        # Una modifica esterna del file viene vista alla lettura successiva
+        dati = json.loads(config.CONFIG_FILE.read_text(encoding="utf-8"))
+        dati["deepseek_model"] = "deepseek-reasoner"
+        config.CONFIG_FILE.write_text(json.dumps(dati), encoding="utf-8")
+        print(f"Valore dopo modifica esterna del file: {config.get_config_value('deepseek_model')}")
+
+        os.chdir(RADICE)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark del percorso di salvataggio e lettura di contenuti_capitoli.
+
+Confronta lo schema originale (nessun indice, SELECT seguita da UPDATE o INSERT)
+con lo schema migrato (indice univoco su corso_id, capitolo_id e UPSERT singolo)
+su un database temporaneo con 100.000 righe.
+
+Uso:
+    python benchmarks/bench_contenuti_capitoli.py [--righe 100000] [--operazioni 500]
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+CAPITOLI_PER_CORSO = 10
+CONTENUTO = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+
+def crea_database(percorso: Path, righe: int, con_indice: bool) -> sqlite3.Connection:
+    """Crea e popola un database di prova."""
+    conn = sqlite3.connect(percorso)
+    conn.execute('''
+    CREATE TABLE contenuti_capitoli (
+        id TEXT PRIMARY KEY,
+        corso_id TEXT NOT NULL,
+        capitolo_id TEXT NOT NULL,
+        contenuto TEXT,
+        generato INTEGER DEFAULT 0,
+        ultimo_aggiornamento TEXT
+    )
+    ''')
+    
+    dati = []
+    for i in range(righe):
+        corso_id = f"corso-{i // CAPITOLI_PER_CORSO}"
+        capitolo_id = f"cap{i % CAPITOLI_PER_CORSO + 1}"
+        dati.append((f"{corso_id}_{capitolo_id}", corso_id, capitolo_id, CONTENUTO, "2025-01-01T00:00:00"))
+    conn.executemany(
+        "INSERT INTO contenuti_capitoli (id, corso_id, capitolo_id, contenuto, generato, ultimo_aggiornamento) VALUES (?, ?, ?, ?, 1, ?)",
+        dati
+    )
+    
+    if con_indice:
+        conn.execute("CREATE UNIQUE INDEX idx_contenuti_capitoli_corso_capitolo ON contenuti_capitoli (corso_id, capitolo_id)")
+    
+    conn.commit()
+    return conn
+
+def salva_legacy(conn: sqlite3.Connection, corso_id: str, capitolo_id: str):
+    """Percorso di salvataggio originale: SELECT e poi UPDATE o INSERT."""
+    c = conn.cursor()
+    c.execute("SELECT id FROM contenuti_capitoli WHERE corso_id = ? AND capitolo_id = ?", (corso_id, capitolo_id))
+    if c.fetchone():
+        c.execute(
+            "UPDATE contenuti_capitoli SET contenuto = ?, generato = 1, ultimo_aggiornamento = ? WHERE corso_id = ? AND capitolo_id = ?",
+            (CONTENUTO, "2025-01-02T00:00:00", corso_id, capitolo_id)
+        )
+    else:
+        c.execute(
+            "INSERT INTO contenuti_capitoli (id, corso_id, capitolo_id, contenuto, generato, ultimo_aggiornamento) VALUES (?, ?, ?, ?, 1, ?)",
+            (f"{corso_id}_{capitolo_id}", corso_id, capitolo_id, CONTENUTO, "2025-01-02T00:00:00")
+        )
+    conn.commit()
+
+def salva_upsert(conn: sqlite3.Connection, corso_id: str, capitolo_id: str):
+    """Percorso di salvataggio migrato: un'unica istruzione UPSERT."""
+    conn.execute(
+        """INSERT INTO contenuti_capitoli (id, corso_id, capitolo_id, contenuto, generato, ultimo_aggiornamento)
+           VALUES (?, ?, ?, ?, 1, ?)
+           ON CONFLICT (corso_id, capitolo_id) DO UPDATE SET
+               contenuto = excluded.contenuto, generato = 1, ultimo_aggiornamento = excluded.ultimo_aggiornamento""",
+        (f"{corso_id}_{capitolo_id}", corso_id, capitolo_id, CONTENUTO, "2025-01-02T00:00:00")
+    )
+    conn.commit()
+
+def carica_corso(conn: sqlite3.Connection, corso_id: str, capitolo_id: str):
+    conn.execute(
+        "SELECT capitolo_id, contenuto FROM contenuti_capitoli WHERE corso_id = ? AND generato = 1",
+        (corso_id,)
+    ).fetchall()
+
+def carica_capitolo(conn: sqlite3.Connection, corso_id: str, capitolo_id: str):
+    conn.execute(
+        "SELECT contenuto FROM contenuti_capitoli WHERE corso_id = ? AND capitolo_id = ? AND generato = 1",
+        (corso_id, capitolo_id)
+    ).fetchone()
+
+def misura(funzione, conn: sqlite3.Connection, chiavi) -> float:
+    """Restituisce il tempo medio per operazione in millisecondi."""
+    inizio = time.perf_counter()
+    for corso_id, capitolo_id in chiavi:
+        funzione(conn, corso_id, capitolo_id)
+    return (time.perf_counter() - inizio) * 1000 / len(chiavi)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--righe", type=int, default=100_000)
+    parser.add_argument("--operazioni", type=int, default=500)
+    args = parser.parse_args()
+    
+    num_corsi = args.righe // CAPITOLI_PER_CORSO
+    random.seed(42)
+    chiavi = [(f"corso-{random.randrange(num_corsi)}", f"cap{random.randint(1, CAPITOLI_PER_CORSO)}")
+              for _ in range(args.operazioni)]
+    
+    with tempfile.TemporaryDirectory() as cartella:
+        risultati = {}
+        for nome, con_indice, salva in (("originale", False, salva_legacy), ("indice + upsert", True, salva_upsert)):
+            conn = crea_database(Path(cartella) / f"{con_indice}.db", args.righe, con_indice)
+            risultati[nome] = {
+                "salvataggio": misura(salva, conn, chiavi),
+                "carica_contenuti_corso": misura(carica_corso, conn, chiavi),
+                "carica_contenuto_capitolo": misura(carica_capitolo, conn, chiavi),
+            }
+            
+            # Eliminazione dei contenuti di un corso (come in elimina_corso)
+            corsi_da_eliminare = [chiave[0] for chiave in chiavi[:50]]
+            inizio = time.perf_counter()
+            for corso_id in corsi_da_eliminare:
+                conn.execute("DELETE FROM contenuti_capitoli WHERE corso_id = ?", (corso_id,))
+                conn.commit()
+            risultati[nome]["elimina_corso"] = (time.perf_counter() - inizio) * 1000 / len(corsi_da_eliminare)
+            conn.close()
+    
+    print(f"Righe: {args.righe}, operazioni per misura: {args.operazioni}")
+    print(f"{'operazione':<28}{'originale (ms)':>16}{'indice + upsert (ms)':>24}{'speedup':>10}")
+    for operazione in risultati["originale"]:
+        prima = risultati["originale"][operazione]
+        dopo = risultati["indice + upsert"][operazione]
+        print(f"{operazione:<28}{prima:>16.3f}{dopo:>24.3f}{prima / dopo:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark della cache delle esportazioni: prima esportazione, ripetizione e dopo una modifica.
+
+Crea su un database temporaneo un corso con --capitoli capitoli di circa --kb KB
+ciascuno e misura file_esportazione() per ogni formato disponibile: la prima volta
+(miss: caricamento dei contenuti e conversione), le esportazioni ripetute del corso
+invariato (hit) e la prima esportazione dopo la modifica di un capitolo.
+
+Uso:
+    python benchmarks/bench_esportazioni.py [--capitoli 40] [--kb 20] [--ripetizioni 20]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import database  # noqa: E402
+from app.models.cache_esportazioni import cache_esportazioni  # noqa: E402
+from app.api.controllers import file_esportazione  # noqa: E402
+
+PARAGRAFO = (
+    "Questo paragrafo descrive un concetto del capitolo con **testo in evidenza**, "
+    "un riferimento a `codice` e una frase di chiusura che completa la spiegazione. "
+)
+
+def testo_capitolo(indice: int, kb: int) -> str:
+    """Genera il Markdown di un capitolo di circa kb KB con titoli, elenchi e paragrafi."""
+    parti = []
+    while sum(len(p) for p in parti) < kb * 1024:
+        sezione = len(parti) // 6 + 1
+        parti.append(f"## Sezione {indice}.{sezione}\n\n")
+        parti.extend(PARAGRAFO * 4 + "\n\n" for _ in range(3))
+        parti.append("- primo punto\n- secondo punto\n- terzo punto\n\n")
+        parti.append("```python\nprint('esempio')\n```\n\n")
+    return "".join(parti)
+
+def crea_corso(capitoli: int, kb: int) -> str:
+    corso_id = database.salva_corso({
+        "titolo": "Corso di prova", "descrizione": "Corso per il benchmark delle esportazioni",
+        "pubblico_target": "Sviluppatori", "livello_complessita": "Intermedio", "tono": "Professionale",
+    })
+    database.salva_scaletta(corso_id, {
+        "titolo": "Corso di prova",
+        "capitoli": [
+            {"id": f"cap{i}", "titolo": f"Capitolo {i}", "ordine": i, "sottocapitoli": []}
+            for i in range(1, capitoli + 1)
+        ],
+    })
+    for i in range(1, capitoli + 1):
+        database.salva_contenuto_capitolo(corso_id, f"cap{i}", testo_capitolo(i, kb))
+    return corso_id
+
+def esporta(corso_id: str, formato: str) -> float:
+    inizio = time.perf_counter()
+    risultato = asyncio.run(file_esportazione(corso_id, formato))
+    trascorso = (time.perf_counter() - inizio) * 1000
+    if not risultato["success"]:
+        raise RuntimeError(risultato["message"])
+    return trascorso
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capitoli", type=int, default=40)
+    parser.add_argument("--kb", type=int, default=20, help="Dimensione approssimativa di ogni capitolo")
+    parser.add_argument("--ripetizioni", type=int, default=20)
+    parser.add_argument("--formati", nargs="+", default=["markdown", "html", "pdf", "docx"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "corsi.db"
+        cache_esportazioni.directory = Path(tmp) / "esportazioni"
+        database.init_db()
+        corso_id = crea_corso(args.capitoli, args.kb)
+
+        print(f"Corso: {args.capitoli} capitoli da ~{args.kb} KB")
+        print(f"{'formato':<10} {'prima':>10} {'ripetuta':>10} {'dopo modifica':>14}")
+        for formato in args.formati:
+            try:
+                prima = esporta(corso_id, formato)
+            except RuntimeError as e:
+                print(f"{formato:<10} non disponibile: {str(e)[:80]}")
+                continue
+            ripetuta = statistics.median(esporta(corso_id, formato) for _ in range(args.ripetizioni))
+            database.salva_contenuto_capitolo(corso_id, "cap1", testo_capitolo(1, args.kb) + "Paragrafo aggiunto.\n")
+            dopo_modifica = esporta(corso_id, formato)
+            print(f"{formato:<10} {prima:>8.1f}ms {ripetuta:>8.2f}ms {dopo_modifica:>12.1f}ms")
+
+        print(f"Cache: {cache_esportazioni.statistiche()}")
+
+if __name__ == "__main__":
+    main()
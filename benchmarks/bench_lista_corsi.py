@@ -0,0 +1,96 @@
+"""
+Benchmark della lista dei corsi: lista completa contro pagina per chiave.
+
+Per un numero crescente di corsi misura la lista completa (tutti i corsi con i parametri
+JSON decodificati, come faceva /miei-corsi prima della paginazione, riprodotta qui come
+riferimento) e lista_corsi_pagina() sulla prima pagina e su una pagina profonda, su un
+database temporaneo creato con le migrazioni reali.
+
+Uso:
+    python benchmarks/bench_lista_corsi.py [--corsi 100 1000 10000] [--ripetizioni 20]
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import database  # noqa: E402
+
+DESCRIZIONE = "Descrizione di prova del corso con qualche riga di testo. " * 20
+
+def popola(numero: int):
+    """Inserisce numero corsi con parametri realistici e contatori."""
+    conn = database.sqlite3.connect(database.DB_PATH)
+    inizio = datetime(2025, 1, 1)
+    conn.executemany(
+        """INSERT INTO corsi (id, parametri, creato, num_capitoli, capitoli_generati)
+           VALUES (?, ?, ?, ?, ?)""",
+        [
+            (str(uuid.uuid4()),
+             json.dumps({"titolo": f"Corso {i}", "descrizione": DESCRIZIONE, "pubblico_target": "professionisti",
+                         "livello_complessita": "Avanzato", "tono": "Professionale", "requisiti_specifici": "",
+                         "stile_scrittura": "Neil Patel"}),
+             (inizio + timedelta(minutes=i)).isoformat(), 10, i % 11)
+            for i in range(numero)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+def lista_completa():
+    """Lettura di tutti i corsi, come la lista_corsi() rimossa dal database."""
+    conn = database.sqlite3.connect(database.DB_PATH)
+    conn.row_factory = database.sqlite3.Row
+    corsi = []
+    for row in conn.execute(
+        """SELECT id, parametri, creato, ultimo_aggiornamento, completato,
+                  num_capitoli, capitoli_generati, capitoli_espansi, ultima_attivita
+           FROM corsi ORDER BY creato DESC"""
+    ):
+        corso = dict(row)
+        corso['parametri'] = json.loads(corso['parametri'])
+        corsi.append(corso)
+    conn.close()
+    return corsi
+
+def misura(funzione, ripetizioni: int) -> float:
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+    return statistics.median(tempi) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della lista dei corsi")
+    parser.add_argument("--corsi", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--ripetizioni", type=int, default=20)
+    parser.add_argument("--limite", type=int, default=24, help="Corsi per pagina")
+    args = parser.parse_args()
+    
+    print(f"{'corsi':>7} {'lista completa':>15} {'prima pagina':>13} {'pagina profonda':>16} {'con filtro':>11}")
+    for numero in args.corsi:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = Path(tmp) / "corsi.db"
+            database.init_db()
+            popola(numero)
+            
+            # Cursore di una pagina a metà della lista
+            pagina = database.lista_corsi_pagina(numero // 2)
+            cursore_profondo = pagina["cursore_successivo"]
+            
+            completa = misura(lista_completa, args.ripetizioni)
+            prima = misura(lambda: database.lista_corsi_pagina(args.limite), args.ripetizioni)
+            profonda = misura(lambda: database.lista_corsi_pagina(args.limite, cursore_profondo), args.ripetizioni)
+            filtrata = misura(lambda: database.lista_corsi_pagina(args.limite, stato="completo"), args.ripetizioni)
+            print(f"{numero:>7} {completa:>13.2f}ms {prima:>11.2f}ms {profonda:>14.2f}ms {filtrata:>9.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark del pacchetto ZIP: un'esportazione per formato contro un solo pacchetto.
+
+Crea su un database temporaneo un corso con --capitoli capitoli di circa --kb KB
+ciascuno e misura, a cache vuota:
+
+- le esportazioni separate di ogni formato con file_esportazione(), una dopo l'altra
+  (ognuna carica i contenuti, compone e analizza il Markdown);
+- il pacchetto con gli stessi formati con file_pacchetto(), che carica e compone il
+  corso una volta, scrive HTML, DOCX ed EPUB dallo stesso albero e impagina il PDF in
+  parallelo.
+
+Riporta anche il tempo di ogni formato da solo, per confrontare il pacchetto con il
+formato più lento, e la ripetizione del pacchetto a corso invariato (hit).
+
+Uso:
+    python benchmarks/bench_pacchetto.py [--capitoli 40] [--kb 20]
+"""
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import database  # noqa: E402
+from app.models.cache_esportazioni import cache_esportazioni  # noqa: E402
+from app.api.controllers import file_esportazione, file_pacchetto  # noqa: E402
+from app.api.pool_rendering import pool_rendering  # noqa: E402
+from benchmarks.bench_esportazioni import crea_corso  # noqa: E402
+
+def svuota_cache():
+    shutil.rmtree(cache_esportazioni.directory, ignore_errors=True)
+
+def misura(coroutine) -> float:
+    inizio = time.perf_counter()
+    risultato = asyncio.run(coroutine)
+    trascorso = (time.perf_counter() - inizio) * 1000
+    if not risultato["success"]:
+        raise RuntimeError(risultato["message"])
+    return trascorso
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capitoli", type=int, default=40)
+    parser.add_argument("--kb", type=int, default=20, help="Dimensione approssimativa di ogni capitolo")
+    parser.add_argument("--formati", default="markdown,html,pdf,docx,epub")
+    args = parser.parse_args()
+    formati = args.formati.split(",")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "corsi.db"
+        cache_esportazioni.directory = Path(tmp) / "esportazioni"
+        database.init_db()
+        corso_id = crea_corso(args.capitoli, args.kb)
+
+        # Il primo task avvia i processi del pool: non va contato in nessuna misura
+        misura(file_esportazione(corso_id, "markdown"))
+        asyncio.run(pool_rendering.esegui(time.sleep, 0))
+
+        print(f"Corso: {args.capitoli} capitoli da ~{args.kb} KB, {pool_rendering.processi} processi di rendering")
+        separati = {}
+        for formato in formati:
+            svuota_cache()
+            separati[formato] = misura(file_esportazione(corso_id, formato))
+            print(f"{formato:<10} da solo {separati[formato]:>10.1f}ms")
+
+        svuota_cache()
+        pacchetto = misura(file_pacchetto(corso_id, args.formati))
+        ripetuto = misura(file_pacchetto(corso_id, args.formati))
+        risultato = asyncio.run(file_pacchetto(corso_id, args.formati))
+        with zipfile.ZipFile(risultato["percorso"]) as archivio:
+            contenuto = ", ".join(f"{i.filename} ({i.file_size // 1024} KB)" for i in archivio.infolist())
+
+        print(f"{'somma dei formati separati':<28} {sum(separati.values()):>10.1f}ms")
+        print(f"{'formato più lento':<28} {max(separati.values()):>10.1f}ms")
+        print(f"{'pacchetto':<28} {pacchetto:>10.1f}ms")
+        print(f"{'pacchetto ripetuto (hit)':<28} {ripetuto:>10.2f}ms")
+        print(f"Contenuto: {contenuto}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Confronto tra la conversione Markdown -> flowable di ReportLab precedente e quella attuale.
+
+La conversione precedente (riportata qui sotto com'era in esporta_corso) trasforma ogni
+capitolo in HTML e poi lo spezza con quattro livelli di re.split annidati (h1, h2, h3,
+p), perdendo elenchi, tabelle e citazioni. Quella attuale, ConvertitorePlatypus, visita
+una sola volta l'albero del documento.
+
+Genera un corso di --capitoli capitoli con paragrafi, elenchi, tabelle, citazioni e
+codice, dimensionato per circa --pagine pagine A4, e riporta per entrambe le
+conversioni il tempo di creazione dei flowable, il tempo di impaginazione (doc.build),
+le pagine prodotte e quanti flowable di ogni tipo sono stati creati.
+
+Richiede reportlab e markdown.
+
+Uso:
+    python benchmarks/bench_pdf_markdown.py [--pagine 200] [--capitoli 20]
+"""
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import markdown  # noqa: E402
+from reportlab.lib import colors  # noqa: E402
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet  # noqa: E402
+from reportlab.lib.units import cm  # noqa: E402
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer  # noqa: E402
+
+from app.api.markdown_platypus import ConvertitorePlatypus  # noqa: E402
+
+# Circa 3 KB di Markdown per pagina A4 con i margini dell'export
+KB_PER_PAGINA = 3
+
+PARAGRAFO = (
+    "Questo paragrafo spiega un concetto del capitolo con **testo in evidenza**, *enfasi* "
+    "e un riferimento a `codice_inline`, seguito da una frase che completa la spiegazione. "
+)
+
+def testo_capitolo(indice: int, kb: int) -> str:
+    """Genera il Markdown di un capitolo di circa kb KB con tutti i costrutti supportati."""
+    parti = []
+    sezione = 0
+    while sum(len(p) for p in parti) < kb * 1024:
+        sezione += 1
+        parti.append(f"## Sezione {indice}.{sezione}\n\n")
+        parti.extend(PARAGRAFO * 3 + "\n\n" for _ in range(3))
+        parti.append(f"### Dettagli {indice}.{sezione}\n\n")
+        parti.append("- primo punto con **grassetto**\n- secondo punto\n    1. sotto punto\n    2. altro\n- terzo punto\n\n")
+        parti.append("> Una citazione che riassume la sezione.\n\n")
+        parti.append("| Termine | Definizione |\n|---|---|\n| Uno | Primo concetto |\n| Due | Secondo concetto |\n\n")
+        parti.append("```python\ndef esempio(x):\n    return x * 2\n```\n\n")
+    return "".join(parti)
+
+def stili_documento():
+    styles = getSampleStyleSheet()
+    styles['Heading1'].fontSize = 24
+    styles['Heading2'].fontSize = 18
+    styles['Heading3'].fontSize = 16
+    return styles
+
+def flowable_precedenti(capitoli, styles):
+    """La conversione precedente: Markdown -> HTML -> re.split annidati."""
+    if 'CodeBlock' not in styles:
+        styles.add(ParagraphStyle(name='CodeBlock', parent=styles['Code'], fontSize=9, fontName='Courier',
+                                  backColor=colors.lightgrey, spaceBefore=8, spaceAfter=8))
+
+    def html_to_platypus(html):
+        elements = []
+        for i, section in enumerate(re.split(r'<h1[^>]*>(.*?)</h1>', html)):
+            if i % 2 == 1:
+                elements.append(Paragraph(re.sub(r'<[^>]+>', '', section), styles['Heading1']))
+                elements.append(Spacer(1, 0.5*cm))
+            else:
+                for j, subsection in enumerate(re.split(r'<h2[^>]*>(.*?)</h2>', section)):
+                    if j % 2 == 1:
+                        elements.append(Paragraph(re.sub(r'<[^>]+>', '', subsection), styles['Heading2']))
+                        elements.append(Spacer(1, 0.3*cm))
+                    else:
+                        for k, subsubsection in enumerate(re.split(r'<h3[^>]*>(.*?)</h3>', subsection)):
+                            if k % 2 == 1:
+                                elements.append(Paragraph(re.sub(r'<[^>]+>', '', subsubsection), styles['Heading3']))
+                                elements.append(Spacer(1, 0.2*cm))
+                            else:
+                                for p in re.split(r'<p[^>]*>(.*?)</p>', subsubsection):
+                                    if p.strip():
+                                        if '<pre><code>' in p:
+                                            code_parts = re.split(r'<pre><code>(.*?)</code></pre>', p, flags=re.DOTALL)
+                                            for l, part in enumerate(code_parts):
+                                                if l % 2 == 1:
+                                                    elements.append(Paragraph(part, styles['CodeBlock']))
+                                                elif part.strip():
+                                                    elements.append(Paragraph(part, styles['Normal']))
+                                        else:
+                                            p = re.sub(r'<strong>(.*?)</strong>', r'<b>\1</b>', p)
+                                            p = re.sub(r'<em>(.*?)</em>', r'<i>\1</i>', p)
+                                            p = re.sub(r'<code>(.*?)</code>', r'<font face="Courier">\1</font>', p)
+                                            if p.strip():
+                                                elements.append(Paragraph(p, styles['Normal']))
+                                                elements.append(Spacer(1, 0.2*cm))
+        return elements
+
+    story = []
+    for titolo, testo in capitoli:
+        story.append(Paragraph(titolo, styles['Heading1']))
+        story.extend(html_to_platypus(markdown.markdown(testo, extensions=['tables', 'fenced_code'])))
+        story.append(PageBreak())
+    return story
+
+def flowable_attuali(capitoli, styles):
+    """La conversione attuale con ConvertitorePlatypus."""
+    convertitore = ConvertitorePlatypus(styles)
+    story = []
+    for titolo, testo in capitoli:
+        story.append(Paragraph(titolo, styles['Heading1']))
+        story.extend(convertitore.converti(testo))
+        story.append(PageBreak())
+    return story
+
+def misura(nome, funzione, capitoli, percorso: Path):
+    styles = stili_documento()
+    inizio = time.perf_counter()
+    try:
+        story = funzione(capitoli, styles)
+    except Exception as e:
+        print(f"{nome:<12} errore nella conversione: {str(e)[:100]}")
+        return
+    conversione = time.perf_counter() - inizio
+
+    doc = SimpleDocTemplate(str(percorso), pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+                            topMargin=2*cm, bottomMargin=2*cm)
+    tipi = Counter(type(f).__name__ for f in story)
+    inizio = time.perf_counter()
+    try:
+        doc.build(story)
+        impaginazione = f"{(time.perf_counter() - inizio) * 1000:10.0f}ms"
+        pagine = doc.page
+    except Exception as e:
+        impaginazione = f"errore: {str(e)[:60]}"
+        pagine = "-"
+    print(f"{nome:<12} {conversione * 1000:10.0f}ms {impaginazione:>12} {pagine:>7}  "
+          + ", ".join(f"{t}={n}" for t, n in sorted(tipi.items())))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pagine", type=int, default=200, help="Pagine A4 approssimative del corso")
+    parser.add_argument("--capitoli", type=int, default=20)
+    parser.add_argument("--output", default="/tmp", help="Directory dei PDF prodotti")
+    args = parser.parse_args()
+
+    kb = max(1, args.pagine * KB_PER_PAGINA // args.capitoli)
+    capitoli = [(f"Capitolo {i}", testo_capitolo(i, kb)) for i in range(1, args.capitoli + 1)]
+    dimensione = sum(len(t) for _, t in capitoli) / 1024
+    print(f"Corso: {args.capitoli} capitoli, {dimensione:.0f} KB di Markdown")
+    print(f"{'conversione':<12} {'flowable':>12} {'doc.build':>12} {'pagine':>7}  tipi")
+    misura("precedente", flowable_precedenti, capitoli, Path(args.output) / "bench_pdf_precedente.pdf")
+    misura("attuale", flowable_attuali, capitoli, Path(args.output) / "bench_pdf_attuale.pdf")
+
+if __name__ == "__main__":
+    main()
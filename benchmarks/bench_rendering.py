@@ -0,0 +1,84 @@
+"""
+Reattività dell'event loop durante esportazioni pesanti.
+
+Crea su un database temporaneo --corsi corsi di --capitoli capitoli da circa --kb KB
+e ne avvia in parallelo l'esportazione (senza cache) nel formato indicato, mentre una
+coroutine di controllo misura ogni 10 ms quanto in ritardo viene risvegliata: è il
+tempo per cui l'event loop, e con esso le altre richieste, resta bloccato.
+
+Riporta tempo totale, ritardo massimo e 99° percentile del ritardo, e le metriche
+del pool di rendering.
+
+Uso:
+    python benchmarks/bench_rendering.py [--corsi 4] [--capitoli 40] [--kb 20] [--formato html]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import database  # noqa: E402
+from app.models.cache_esportazioni import cache_esportazioni  # noqa: E402
+from app.api.controllers import file_esportazione  # noqa: E402
+from app.api.pool_rendering import pool_rendering  # noqa: E402
+from bench_esportazioni import crea_corso  # noqa: E402
+
+INTERVALLO = 0.01
+
+async def misura_ritardi(fine: asyncio.Event, ritardi):
+    """Si risveglia ogni INTERVALLO secondi e registra il ritardo rispetto al previsto."""
+    while not fine.is_set():
+        previsto = time.perf_counter() + INTERVALLO
+        await asyncio.sleep(INTERVALLO)
+        ritardi.append(max(0.0, time.perf_counter() - previsto))
+
+async def esporta_tutti(corsi, formato: str):
+    fine = asyncio.Event()
+    ritardi = []
+    controllo = asyncio.create_task(misura_ritardi(fine, ritardi))
+    await asyncio.sleep(INTERVALLO * 2)
+
+    inizio = time.perf_counter()
+    risultati = await asyncio.gather(*(file_esportazione(corso_id, formato) for corso_id in corsi))
+    trascorso = time.perf_counter() - inizio
+
+    fine.set()
+    await controllo
+    errori = [r["message"] for r in risultati if not r["success"]]
+    return trascorso, ritardi, errori
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corsi", type=int, default=4)
+    parser.add_argument("--capitoli", type=int, default=40)
+    parser.add_argument("--kb", type=int, default=20, help="Dimensione approssimativa di ogni capitolo")
+    parser.add_argument("--formato", default="html")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "corsi.db"
+        cache_esportazioni.directory = Path(tmp) / "esportazioni"
+        database.init_db()
+        corsi = [crea_corso(args.capitoli, args.kb) for _ in range(args.corsi)]
+
+        # Avvia i processi del pool prima della misura
+        asyncio.run(pool_rendering.esegui(time.sleep, 0))
+
+        trascorso, ritardi, errori = asyncio.run(esporta_tutti(corsi, args.formato))
+        ritardi.sort()
+        print(f"{args.corsi} esportazioni {args.formato} in parallelo ({args.capitoli} capitoli da ~{args.kb} KB)")
+        print(f"Tempo totale:            {trascorso * 1000:8.1f} ms")
+        print(f"Ritardo massimo del loop: {ritardi[-1] * 1000:8.1f} ms")
+        print(f"Ritardo p99 del loop:     {ritardi[int(len(ritardi) * 0.99) - 1] * 1000:8.1f} ms")
+        print(f"Ritardo mediano del loop: {statistics.median(ritardi) * 1000:8.1f} ms")
+        if errori:
+            print(f"Errori: {errori[0][:120]} ({len(errori)})")
+        print(f"Pool: {pool_rendering.statistiche()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark della ricerca full-text (FTS5) su corsi e capitoli.
+
+Popola un database temporaneo con --capitoli capitoli sintetici, costruiti con il
+vocabolario dei contenuti reali di app/data/corsi.db quando disponibile, e misura
+il tempo di indicizzazione di un capitolo e la latenza delle ricerche.
+
+Per default ogni corso ha un proprio argomento (un sottoinsieme del vocabolario da
+cui pesca la maggior parte delle parole), come nei corsi reali; con --omogeneo tutti i
+capitoli pescano dallo stesso vocabolario, il caso peggiore per le parole frequenti.
+
+Uso:
+    python benchmarks/bench_ricerca.py [--capitoli 20000] [--parole 800] [--ripetizioni 50] [--omogeneo]
+"""
+import argparse
+import json
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import ricerca  # noqa: E402
+
+CAPITOLI_PER_CORSO = 10
+PAROLE_ARGOMENTO = 300
+QUOTA_ARGOMENTO = 0.7
+
+def vocabolario(percorso_db: Path):
+    """Estrae le parole dai contenuti reali, o usa un vocabolario di ripiego."""
+    parole = []
+    if percorso_db.exists():
+        conn = sqlite3.connect(f"file:{percorso_db}?mode=ro", uri=True)
+        for (contenuto,) in conn.execute("SELECT contenuto FROM contenuti_capitoli WHERE typeof(contenuto) = 'text'"):
+            parole.extend(re.findall(r"[^\W\d_]{3,}", contenuto))
+        conn.close()
+    return parole or ("prompt modello contesto esempio istruzione risposta tecnica "
+                      "catena ragionamento valutazione dati corso capitolo").split()
+
+def popola(conn: sqlite3.Connection, parole, capitoli: int, parole_per_capitolo: int, omogeneo: bool = False):
+    """Crea lo schema minimo e indicizza corsi e capitoli sintetici."""
+    conn.execute("CREATE TABLE corsi (id TEXT PRIMARY KEY, parametri TEXT)")
+    conn.execute("CREATE TABLE capitoli (corso_id TEXT, capitolo_id TEXT, titolo TEXT, PRIMARY KEY (corso_id, capitolo_id))")
+    cursor = conn.cursor()
+    ricerca.crea_indice(cursor)
+    
+    casuale = random.Random(42)
+    distinte = sorted(set(parole))
+    argomento = parole
+    for i in range(capitoli):
+        corso_id = f"corso-{i // CAPITOLI_PER_CORSO}"
+        capitolo_id = f"cap{i % CAPITOLI_PER_CORSO + 1}"
+        if i % CAPITOLI_PER_CORSO == 0:
+            if not omogeneo:
+                argomento = casuale.sample(distinte, min(PAROLE_ARGOMENTO, len(distinte)))
+            parametri = {
+                "titolo": " ".join(casuale.choices(parole, k=3)),
+                "descrizione": " ".join(casuale.choices(parole, k=60)),
+                "pubblico_target": " ".join(casuale.choices(parole, k=2)),
+            }
+            cursor.execute("INSERT INTO corsi VALUES (?, ?)", (corso_id, json.dumps(parametri)))
+            ricerca.indicizza_corso(cursor, corso_id, parametri)
+        cursor.execute("INSERT INTO capitoli VALUES (?, ?, ?)",
+                       (corso_id, capitolo_id, " ".join(casuale.choices(parole, k=4))))
+        dall_argomento = int(parole_per_capitolo * QUOTA_ARGOMENTO)
+        testo = " ".join(casuale.choices(argomento, k=dall_argomento)
+                         + casuale.choices(parole, k=parole_per_capitolo - dall_argomento))
+        ricerca.indicizza_capitolo(cursor, corso_id, capitolo_id, testo)
+    conn.commit()
+    return casuale
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della ricerca full-text")
+    parser.add_argument("--capitoli", type=int, default=20000)
+    parser.add_argument("--parole", type=int, default=800, help="Parole per capitolo")
+    parser.add_argument("--ripetizioni", type=int, default=50)
+    parser.add_argument("--db", type=Path, default=Path("app/data/corsi.db"))
+    parser.add_argument("--omogeneo", action="store_true", help="Stesso vocabolario per tutti i corsi")
+    args = parser.parse_args()
+    
+    parole = vocabolario(args.db)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "ricerca.db")
+        
+        inizio = time.perf_counter()
+        casuale = popola(conn, parole, args.capitoli, args.parole, args.omogeneo)
+        print(f"Indicizzati {args.capitoli} capitoli in {time.perf_counter() - inizio:.1f}s")
+        
+        # Aggiornamento incrementale di un capitolo (salvataggio)
+        cursor = conn.cursor()
+        tempi = []
+        for _ in range(args.ripetizioni):
+            testo = " ".join(casuale.choices(parole, k=args.parole))
+            inizio = time.perf_counter()
+            ricerca.indicizza_capitolo(cursor, "corso-0", "cap1", testo)
+            conn.commit()
+            tempi.append(time.perf_counter() - inizio)
+        print(f"Reindicizzazione di un capitolo: mediana {statistics.median(tempi) * 1000:.2f}ms")
+        
+        frequenze = {}
+        for parola in parole:
+            parola = parola.lower()
+            if parola not in ricerca.PAROLE_VUOTE:
+                frequenze[parola] = frequenze.get(parola, 0) + 1
+        comuni = sorted(frequenze, key=frequenze.get, reverse=True)
+        query = {
+            "parola frequente": comuni[0],
+            "parola rara": comuni[-1],
+            "due parole": f"{comuni[5]} {comuni[50 % len(comuni)]}",
+            "prefisso": comuni[10][:4],
+            "con parole vuote": f"come si usa il {comuni[20]}",
+        }
+        for descrizione, testo in query.items():
+            tempi = []
+            for _ in range(args.ripetizioni):
+                inizio = time.perf_counter()
+                risultati = ricerca.cerca(cursor, testo, limite=20)
+                tempi.append(time.perf_counter() - inizio)
+            print(f"{descrizione:<17} '{testo}': {len(risultati)} risultati, "
+                  f"mediana {statistics.median(tempi) * 1000:.2f}ms, max {max(tempi) * 1000:.2f}ms")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
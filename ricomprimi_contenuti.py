@@ -0,0 +1,32 @@
+"""
+Converte i contenuti dei capitoli già salvati al codec di compressione indicato.
+
+Uso:
+    python ricomprimi_contenuti.py --codec zlib      # comprime con zlib
+    python ricomprimi_contenuti.py --codec zstd      # richiede il pacchetto zstandard
+    python ricomprimi_contenuti.py --codec nessuno   # riporta i contenuti in chiaro
+
+Per i nuovi salvataggi impostare "compressione_contenuti" in app/config/settings.json
+(o la variabile d'ambiente COMPRESSIONE_CONTENUTI) sullo stesso codec.
+"""
+import argparse
+
+from app.models.database import init_db, ricomprimi_contenuti
+
+def main():
+    parser = argparse.ArgumentParser(description="Ricomprime i contenuti dei capitoli")
+    parser.add_argument("--codec", choices=["nessuno", "zlib", "zstd"], required=True)
+    parser.add_argument("--blocco", type=int, default=200, help="Righe per transazione")
+    args = parser.parse_args()
+    
+    # Applica le migrazioni pendenti (colonna codec inclusa)
+    init_db()
+    
+    codec = "" if args.codec == "nessuno" else args.codec
+    risultato = ricomprimi_contenuti(codec, args.blocco)
+    
+    print(f"Righe esaminate: {risultato['righe']}, convertite: {risultato['convertite']}")
+    print(f"Spazio nel database: {risultato['bytes_prima']} -> {risultato['bytes_dopo']} byte")
+
+if __name__ == "__main__":
+    main()
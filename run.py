@@ -1,20 +1,87 @@
-import uvicorn
+import argparse
+import importlib.util
 import os
 from pathlib import Path
 
+import uvicorn
+
 # Assicurati che le directory necessarie esistano
 def setup_directories():
     # Directory dati
     Path("app/data").mkdir(parents=True, exist_ok=True)
     Path("app/data/corsi").mkdir(parents=True, exist_ok=True)
     Path("app/data/contenuti").mkdir(parents=True, exist_ok=True)
-    
+
     # Directory configurazione
     Path("app/config").mkdir(parents=True, exist_ok=True)
 
+def _env_int(nome: str, predefinito: int) -> int:
+    valore = os.getenv(nome)
+    return int(valore) if valore else predefinito
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Legge le opzioni di avvio; ogni opzione ha una variabile d'ambiente equivalente."""
+    parser = argparse.ArgumentParser(description="Avvia AI Courses Generator")
+    parser.add_argument("--produzione", action="store_true",
+                        default=os.getenv("MODALITA", "").lower() == "produzione",
+                        help="Modalità produzione: niente reload, più worker (env MODALITA=produzione)")
+    parser.add_argument("--host", default=os.getenv("HOST"),
+                        help="Indirizzo di ascolto (env HOST; predefinito 127.0.0.1, 0.0.0.0 in produzione)")
+    parser.add_argument("--port", type=int, default=_env_int("PORT", 8000), help="Porta (env PORT)")
+    parser.add_argument("--workers", type=int, default=_env_int("WORKERS", 0),
+                        help="Processi worker in produzione (env WORKERS; predefinito: numero di CPU)")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default=os.getenv("EVENT_LOOP", "auto"),
+                        help="Event loop (env EVENT_LOOP; auto usa uvloop se installato)")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default=os.getenv("PARSER_HTTP", "auto"),
+                        help="Parser HTTP (env PARSER_HTTP; auto usa httptools se installato)")
+    parser.add_argument("--keep-alive", type=int, default=_env_int("TIMEOUT_KEEP_ALIVE", 5),
+                        help="Secondi di attesa su una connessione keep-alive inattiva (env TIMEOUT_KEEP_ALIVE)")
+    parser.add_argument("--backlog", type=int, default=_env_int("BACKLOG", 2048),
+                        help="Connessioni in attesa di accept (env BACKLOG)")
+    parser.add_argument("--limite-connessioni", type=int, default=_env_int("LIMITE_CONNESSIONI", 0),
+                        help="Connessioni contemporanee per worker oltre le quali si risponde 503 (env LIMITE_CONNESSIONI; 0 = nessun limite)")
+    parser.add_argument("--timeout-arresto", type=int, default=_env_int("TIMEOUT_ARRESTO", 180),
+                        help="Secondi concessi alle richieste in corso (es. chiamate AI) durante l'arresto (env TIMEOUT_ARRESTO)")
+    return parser.parse_args(argv)
+
+def _modulo_disponibile(nome: str) -> bool:
+    return importlib.util.find_spec(nome) is not None
+
+def opzioni_uvicorn(args: argparse.Namespace) -> dict:
+    """Traduce le opzioni di avvio nei parametri di uvicorn.run."""
+    if not args.produzione:
+        # Sviluppo: un solo processo con ricarica automatica
+        return {"host": args.host or "127.0.0.1", "port": args.port, "reload": True}
+
+    loop, http = args.loop, args.http
+    if loop == "uvloop" and not _modulo_disponibile("uvloop"):
+        print("uvloop non installato (pip install uvloop), uso asyncio")
+        loop = "asyncio"
+    if http == "httptools" and not _modulo_disponibile("httptools"):
+        print("httptools non installato (pip install httptools), uso h11")
+        http = "h11"
+
+    return {
+        "host": args.host or "0.0.0.0",
+        "port": args.port,
+        "workers": args.workers or os.cpu_count() or 1,
+        "loop": loop,
+        "http": http,
+        "timeout_keep_alive": args.keep_alive,
+        "backlog": args.backlog,
+        "limit_concurrency": args.limite_connessioni or None,
+        "timeout_graceful_shutdown": args.timeout_arresto,
+        "proxy_headers": True,
+        "access_log": False,
+    }
+
 if __name__ == "__main__":
+    args = parse_args()
+
     # Crea le directory necessarie
     setup_directories()
-    
+
     # Avvia l'applicazione
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True) 
\ No newline at end of file
+    opzioni = opzioni_uvicorn(args)
+    print(f"Avvio in modalità {'produzione' if args.produzione else 'sviluppo'}: {opzioni}")
+    uvicorn.run("app.main:app", **opzioni)
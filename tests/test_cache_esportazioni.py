@@ -0,0 +1,52 @@
+import asyncio
+import os
+import time
+
+from app.models.cache_esportazioni import CacheEsportazioni
+
+def test_invalidazione_durante_la_scrittura(tmp_path):
+    cache = CacheEsportazioni(directory=tmp_path, max_bytes=10 * 1024 * 1024)
+
+    async def scrivi(destinazione):
+        destinazione.write_bytes(b"contenuto")
+        # Salvataggio di un capitolo mentre l'esportazione scrive
+        cache.invalida_corso("c1")
+
+    percorso = asyncio.run(cache.salva("c1", "chiave", "pdf", scrivi))
+    assert percorso.read_bytes() == b"contenuto"
+
+def test_invalidazione_rimuove_solo_i_file_non_usati(tmp_path):
+    cache = CacheEsportazioni(directory=tmp_path, max_bytes=10 * 1024 * 1024)
+    directory = tmp_path / "c1"
+    directory.mkdir()
+    vecchio = directory / "vecchia.pdf"
+    vecchio.write_bytes(b"vecchio")
+    os.utime(vecchio, (time.time() - 60, time.time() - 60))
+    temporaneo = directory / ".nuova.pdf.1.abcd.tmp"
+    temporaneo.write_bytes(b"in scrittura")
+    os.utime(temporaneo, (time.time() - 60, time.time() - 60))
+
+    cache.invalida_corso("c1")
+
+    assert not vecchio.exists()
+    assert temporaneo.exists()
+    assert cache.statistiche()["invalidazioni"] == 1
+
+def test_file_collegati_sopravvivono_all_evizione(tmp_path):
+    cache = CacheEsportazioni(directory=tmp_path / "cache", max_bytes=1)
+    collegati = tmp_path / "parti"
+    collegati.mkdir()
+
+    async def scrivi_parte(destinazione):
+        destinazione.write_bytes(b"parte")
+
+    async def scenario():
+        prima = await cache.salva("_parti", "a", "pdf", scrivi_parte, collegati / "a.pdf")
+        # Ogni salvataggio oltre il limite rimuove dalla cache i file precedenti
+        seconda = await cache.salva("_parti", "b", "pdf", scrivi_parte, collegati / "b.pdf")
+        return prima, seconda
+
+    prima, seconda = asyncio.run(scenario())
+    assert cache.cerca("_parti", "a", "pdf") is None
+    assert prima.read_bytes() == b"parte" and seconda.read_bytes() == b"parte"
+    assert cache.cerca("_parti", "b", "pdf", collegati / "b2.pdf") == collegati / "b2.pdf"
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import time
+
+from app.api.lavori_esportazione import LavoriEsportazione
+
+def _esegui_con_file(directory, attesa=None):
+    """Esportazione finta: segnala un capitolo, attende l'evento (se indicato) e scrive il file."""
+    async def esegui(avanzamento):
+        avanzamento(1, 2)
+        if attesa is not None:
+            await attesa.wait()
+        percorso = directory / "corso.pdf"
+        percorso.write_bytes(b"%PDF-1.4 prova")
+        return {"success": True, "percorso": str(percorso), "filename": "corso.pdf",
+                "media_type": "application/pdf"}
+    return esegui
+
+def test_stato_letto_da_un_altra_istanza(tmp_path):
+    directory = tmp_path / "lavori"
+
+    async def scenario():
+        worker = LavoriEsportazione(directory=directory, scadenza_secondi=60)
+        attesa = asyncio.Event()
+        lavoro = worker.avvia("corso1", "pdf", 2, _esegui_con_file(tmp_path, attesa))
+        await asyncio.sleep(0)
+
+        # Un altro worker vede il lavoro in corso e non ne avvia un secondo
+        altro = LavoriEsportazione(directory=directory, scadenza_secondi=60)
+        in_corso = altro.stato(lavoro["id"])
+        assert in_corso["stato"] == "in_corso"
+        assert in_corso["capitoli_completati"] == 1
+        assert altro.avvia("corso1", "pdf", 2, _esegui_con_file(tmp_path))["id"] == lavoro["id"]
+
+        attesa.set()
+        await asyncio.gather(*worker._task.values())
+        return lavoro["id"]
+
+    lavoro_id = asyncio.run(scenario())
+
+    completato = LavoriEsportazione(directory=directory, scadenza_secondi=60).stato(lavoro_id)
+    assert completato["stato"] == "completato"
+    assert completato["capitoli_completati"] == 2
+    assert completato["filename"] == "corso.pdf"
+    with open(completato["percorso"], "rb") as f:
+        assert f.read() == b"%PDF-1.4 prova"
+
+def test_lavoro_scaduto_eliminato_da_un_altra_istanza(tmp_path):
+    directory = tmp_path / "lavori"
+
+    async def scenario():
+        worker = LavoriEsportazione(directory=directory, scadenza_secondi=0)
+        lavoro = worker.avvia("corso1", "pdf", 2, _esegui_con_file(tmp_path))
+        await asyncio.gather(*worker._task.values())
+        return lavoro
+
+    lavoro = asyncio.run(scenario())
+    time.sleep(0.01)
+
+    altro = LavoriEsportazione(directory=directory, scadenza_secondi=60)
+    assert altro.stato(lavoro["id"]) is None
+    assert list(directory.iterdir()) == []
+    assert altro.statistiche()["scaduti"] == 1
+
+def test_id_non_valido(tmp_path):
+    lavori = LavoriEsportazione(directory=tmp_path, scadenza_secondi=60)
+    (tmp_path / "segreto.json").write_text("{}", encoding="utf-8")
+    assert lavori.stato("../segreto") is None
+    assert lavori.stato("inesistente") is None
+
+def test_lavoro_abbandonato_non_blocca_nuove_esportazioni(tmp_path):
+    directory = tmp_path / "lavori"
+    directory.mkdir()
+    # Stato lasciato da un worker terminato durante l'esportazione
+    battito = time.time() - 60
+    (directory / "abc123.json").write_text(json.dumps({
+        "id": "abc123", "corso_id": "c1", "formato": "pdf", "stato": "in_corso",
+        "capitoli_completati": 1, "capitoli_totali": 2, "message": "Esportazione in corso",
+        "creato": battito, "battito": battito, "completato": None, "scadenza": None,
+    }), encoding="utf-8")
+
+    async def scenario():
+        worker = LavoriEsportazione(directory=directory, scadenza_secondi=60)
+        lavoro = worker.avvia("c1", "pdf", 2, _esegui_con_file(tmp_path))
+        await asyncio.gather(*worker._task.values())
+        return worker, lavoro
+
+    worker, lavoro = asyncio.run(scenario())
+    assert lavoro["id"] != "abc123"
+    assert worker.stato(lavoro["id"])["stato"] == "completato"
+    assert worker.stato("abc123")["stato"] == "errore"